@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+#
+# Compare `fft.wav2bmp_batch()' against calling `fft.wav2bmp()' once per clip,
+# reporting clips/second for each. Can run using:
+#
+#   python -m benchmarks.bench_batch [clips] [seconds] [size]
+#
+
+import sys
+import time
+import numpy as np
+
+import w2b.fft as fft
+
+
+################################################################################
+def gen_clips(fs, n, seconds):
+    """`n' noise clips of between half and all of `seconds' long."""
+
+    rng = np.random.default_rng(0)
+    lens = rng.integers(int(fs * seconds / 2), int(fs * seconds) + 1, n)
+
+    return [rng.uniform(-1.0, 1.0, l).astype("float32") for l in lens]
+
+
+################################################################################
+def main(n, seconds, size):
+    fs = 8000
+    overlapDec = 0.5
+    clips = gen_clips(fs, n, seconds)
+    print("{} clips of up to {} s, size {}".format(n, seconds, size))
+
+    t0 = time.perf_counter()
+
+    for c in clips:
+        fft.wav2bmp(fs, c, size, overlapDec)
+
+    t1 = time.perf_counter()
+    fft.wav2bmp_batch(fs, clips, size, overlapDec)
+    t2 = time.perf_counter()
+
+    print("wav2bmp() per clip: {:10.1f} clips/s".format(n / (t1 - t0)))
+    print("wav2bmp_batch():    {:10.1f} clips/s".format(n / (t2 - t1)))
+    print("speed-up:           {:10.1f}x".format((t1 - t0) / (t2 - t1)))
+
+
+################################################################################
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        main(int(sys.argv[1]), float(sys.argv[2]), int(sys.argv[3]))
+    elif len(sys.argv) == 1:
+        main(5000, 0.25, 256)
+    else:
+        print("Usage: " + sys.argv[0] + " [clips] [seconds] [size]")
+        sys.exit(1)
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+#
+# Compare `mask.replicate_harmonics()' against the per-column loop that
+# `gen_harmonics.py' used to run. Can run using:
+#
+#   python -m benchmarks.bench_harmonics [bins] [columns]
+#
+
+import sys
+import time
+import numpy as np
+
+import w2b.mask as mask
+from tests.test_mask import replicate_harmonics_slow
+
+
+################################################################################
+def gen_mask(fn, tn):
+    """A mask in the style of the included square wave masks: a slowly
+    wandering band around a fundamental."""
+
+    m = np.zeros((fn, tn), dtype="float32")
+    centre = (fn // 20) + (np.sin(np.arange(0, tn) / 500.0) * (fn // 100))
+
+    for t in range(0, tn):
+        c = int(centre[t])
+        m[(c - 4):(c + 4), t] = 1.0
+
+    return m
+
+
+################################################################################
+def main(fn, tn):
+    m = gen_mask(fn, tn)
+    print("mask: {} bins x {} columns".format(fn, tn))
+
+    t0 = time.perf_counter()
+
+    slow = replicate_harmonics_slow(m)
+
+    t1 = time.perf_counter()
+    fast = mask.replicate_harmonics(m)
+    t2 = time.perf_counter()
+
+    assert np.array_equal(slow, fast)
+
+    print("script loop:           {:8.3f} s".format(t1 - t0))
+    print("replicate_harmonics(): {:8.3f} s".format(t2 - t1))
+    print("speed-up:              {:8.1f}x".format((t1 - t0) / (t2 - t1)))
+
+
+################################################################################
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        main(int(sys.argv[1]), int(sys.argv[2]))
+    elif len(sys.argv) == 1:
+        main(2049, 20000)
+    else:
+        print("Usage: " + sys.argv[0] + " [bins] [columns]")
+        sys.exit(1)
@@ -0,0 +1,211 @@
+#!/usr/bin/python3
+#
+# Time, and record the peak memory of, every hot path over a sweep of signal
+# lengths, FFT sizes and overlaps. Needs no GPU or network; the signals are
+# synthetic, like those in tests/test_bmp2wav.py. Can run using:
+#
+#   python -m benchmarks.run [results.json] [lengths] [sizes] [overlaps]
+#   python -m benchmarks.run compare <old.json> <new.json> [tolerance]
+#
+# where the sweep lists are comma-separated, e.g. "100000,1000000".
+#
+
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+import w2b.colourmap as cm
+import w2b.fft as fft
+import w2b.img as img
+import w2b.mask as mask
+import w2b.util as util
+
+from .bench_harmonics import gen_mask
+
+
+LENGTHS = (100000, 1000000)
+SIZES = (256, 1024, 4096)
+OVERLAPS = (0.5, 0.875)
+FS = 44100
+
+
+################################################################################
+def gen_wav(l, fs=FS):
+    """An alternating +1.0, -1.0 sequence (as tests/test_bmp2wav.py uses) plus
+    a rising chirp, normalised."""
+
+    t = np.arange(0, l) / fs
+    alt = np.tile(np.array([1.0, -1.0]), int((l + 1) / 2))[:l]
+    chirp = np.sin(2.0 * np.pi * (100.0 + (1000.0 * t)) * t)
+
+    return util.norm(((0.1 * alt) + chirp).astype("float32"))
+
+
+################################################################################
+def measure(fn, repeat):
+    """Returns the best wall time of `repeat' calls of `fn', and the peak
+    bytes traced while making one more."""
+
+    best = np.inf
+
+    for i in range(0, repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak
+
+
+################################################################################
+def get_cases(l, size, overlapDec, outDir):
+    """Returns `(name, function)' for every hot path, given one signal."""
+
+    wav = gen_wav(l)
+    ab, an, x = fft.wav2bmp(FS, wav, size, overlapDec)
+    abRaw, anRaw, xRaw = fft.wav2bmp(FS, wav, size, overlapDec, window=None)
+    ones = np.ones(ab.shape, dtype="float32")
+    abNorm = util.norm(ab)
+    abDb = util.mag2db_norm(ab)
+    binFreqs, logFreqs = util.log_freq(FS, size)
+    harmMask = gen_mask(ab.shape[0], ab.shape[1])
+    colourMap = cm.colour_maps["thermal1"]
+    name = os.path.join(outDir, "bench")
+
+    return [
+        ("fft.wav2bmp", lambda: fft.wav2bmp(FS, wav, size, overlapDec)),
+        ("fft.bmp2wav", lambda: fft.bmp2wav(FS, l, xRaw, ones, size,
+                overlapDec)),
+        ("util.angle", lambda: util.angle(x)),
+        ("util.lin2log", lambda: util.lin2log(abDb, binFreqs, logFreqs)),
+        ("util.mag2db_norm", lambda: util.mag2db_norm(ab)),
+        ("util.apply_colourmap", lambda: util.apply_colourmap(abNorm, an,
+                colourMap)),
+        ("img.write_abs", lambda: img.write_abs(name, FS, size, overlapDec,
+                ab)),
+        ("img.write_abs_db", lambda: img.write_abs_db(name, FS, size,
+                overlapDec, ab)),
+        ("img.write_ang", lambda: img.write_ang(name, FS, size, overlapDec,
+                ab, an)),
+        ("img.write_all", lambda: img.write_all(name, FS, size, overlapDec,
+                ab, an, products=("ab", "ab-dB", "ab-dB-log", "an"))),
+        ("gen_harmonics", lambda: mask.replicate_harmonics(harmMask))
+    ]
+
+
+################################################################################
+def run(lengths=LENGTHS, sizes=SIZES, overlaps=OVERLAPS, repeat=3):
+    """Returns the results of the whole sweep as a JSON-able dictionary."""
+
+    results = []
+
+    for l in lengths:
+        for size in sizes:
+            for overlapDec in overlaps:
+                with tempfile.TemporaryDirectory() as d:
+                    cases = get_cases(l, size, overlapDec, d)
+
+                    for name, fn in cases:
+                        seconds, peak = measure(fn, repeat)
+
+                        print("{:>22} l={:<8} size={:<5} overlap={:<6} "
+                                "{:9.4f} s {:10.1f} MiB".format(name, l,
+                                size, overlapDec, seconds,
+                                peak / (1024.0 * 1024.0)))
+
+                        results.append({
+                            "name": name,
+                            "length": l,
+                            "size": size,
+                            "overlapDec": overlapDec,
+                            "seconds": seconds,
+                            "peakBytes": peak
+                        })
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": repeat,
+        "results": results
+    }
+
+
+################################################################################
+def get_key(r):
+    return (r["name"], r["length"], r["size"], r["overlapDec"])
+
+
+################################################################################
+def compare(old, new, tolerance=1.2):
+    """Prints every case of `new' that is more than `tolerance' times slower
+    (or bigger) than in `old', and returns how many there were."""
+
+    oldResults = {get_key(r): r for r in old["results"]}
+    regressions = 0
+
+    for r in new["results"]:
+        o = oldResults.get(get_key(r))
+
+        if o == None:
+            continue
+
+        for field in ("seconds", "peakBytes"):
+            if r[field] > (o[field] * tolerance):
+                regressions += 1
+                print("{} l={} size={} overlap={}: {} {:.4g} -> {:.4g}".format(
+                        r["name"], r["length"], r["size"], r["overlapDec"],
+                        field, o[field], r[field]))
+
+    print("{} regression(s)".format(regressions))
+    return regressions
+
+
+################################################################################
+def parse_list(s, t):
+    return tuple(t(v) for v in s.split(","))
+
+
+################################################################################
+def main(argv):
+    if (len(argv) in (3, 4)) and (argv[0] == "compare"):
+        with open(argv[1]) as f:
+            old = json.load(f)
+
+        with open(argv[2]) as f:
+            new = json.load(f)
+
+        tolerance = float(argv[3]) if len(argv) == 4 else 1.2
+        return 1 if compare(old, new, tolerance) > 0 else 0
+    elif len(argv) <= 4:
+        fileName = argv[0] if len(argv) > 0 else "benchmark.json"
+        lengths = parse_list(argv[1], int) if len(argv) > 1 else LENGTHS
+        sizes = parse_list(argv[2], int) if len(argv) > 2 else SIZES
+        overlaps = parse_list(argv[3], float) if len(argv) > 3 else OVERLAPS
+
+        with open(fileName, "w") as f:
+            json.dump(run(lengths, sizes, overlaps), f, indent=2)
+
+        print("Wrote \"{}\"".format(fileName))
+        return 0
+    else:
+        print("Usage: python -m benchmarks.run "
+                "[results.json] [lengths] [sizes] [overlaps]")
+        print("       python -m benchmarks.run "
+                "compare <old.json> <new.json> [tolerance]")
+        return 1
+
+
+################################################################################
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -28,7 +28,9 @@ import imageio as iio
 import matplotlib.pyplot as plt
 import numpy as np
 
+import w2b.cache as cache
 import w2b.fft as fft
+import w2b.mask as w2bmask
 import w2b.plot as plot
 import w2b.util as util
 import w2b.wav as wav
@@ -38,27 +40,34 @@ import w2b.wav as wav
 def main(wavName, maskName, size, overlapDec):
     fs, s, l = wav.read(wavName)
 
-    # If stereo, take left channel
-    if s.ndim == 2:
-        s0 = s[:, 0]
+    # The mask is shared by every channel
+    if s.ndim == 1:
+        channels = 1
     else:
-        s0 = s
+        channels = s.shape[1]
 
-    print("Reading mask image...")
-    mask = np.flipud(util.norm(iio.imread(maskName)))
-    assert mask.ndim == 2
-
-    maskMin = np.amin(mask)
-    maskMax = np.amax(mask)
-    print("min(mask) = {:+}".format(maskMin))
-    print("max(mask) = {:+}".format(maskMax))
+    if maskName.endswith(".json"):
+        print("Reading vector mask...")
+        mask = w2bmask.load_vector(maskName, fs, l, size, overlapDec)
+    else:
+        print("Reading mask image...")
+        mask = np.flipud(util.norm(iio.imread(maskName)))
+        assert mask.ndim == 2
 
-    print("Retrieving FFT data from WAV...")
-    # XXX: MUST USE NO WINDOW!
-    ab, an, x = fft.wav2bmp(fs, s0, size, overlapDec, window=None)
+        maskMin = np.amin(mask)
+        maskMax = np.amax(mask)
+        print("min(mask) = {:+}".format(maskMin))
+        print("max(mask) = {:+}".format(maskMax))
 
     print("Resynthesizing FFT data using mask...")
-    out = fft.bmp2wav(fs, l, x, mask, size, overlapDec)
+    # Only the columns the mask changes are transformed, with the same window
+    # as the spectrogram the mask was drawn on (unless there is no overlap)
+    window = fft.get_resynth_window(size, overlapDec, np.hanning)
+    out = cache.cached(
+            lambda: {"out": fft.bmp2wav_sparse(fs, s, mask, size, overlapDec,
+                window=window)},
+            [wavName, maskName], size, overlapDec, window,
+            product="resynth")["out"]
 
     outMin = np.amin(out)
     outMax = np.amax(out)
@@ -75,30 +84,48 @@ def main(wavName, maskName, size, overlapDec):
     fig = plt.figure()
     fig.suptitle("Original WAV vs reynthesized WAV")
     plt.subplot(2, 1, 1)
-    plt.plot(np.arange(0, out2.size, dtype="float32"), s0)
+    plt.plot(np.arange(0, l, dtype="float32"), s)
     plt.grid(True)
     plt.subplot(2, 1, 2)
-    plt.plot(np.arange(0, out2.size, dtype="float32"), out2)
+    plt.plot(np.arange(0, l, dtype="float32"), out2)
     plt.grid(True)
     plt.show(block=False)
 
     # XXX: there is a bug(?) which shows the mask image as black even if it's
     # entirely white. WTF?
-    fig = plt.figure()
-    fig.suptitle("Mask image")
-    plt.imshow(mask, cmap="gray", origin="lower")
-    plt.show(block=False)
+    # Vector masks are never rasterised in full, so aren't drawn
+    if type(mask) == np.ndarray:
+        fig = plt.figure()
+        fig.suptitle("Mask image")
+        plt.imshow(mask, cmap="gray", origin="lower")
+        plt.show(block=False)
+
+    def transform():
+        ab, an, x = fft.wav2bmp(fs, out2, size, overlapDec)
+        return {"ab": ab, "an": an}
 
     print("Computing spectrogram of the resynthesized WAV...")
-    ab, an, x = fft.wav2bmp(fs, out2, size, overlapDec)
+    # The output only depends on the inputs and the resynthesis window, so is
+    # cached under them
+    res = cache.cached(transform, [wavName, maskName], size, overlapDec,
+            product="resynth-stft_" + fft.get_window_key(window))
+    ab = res["ab"]
+    an = res["an"]
 
     print("Drawing more graphs...")
-    plot.draw_abs("out", fs, size, overlapDec, ab)
-    plot.draw_abs_db("out", fs, size, overlapDec, ab)
-    plot.draw_ang("out", fs, size, overlapDec, ab, an)
+    if channels == 1:
+        ab = ab[np.newaxis]
+        an = an[np.newaxis]
+
+    for c in range(0, channels):
+        chName = util.gen_channel_name("out", c, channels)
+
+        plot.draw_abs(chName, fs, size, overlapDec, ab[c])
+        plot.draw_abs_db(chName, fs, size, overlapDec, ab[c])
+        plot.draw_ang(chName, fs, size, overlapDec, ab[c], an[c])
 
     print("Writing WAVs...")
-    wav.write(maskName + "_in.wav", fs, s0)
+    wav.write(maskName + "_in.wav", fs, s)
     wav.write(maskName + "_out.wav", fs, out2)
 
     print("Done")
@@ -107,9 +134,11 @@ def main(wavName, maskName, size, overlapDec):
 
 ################################################################################
 if __name__ == "__main__":
+    util.init_logging()
+
     if len(sys.argv) == 5:
         main(sys.argv[1], sys.argv[2], int(sys.argv[3]), float(sys.argv[4]))
     else:
         print("Usage: " + sys.argv[0] + \
-                " <WAV file> <Filter BMP> <size> <overlap>")
+                " <WAV file> <Filter BMP or JSON> <size> <overlap>")
         sys.exit(1)
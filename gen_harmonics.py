@@ -28,6 +28,7 @@ import imageio as iio
 import matplotlib.pyplot as plt
 import numpy as np
 
+import w2b.mask as w2bmask
 import w2b.util as util
 
 
@@ -39,48 +40,11 @@ def main(maskName):
     assert mask.ndim == 2
 
     print("Drawing harmonics...")
-    mask2 = np.array(mask, dtype="float32")
-    mask3 = np.array(mask, dtype="float32")
-    print("dim: {}".format(mask2.shape))
+    print("dim: {}".format(mask.shape))
+    print("Time axis length: {}".format(mask.shape[1]))
+    print("Bins axis length: {}".format(mask.shape[0]))
 
-    fn = mask2.shape[0]
-    tn = mask2.shape[1]
-    z = np.zeros(fn, dtype="float32")
-
-    print("Time axis length: {}".format(tn))
-    print("Bins axis length: {}".format(fn))
-
-    for t in range(0, tn):
-        low = -1
-        high = -1
-
-        closeArray = np.isclose(z, mask2[:, t])
-
-        for f in range(0, fn):
-            if (low == -1) and (~closeArray[f]):
-                print("Found lowest at idx {}".format(f))
-                low = f
-            elif (low != -1) and (high == -1) and closeArray[f]:
-                print("Found highest at idx {}". format(f))
-                high = f
-                break
-
-        if (low != -1) and (high != -1):
-            frange = int(high - low)
-            frangeDiv2 = int(frange / 2.0)
-            fundFreqIdx = low + frangeDiv2
-            nextFreqIdx = fundFreqIdx * 2
-            print("range (idx): {} to {} ({})".format(low, high, frange))
-
-            while (nextFreqIdx + frangeDiv2) < fn:
-                dstStart = nextFreqIdx - frangeDiv2
-                dstEnd = nextFreqIdx + frangeDiv2
-                srcStart = fundFreqIdx - frangeDiv2
-                srcEnd = fundFreqIdx + frangeDiv2
-
-                mask3[dstStart:dstEnd, t] = mask2[srcStart:srcEnd, t]
-
-                nextFreqIdx += fundFreqIdx
+    mask3 = w2bmask.replicate_harmonics(mask, quiet=True)
 
     fig = plt.figure()
     fig.suptitle("Mask image vs w/ harmonics")
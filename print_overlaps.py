@@ -50,6 +50,10 @@ FFT size | Suitable overlaps
 I find that, for audio, sizes 8192 and up are basically useless regardless of \
 the chosen overlap.
 
+Other overlaps work too, as long as size * overlap is a whole number of \
+samples (e.g. 0.7 with a size of 1000). Pick the smallest overlap that is \
+clear enough, rather than jumping to the next one above.
+
 Warning: each overlap requires much more time and space than the previous one! \
 I wouldn't recommend venturing further than 0.96875 if you have 16 GB or \
 less memory.""")
@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+#
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import sys
+
+import w2b.plan as plan
+
+
+################################################################################
+def main(name, size, overlapDec, budget=None):
+    print("Calibrating...")
+    p = plan.plan(name, size, overlapDec, budget)
+
+    print("\"{}\": fs = {}, channels = {}, len = {}, iters = {}".format(
+            name, p["fs"], p["channels"], p["length"], p["iters"]))
+    print()
+
+    for k, v in p["sizes"].items():
+        print("{:>14} {:>12}".format(k, plan.format_bytes(v)))
+
+    print()
+
+    for k, v in p["modeBytes"].items():
+        print("{:>14} {:>12} needed".format(k, plan.format_bytes(v)))
+
+    print()
+    print("Estimated FFT time: {:.3f} s".format(p["seconds"]))
+
+    if p["budget"] == None:
+        print("Unknown memory budget; pass one to choose a mode")
+    elif p["mode"] == None:
+        print("Nothing fits in {}".format(plan.format_bytes(p["budget"])))
+    else:
+        print("Mode for {}: {}".format(plan.format_bytes(p["budget"]),
+                p["mode"]))
+
+
+################################################################################
+if __name__ == "__main__":
+    if len(sys.argv) == 4:
+        main(sys.argv[1], int(sys.argv[2]), float(sys.argv[3]))
+    elif len(sys.argv) == 5:
+        main(sys.argv[1], int(sys.argv[2]), float(sys.argv[3]),
+                int(float(sys.argv[4]) * 1024 * 1024))
+    else:
+        print("Usage: " + sys.argv[0] +
+                " <WAV file> <size> <overlap> [memory budget in MiB]")
+        sys.exit(1)
@@ -45,9 +45,11 @@ them is not possible.
 For typical audio data, I prefer 1024, 2048 or 4096. But, by all means, \
 experiment!
 
-W2B supports all FFT sizes, I think. But beware that large sizes, in \
-conjunction with high overlaps, may take a long time and require a *huge* \
-amount of memory.""")
+W2B supports all FFT sizes, not just these. Sizes made only of the prime \
+factors 2, 3 and 5 (e.g. 768, 1000, 1536) are almost as fast to transform; \
+sizes with large prime factors (e.g. 1009) can be several times slower. But \
+beware that large sizes, in conjunction with high overlaps, may take a long \
+time and require a *huge* amount of memory.""")
 
 
 ################################################################################
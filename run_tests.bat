@@ -1,6 +1,23 @@
 python -m tests.test_angle -v
+python -m tests.test_archive -v
+python -m tests.test_batch -v
 python -m tests.test_bmp2wav -v
+python -m tests.test_cache -v
+python -m tests.test_cli -v
+python -m tests.test_compute -v
 python -m tests.test_fft_stats -v
 python -m tests.test_filename -v
+python -m tests.test_img -v
+python -m tests.test_incr -v
+python -m tests.test_instr -v
+python -m tests.test_mask -v
+python -m tests.test_multichannel -v
+python -m tests.test_peaks -v
+python -m tests.test_pipeline -v
+python -m tests.test_plan -v
+python -m tests.test_max_pool -v
+python -m tests.test_stats -v
+python -m tests.test_tiles -v
+python -m tests.test_worker -v
 
 pause
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+import w2b.archive as archive
+import w2b.util as util
+
+
+################################################################################
+class TestArchive(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(1)
+        cls.ar = rng.integers(0, 256, size=(33, 1000), dtype="uint8")
+        cls.meta = archive.gen_meta(
+                "test_wav.wav", 44100, 64, 0.875, "ab", 33, "uint8")
+
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir)
+
+
+    def test_round_trip(self):
+        name = os.path.join(self.dir, "round_trip.w2bz")
+        archive.write(name, self.ar, self.meta, chunkCols=128)
+        meta, ar = archive.read(name)
+
+        self.assertEqual(self.meta, meta)
+        self.assertTrue(np.array_equal(self.ar, ar))
+
+
+    def test_random_access(self):
+        name = os.path.join(self.dir, "random_access.w2bz")
+        archive.write(name, self.ar, self.meta, chunkCols=100)
+
+        with archive.Reader(name) as r:
+            self.assertEqual(self.ar.shape, r.shape)
+
+            for c0, c1 in ((0, 1), (99, 101), (250, 730), (999, 1000)):
+                with self.subTest(msg="{} to {}".format(c0, c1)):
+                    self.assertTrue(np.array_equal(
+                        self.ar[:, c0:c1], r[:, c0:c1]))
+
+            self.assertTrue(np.array_equal(self.ar[5, :], r[5, :]))
+            self.assertTrue(np.array_equal(self.ar[:, -1], r[:, -1]))
+            self.assertRaises(ValueError, r.read_cols, 0, 1001)
+
+
+    def test_fields(self):
+        name = os.path.join(self.dir, "fields.w2bz")
+        archive.write(name, self.ar, self.meta)
+
+        with archive.Reader(name) as r:
+            self.assertEqual(
+                    "test_wav.wav___fs44100.0_s64_b33_sf0.0_ef22050.0_" +
+                    "o0.875_ab.w2bz",
+                    util.gen_filename_w_dict(r.fields("w2bz")))
+
+
+    def test_append_overwrites_tail(self):
+        name = os.path.join(self.dir, "append.w2bz")
+        archive.write(name, self.ar[:, 0:600], self.meta, chunkCols=256)
+
+        with archive.Writer(name, append=True, start=500, chunkCols=256) as w:
+            w.append(self.ar[:, 500:1000])
+
+        meta, ar = archive.read(name)
+        self.assertTrue(np.array_equal(self.ar, ar))
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+
+import unittest
+import numpy as np
+
+import w2b.fft as fft
+
+
+################################################################################
+class TestBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fs = 8000
+        cls.size = 256
+        cls.overlapDec = 0.5
+        rng = np.random.default_rng(36)
+        cls.wavs = [rng.uniform(-1.0, 1.0, n).astype("float32")
+                for n in rng.integers(256, 4000, 20)]
+
+    def test_matches_wav2bmp(self):
+        # A small `batchCols' splits the waves over several batches
+        for batchCols in [1, 64, 8192]:
+            ret = fft.wav2bmp_batch(self.fs, self.wavs, self.size,
+                    self.overlapDec, batchCols=batchCols)
+            self.assertEqual(len(self.wavs), len(ret))
+
+            for i in range(0, len(self.wavs)):
+                with self.subTest(msg="batchCols={} wav={}".format(
+                        batchCols, i)):
+                    ab, an, x = fft.wav2bmp(self.fs, self.wavs[i], self.size,
+                            self.overlapDec)
+
+                    self.assertTrue(np.array_equal(ab, ret[i][0]))
+                    self.assertTrue(np.array_equal(an, ret[i][1]))
+                    self.assertTrue(np.array_equal(x, ret[i][2]))
+
+    def test_multichannel(self):
+        wavs = [np.stack([w, -w], axis=1) for w in self.wavs[:4]]
+        ret = fft.wav2bmp_batch(self.fs, wavs, self.size, self.overlapDec)
+
+        for i in range(0, len(wavs)):
+            ab, an, x = fft.wav2bmp(self.fs, wavs[i], self.size,
+                    self.overlapDec)
+            self.assertTrue(np.array_equal(ab, ret[i][0]))
+
+    def test_errors(self):
+        self.assertEqual([], fft.wav2bmp_batch(self.fs, [], self.size))
+
+        with self.assertRaisesRegex(ValueError, "same channels"):
+            fft.wav2bmp_batch(self.fs, [self.wavs[0],
+                    np.zeros((1000, 2), dtype="float32")], self.size)
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
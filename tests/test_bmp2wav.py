@@ -1,11 +1,14 @@
 #!/usr/bin/python3
 
+import os
 import re
+import tempfile
 import unittest
 import matplotlib.pyplot as plt
 import numpy as np
 
 import w2b.fft as fft
+import w2b.jobs as jobs
 import w2b.util as util
 import w2b.wav as wav
 
@@ -130,6 +133,124 @@ class TestBmp2Wav(unittest.TestCase):
         self.assertTrue(np.allclose(ar2, out))
 
 
+    def test_bmp2wav_sparse(self):
+        size = 256
+        overlapDec = 0.875
+        rng = np.random.default_rng(0)
+        ar = rng.uniform(-1.0, 1.0, 100001).astype("float32")
+        ab, an, x = fft.wav2bmp(1000, ar, size, overlapDec, window=None)
+
+        # Edits at both ends, an isolated column and a block of columns
+        mask = np.ones(ab.shape, dtype="float32")
+        mask[:, 0] = 0.0
+        mask[3, 500] = 0.5
+        mask[10:50, 1000:1100] = 0.0
+        mask[:, -3:] = 0.25
+        cols = [0, 500] + list(range(1000, 1100)) + \
+                list(range(ab.shape[1] - 3, ab.shape[1]))
+
+        expected = fft.bmp2wav(1000, ar.size, x, mask, size, overlapDec)
+
+        for c in (None, cols):
+            with self.subTest(msg="cols={}".format(
+                    "found" if c is None else "given")):
+
+                out = fft.bmp2wav_sparse(1000, ar, mask, size, overlapDec, c)
+                self.assertTrue(np.allclose(expected, out, atol=1e-6))
+
+        self.assertTrue(np.array_equal(
+            np.arange(0, 0), fft.get_modified_cols(np.ones(ab.shape))))
+        self.assertTrue(np.array_equal(ar, fft.bmp2wav_sparse(
+            1000, ar, np.ones(ab.shape, dtype="float32"), size, overlapDec)))
+
+
+    def test_bmp2wav_any_size(self):
+        rng = np.random.default_rng(49)
+        ar = rng.uniform(-1.0, 1.0, 5003).astype("float32")
+
+        # Steps that don't divide the size, odd and prime sizes
+        for size, overlapDec in ((1000, 0.7), (100, 0.63), (6, 0.5),
+                (5, 0.4), (7, 0.0), (509, 0.0), (1536, 0.75)):
+            with self.subTest(size=size, overlapDec=overlapDec):
+                ab, an, x = fft.wav2bmp(1000, ar, size, overlapDec,
+                        window=None)
+                mask = np.ones(ab.shape, dtype="float32")
+                out = fft.bmp2wav(1000, ar.size, x, mask, size, overlapDec)
+                self.assertTrue(np.allclose(ar, out, atol=1e-6))
+
+                # Sparse resynthesis agrees, joins included
+                mask[:, 5:8] = 0.5
+                mask[1, -2:] = 0.0
+                expected = fft.bmp2wav(1000, ar.size, x, mask, size,
+                        overlapDec)
+                out = fft.bmp2wav_sparse(1000, ar, mask, size, overlapDec)
+                self.assertTrue(np.allclose(expected, out, atol=1e-6))
+
+
+    def test_bmp2wav_windowed(self):
+        rng = np.random.default_rng(50)
+        ar = rng.uniform(-1.0, 1.0, (6007, 2)).astype("float32")
+
+        for size, overlapDec in ((256, 0.5), (256, 0.75), (1000, 0.7)):
+            with self.subTest(size=size, overlapDec=overlapDec):
+                # The windowed spectrogram (as displayed) is resynthesised
+                # directly
+                ab, an, x = fft.wav2bmp(1000, ar, size, overlapDec)
+                mask = np.ones(ab.shape[1:], dtype="float32")
+                out = fft.bmp2wav(1000, ar.shape[0], x, mask, size,
+                        overlapDec, window=np.hanning)
+                self.assertTrue(np.allclose(ar, out, atol=1e-5))
+
+                # As is plain overlap-add of windowed frames
+                out = fft.bmp2wav(1000, ar.shape[0], x, mask, size,
+                        overlapDec, window=np.hanning, synthWindow=np.ones)
+                self.assertTrue(np.allclose(ar, out, atol=1e-5))
+
+                mask[20:60, 3:9] = 0.0
+                expected = fft.bmp2wav(1000, ar.shape[0], x, mask, size,
+                        overlapDec, window=np.hanning)
+
+                for xs in (None, x):
+                    out = fft.bmp2wav_sparse(1000, ar, mask, size, overlapDec,
+                            window=np.hanning, x=xs)
+                    self.assertTrue(np.allclose(expected, out, atol=1e-5))
+
+        # A Hann window's ends are zero, so it needs some overlap
+        ab, an, x = fft.wav2bmp(1000, ar, 256, 0.0)
+        self.assertRaisesRegex(ValueError, "Windows do not overlap enough",
+                fft.bmp2wav, 1000, ar.shape[0], x, np.ones(ab.shape[1:],
+                dtype="float32"), 256, 0.0, np.hanning)
+
+
+    def test_resynth_zero_overlap(self):
+        self.assertEqual(None, fft.get_resynth_window(256, 0.0, np.hanning))
+        self.assertEqual(np.hanning,
+                fft.get_resynth_window(256, 0.5, np.hanning))
+        self.assertEqual(None, fft.get_resynth_window(256, 0.5, None))
+
+        rng = np.random.default_rng(50)
+        ar = rng.uniform(-0.5, 0.5, (4000, 1)).astype("float32")
+        mask = np.ones((129, 16), dtype="float32")
+        mask[10:20, 3] = 0.0
+
+        # The default window still works with no overlap
+        with tempfile.TemporaryDirectory() as d:
+            fileName = os.path.join(d, "out.wav")
+            jobs.resynth(fileName, 1000, ar, mask, 256, 0.0)
+            self.assertTrue(os.path.getsize(fileName) > 0)
+
+
+    def test_ola_env(self):
+        self.assertTrue(np.array_equal(np.full(4, 2.0),
+                fft.get_ola_env(8, 4)))
+        self.assertTrue(np.array_equal([4.0, 3.0, 3.0],
+                fft.get_ola_env(10, 3)))
+
+        wnd = np.hanning(8)
+        self.assertTrue(np.allclose(wnd[0:4] + wnd[4:8],
+                fft.get_ola_env(8, 4, wnd)))
+
+
 ################################################################################
 if __name__ == "__main__":
     unittest.main()
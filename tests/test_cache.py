@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+import w2b.cache as cache
+
+
+################################################################################
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.store = cache.Cache(os.path.join(self.dir.name, "cache"))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_key(self):
+        key = cache.get_key("abc", 1024, 0.5)
+
+        self.assertEqual(key, cache.get_key("abc", 1024, 0.5, np.hanning))
+
+        # Every field matters
+        others = [
+            cache.get_key("abd", 1024, 0.5),
+            cache.get_key("abc", 512, 0.5),
+            cache.get_key("abc", 1024, 0.75),
+            cache.get_key("abc", 1024, 0.5, None),
+            cache.get_key("abc", 1024, 0.5, np.hamming(1024)),
+            cache.get_key("abc", 1024, 0.5, bins=100),
+            cache.get_key("abc", 1024, 0.5, startFreq=20.0),
+            cache.get_key("abc", 1024, 0.5, endFreq=8000.0),
+            cache.get_key("abc", 1024, 0.5, product="resynth")
+        ]
+
+        self.assertEqual(len(others) + 1, len(set([key] + others)))
+
+    def test_get(self):
+        ar = np.arange(0, 100, dtype="float32").reshape((10, 10))
+        calls = []
+
+        def generate():
+            calls.append(1)
+            return {"ab": ar, "an": -ar}
+
+        for i in range(0, 3):
+            res = self.store.get("k", generate)
+            self.assertTrue(np.array_equal(ar, res["ab"]))
+            self.assertTrue(np.array_equal(-ar, res["an"]))
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual(2, self.store.hits)
+        self.assertEqual(1, self.store.misses)
+
+        # Nothing left aside
+        self.assertEqual(["k.npz"], os.listdir(self.store.dirName))
+
+    def test_lru(self):
+        ar = np.zeros(1000, dtype="uint8")
+
+        for key in ("a", "b", "c"):
+            self.store.save(key, {"x": ar})
+            time.sleep(0.01)
+
+        # Room for three entries
+        entryBytes = os.path.getsize(self.store.get_path("a"))
+        self.store.maxBytes = int(3.5 * entryBytes)
+
+        # "a" is used again, so "b" is now the least recently used
+        self.assertNotEqual(None, self.store.load("a"))
+        time.sleep(0.01)
+        self.store.save("d", {"x": ar})
+
+        self.assertEqual(None, self.store.load("b"))
+
+        for key in ("a", "c", "d"):
+            self.assertNotEqual(None, self.store.load(key))
+
+    def test_oversized_entry_kept(self):
+        self.store.maxBytes = 10
+        self.store.save("big", {"x": np.zeros(1000)})
+        self.assertNotEqual(None, self.store.load("big"))
+
+    def test_concurrent(self):
+        ars = {str(k): np.full((64, 64), k, dtype="float32")
+                for k in range(0, 8)}
+
+        def work(i):
+            key = str(i % 8)
+            res = self.store.get(key, lambda: {"ab": ars[key]})
+            return np.array_equal(ars[key], res["ab"])
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            self.assertTrue(all(executor.map(work, range(0, 200))))
+
+        self.assertEqual(8, len(os.listdir(self.store.dirName)))
+
+    def test_cached(self):
+        wavName = os.path.join(self.dir.name, "a.wav")
+        calls = []
+
+        def generate():
+            calls.append(1)
+            return {"x": np.ones(4)}
+
+        for data in (b"one", b"one", b"two"):
+            with open(wavName, "wb") as f:
+                f.write(data)
+
+            cache.cached(generate, [wavName], 1024, 0.5, store=self.store)
+
+        # The content changed, not the name
+        self.assertEqual(2, len(calls))
+
+    def test_from_env(self):
+        old = os.environ.pop(cache.ENV_VAR, None)
+
+        try:
+            self.assertEqual(None, cache.from_env())
+
+            os.environ[cache.ENV_VAR] = self.store.dirName
+            os.environ[cache.ENV_VAR_MIB] = "2"
+            store = cache.from_env()
+            self.assertEqual(self.store.dirName, store.dirName)
+            self.assertEqual(2 * 1024 * 1024, store.maxBytes)
+        finally:
+            os.environ.pop(cache.ENV_VAR, None)
+            os.environ.pop(cache.ENV_VAR_MIB, None)
+
+            if old != None:
+                os.environ[cache.ENV_VAR] = old
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import numpy as np
+from scipy.io import wavfile
+
+import w2b.archive as archive
+import w2b.fft as fft
+import w2b.util as util
+
+
+# Generous, so as to only catch plotting/image libraries creeping back into the
+# import path (matplotlib alone takes longer than this on a slow machine)
+STARTUP_SECONDS = 3.0
+
+
+################################################################################
+class TestCli(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        cls.fs = 8000
+        cls.size = 256
+        cls.overlapDec = 0.5
+        rng = np.random.default_rng(43)
+        cls.wav = rng.uniform(-0.5, 0.5, (10000, 2)).astype("float32")
+        cls.fileName = os.path.join(cls.dir.name, "test.wav")
+        wavfile.write(cls.fileName, cls.fs, cls.wav)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.dir.cleanup()
+
+    def run_w2b(self, *args):
+        return subprocess.run([sys.executable, "-m", "w2b"] + list(args),
+                capture_output=True, text=True, check=True).stdout.split()
+
+    def test_startup_imports(self):
+        code = ("import sys; import w2b.__main__ as m; "
+                "m.main(sys.argv[1:]); "
+                "print(*[n for n in ('matplotlib', 'imageio') "
+                "if n in sys.modules])")
+
+        out = subprocess.run([sys.executable, "-c", code, "compute",
+                self.fileName, str(self.size), str(self.overlapDec)],
+                capture_output=True, text=True, check=True).stdout.split()
+
+        # Just the two file names
+        self.assertEqual(2, len(out))
+
+    def test_startup_time(self):
+        t0 = time.perf_counter()
+        self.run_w2b("--help")
+        self.assertLess(time.perf_counter() - t0, STARTUP_SECONDS)
+
+    def test_compute(self):
+        fileNames = self.run_w2b("compute", self.fileName, str(self.size),
+                str(self.overlapDec))
+        # As `wav.read()' normalises
+        wav = util.norm(self.wav)
+        ab, an, x = fft.wav2bmp(self.fs, wav, self.size, self.overlapDec)
+
+        self.assertEqual(2, len(fileNames))
+
+        for c in range(0, 2):
+            with np.load(fileNames[c]) as f:
+                self.assertTrue(np.array_equal(ab[c], f["ab"]))
+                self.assertTrue(np.array_equal(an[c], f["an"]))
+
+        fileNames = self.run_w2b("compute", self.fileName, str(self.size),
+                str(self.overlapDec), "--stats")
+        self.assertTrue(np.array_equal(np.load(fileNames[1]),
+                fft.wav2stats(self.fs, wav, self.size,
+                self.overlapDec)[1]))
+
+    def test_export(self):
+        fileNames = self.run_w2b("export", self.fileName, str(self.size),
+                str(self.overlapDec), "--products", "ab-dB")
+
+        # One image and one raw file per channel
+        self.assertEqual(4, len(fileNames))
+
+        for fileName in fileNames:
+            self.assertTrue(os.path.getsize(fileName) > 0)
+
+        # The same files whatever the mode
+        for mode in ("memory", "memmap", "stream"):
+            with self.subTest(msg=mode):
+                self.assertEqual(fileNames, self.run_w2b("export",
+                        self.fileName, str(self.size), str(self.overlapDec),
+                        "--products", "ab-dB", "--mode", mode))
+
+    def test_incremental(self):
+        fileNames = self.run_w2b("export", self.fileName, str(self.size),
+                str(self.overlapDec), "--products", "ab-dB", "--incremental")
+
+        # Two archives per channel, the state and then the images and raw
+        # files
+        self.assertEqual(9, len(fileNames))
+
+        fileNames = self.run_w2b("compute", self.fileName, str(self.size),
+                str(self.overlapDec), "--incremental")
+        wav = util.norm(self.wav)
+        ab, an, x = fft.wav2bmp(self.fs, wav, self.size, self.overlapDec)
+
+        for c in range(0, 2):
+            meta, abC = archive.read(fileNames[c])
+            self.assertTrue(np.array_equal(ab[c], abC))
+
+    def test_resynth(self):
+        spec = os.path.join(self.dir.name, "mask.json")
+
+        with open(spec, "w") as f:
+            f.write('{"shapes": []}')
+
+        outName = os.path.join(self.dir.name, "out.wav")
+        self.run_w2b("resynth", self.fileName, spec, str(self.size),
+                str(self.overlapDec), "-o", outName)
+
+        # An empty vector mask changes nothing
+        fs, out = wavfile.read(outName)
+        self.assertTrue(np.allclose(util.norm(self.wav), out))
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
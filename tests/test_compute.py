@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+import re
+import unittest
+import numpy as np
+
+import w2b.fft as fft
+
+
+################################################################################
+class TestComputeParam(unittest.TestCase):
+    """Parameters: (size, overlapDec, t0, t1)"""
+    @classmethod
+    def setUpClass(cls):
+        cls.fs = 1000
+        rng = np.random.default_rng(0)
+        cls.wav = rng.uniform(-1.0, 1.0, 10001).astype("float32")
+        cls.param_list = [
+                (  64, 0.0   ,    0,     1),
+                (  64, 0.75  ,    0,    10),
+                (  64, 0.75  , 5000,  5001),
+                ( 256, 0.875 , 1234,  4321),
+                ( 256, 0.5   , 9990, 10001),
+                (1024, 0.9375,    0, 10001)
+        ]
+
+    def test_compute_matches_wav2bmp(self):
+        for size, overlapDec, t0, t1 in self.param_list:
+            with self.subTest(msg="size={}, overlapDec={}, t0={}, t1={}"
+                    .format(size, overlapDec, t0, t1)):
+
+                ab, an, x = fft.wav2bmp(self.fs, self.wav, size, overlapDec)
+                ab2, an2, x2, cols = fft.compute(
+                        self.fs, self.wav, size, overlapDec, t0, t1)
+
+                start, step, iters = fft.get_fft_stats(
+                        self.wav.size, size, overlapDec)
+                colStarts = start + (np.arange(0, iters) * step)
+                expected = np.nonzero(
+                        (colStarts < t1) & ((colStarts + size) > t0))[0]
+
+                self.assertTrue(np.array_equal(expected, cols))
+                self.assertTrue(np.allclose(ab[:, cols], ab2))
+                self.assertTrue(np.allclose(an[:, cols], an2))
+                self.assertTrue(np.allclose(x[:, cols], x2))
+
+    def test_compute_seconds(self):
+        ab, an, x, cols = fft.compute(
+                self.fs, self.wav, 256, 0.5, 2.0, 3.0, inSeconds=True)
+        ab2, an2, x2, cols2 = fft.compute(
+                self.fs, self.wav, 256, 0.5, 2000, 3000)
+
+        self.assertTrue(np.array_equal(cols, cols2))
+
+        # The wave is 10.001 s long
+        for t1 in (10.001, 10.0015, 11.0):
+            ab, an, x, cols = fft.compute(
+                    self.fs, self.wav, 256, 0.5, 9.99, t1, inSeconds=True)
+            ab2, an2, x2, cols2 = fft.compute(
+                    self.fs, self.wav, 256, 0.5, 9990, 10001)
+            self.assertTrue(np.array_equal(cols, cols2))
+
+    def test_compute_errors(self):
+        for t0, t1 in ((-1, 10), (10, 10), (0, 10002)):
+            with self.subTest(msg="t0={}, t1={}".format(t0, t1)):
+                self.assertRaisesRegex(
+                        ValueError, re.escape("Expected `0 <= t0 < t1 <= l'"),
+                        fft.compute, self.fs, self.wav, 64, 0.5, t0, t1)
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
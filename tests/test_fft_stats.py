@@ -20,7 +20,11 @@ class TestFftStatsParam(unittest.TestCase):
                 ((  9,   8, 0.0   ), (    0,   8,    2)),
                 ((  9,   8, 0.5   ), (   -4,   4,    4)),
                 ((  9,   8, 0.75  ), (   -6,   2,    8)),
-                ((  9,   8, 0.875 ), (   -7,   1,   16))
+                ((  9,   8, 0.875 ), (   -7,   1,   16)),
+                ((  4,   3, 0.0   ), (    0,   3,    2)),
+                (( 10,   6, 0.5   ), (   -3,   3,    5)),
+                (( 10,   5, 0.4   ), (   -3,   3,    5)),
+                ((1000, 1000, 0.7 ), ( -900, 300,    7))
         ]
 
     def test_fft_stats(self):
@@ -40,10 +44,12 @@ class TestFftStatsErrors(unittest.TestCase):
         cls.param_list = [
                 ((1,  2, 0.0 ), "`n' cannot be less than size"),
                 ((2,  2, 1.0 ), "Overlap must be LT 1.0, GE 0.0"),
-                ((2,  2, 0.87), "Overlap must be 1 / (2^n)"),
+                ((2,  2, 0.87), "Size is not wholly divisible by overlap"),
+                ((4,  3, 0.5 ), "Size is not wholly divisible by overlap"),
+                ((10, 3, 0.9999999999),
+                        "Size is not wholly divisible by overlap"),
                 ((1,  1, 0.0 ), "Size must be GE 2"),
-                ((1, -1, 0.0 ), "Size must be GE 2"),
-                ((4,  3, 0.0 ), "Size must be 2^n")
+                ((1, -1, 0.0 ), "Size must be GE 2")
         ]
 
     def test_fft_stats_errors(self):
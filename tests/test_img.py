@@ -0,0 +1,178 @@
+#!/usr/bin/python3
+
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+import w2b.archive as archive
+import w2b.fft as fft
+import w2b.img as img
+
+
+################################################################################
+class CountingArray(np.ndarray):
+    reads = 0
+
+    def __getitem__(self, key):
+        CountingArray.reads += 1
+        return np.ndarray.__getitem__(self, key)
+
+
+################################################################################
+class TestWriteAll(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fs = 1000
+        cls.size = 64
+        cls.overlapDec = 0.75
+
+        # Two tones and a gap of silence, so that `ab' contains exact zeros
+        t = np.arange(0, 3000) / cls.fs
+        ar = (0.5 * np.sin(2.0 * np.pi * 50.0 * t) +
+                0.25 * np.sin(2.0 * np.pi * 200.0 * t)).astype("float32")
+        ar[1000:1500] = 0.0
+
+        cls.ab, cls.an, x = fft.wav2bmp(cls.fs, ar, cls.size, cls.overlapDec)
+        cls.dir = tempfile.mkdtemp()
+
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir)
+
+
+    def check_same_files(self, prefixA, prefixB):
+        names = os.listdir(self.dir)
+        namesA = sorted(f for f in names if f.startswith(prefixA))
+        namesB = sorted(f for f in names if f.startswith(prefixB))
+        self.assertEqual(len(namesA), len(namesB))
+
+        for a, b in zip(namesA, namesB):
+            self.assertEqual(a[len(prefixA):], b[len(prefixB):])
+
+            with open(os.path.join(self.dir, a), "rb") as f:
+                dataA = f.read()
+
+            with open(os.path.join(self.dir, b), "rb") as f:
+                dataB = f.read()
+
+            self.assertEqual(dataA, dataB, msg=a)
+
+
+    def test_write_all_matches_single_writers(self):
+        # Odd tile size to leave a ragged last tile
+        for tileCols in (7, 1024):
+            with self.subTest(msg="tileCols={}".format(tileCols)):
+                a = os.path.join(self.dir, "a{}.wav".format(tileCols))
+                b = os.path.join(self.dir, "b{}.wav".format(tileCols))
+
+                img.write_abs(a, self.fs, self.size, self.overlapDec, self.ab)
+                img.write_abs_db(
+                        a, self.fs, self.size, self.overlapDec, self.ab)
+                img.write_ang(
+                        a, self.fs, self.size, self.overlapDec, self.ab,
+                        self.an)
+
+                names = img.write_all(
+                        b, self.fs, self.size, self.overlapDec, self.ab,
+                        self.an, tileCols=tileCols)
+
+                self.assertEqual(5, len(names))
+                self.check_same_files(os.path.basename(a),
+                        os.path.basename(b))
+
+
+    def test_write_all_executor(self):
+        a = os.path.join(self.dir, "seq.wav")
+        b = os.path.join(self.dir, "par.wav")
+        c = os.path.join(self.dir, "nowait.wav")
+
+        seqNames = img.write_all(a, self.fs, self.size, self.overlapDec,
+                self.ab, self.an, tileCols=10)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            CountingArray.reads = 0
+            parNames = img.write_all(b, self.fs, self.size, self.overlapDec,
+                    self.ab.view(CountingArray), self.an, tileCols=10,
+                    executor=executor)
+
+            # Once for the statistics and once for every product
+            tiles = -(-self.ab.shape[1] // 10)
+            self.assertEqual(2 * tiles, CountingArray.reads)
+
+            noWaitNames, futures = img.write_all(c, self.fs, self.size,
+                    self.overlapDec, self.ab, self.an, tileCols=10,
+                    executor=executor, wait=False)
+
+            # One each for "ab", "ab-dB" and "an"
+            self.assertEqual(3, len(futures))
+
+            for f in futures:
+                f.result()
+
+        self.assertEqual(len(seqNames), len(parNames))
+        self.assertEqual(len(seqNames), len(noWaitNames))
+        self.check_same_files("seq.wav", "par.wav")
+        self.check_same_files("seq.wav", "nowait.wav")
+
+
+    def test_write_all_archive(self):
+        a = os.path.join(self.dir, "npy.wav")
+        b = os.path.join(self.dir, "w2bz.wav")
+
+        npyNames = img.write_all(a, self.fs, self.size, self.overlapDec,
+                self.ab, products=("ab", "ab-dB"), tileCols=10)
+        arcNames = img.write_all(b, self.fs, self.size, self.overlapDec,
+                self.ab, products=("ab", "ab-dB"), tileCols=10,
+                rawFormat="w2bz")
+
+        for npyName, arcName in zip(npyNames, arcNames):
+            if npyName.endswith(".npy"):
+                meta, ar = archive.read(arcName)
+                self.assertTrue(np.array_equal(np.load(npyName), ar))
+                self.assertEqual(self.size, meta["size"])
+
+        # Appended in order, even when written concurrently
+        c = os.path.join(self.dir, "w2bzpar.wav")
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            parNames = img.write_all(c, self.fs, self.size, self.overlapDec,
+                    self.ab, products=("ab", "ab-dB"), tileCols=10,
+                    rawFormat="w2bz", executor=executor)
+
+        for arcName, parName in zip(arcNames, parNames):
+            if arcName.endswith(".w2bz"):
+                self.assertTrue(np.array_equal(archive.read(arcName)[1],
+                        archive.read(parName)[1]))
+
+
+    def test_write_all_errors(self):
+        b = os.path.join(self.dir, "err.wav")
+
+        self.assertRaises(ValueError, img.write_all, b, self.fs, self.size,
+                self.overlapDec, self.ab, products=("ab", "foo"))
+        self.assertRaises(ValueError, img.write_all, b, self.fs, self.size,
+                self.overlapDec, self.ab, products=("an",))
+        self.assertRaises(ValueError, img.write_all, b, self.fs, self.size,
+                self.overlapDec, self.ab, rawFormat="zip")
+
+
+    def test_write_all_logs(self):
+        c = os.path.join(self.dir, "c.wav")
+
+        with self.assertLogs("w2b.img", level="INFO") as cm:
+            fileNames = img.write_all(c, self.fs, self.size, self.overlapDec,
+                    self.ab, self.an)
+
+        self.assertEqual(len(fileNames), len(cm.output))
+
+        for fileName, line in zip(fileNames, cm.output):
+            self.assertTrue(fileName in line)
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import unittest
+import numpy as np
+import scipy.io.wavfile as wavfile
+
+import w2b.archive as archive
+import w2b.fft as fft
+import w2b.incr as incr
+import w2b.jobs as jobs
+import w2b.util as util
+
+
+################################################################################
+class TestIncr(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fs = 8000
+        rng = np.random.default_rng(47)
+        cls.wav = rng.integers(-20000, 20000, (12000, 2), dtype="int16")
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.fileName = os.path.join(self.dir.name, "grow.wav")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write_wav(self, l, wav=None):
+        wavfile.write(self.fileName, self.fs,
+                (self.wav if wav is None else wav)[0:l])
+
+    def check_archives(self, fileNames, wav, size, overlapDec):
+        ab, an, x = fft.wav2bmp(self.fs, util.norm(wav), size, overlapDec)
+
+        for c in range(0, 2):
+            meta, abC = archive.read(fileNames[c])
+            meta, anC = archive.read(fileNames[2 + c])
+            self.assertTrue(np.array_equal(ab[c], abC))
+            self.assertTrue(np.array_equal(an[c], anC))
+
+    def last_chunk_start(self, fileName):
+        with archive.Reader(fileName) as r:
+            return r.index[-1][0]
+
+    def test_dirty_col(self):
+        for size, overlapDec in ((256, 0.5), (64, 0.875), (128, 0.0)):
+            for l in (size, 1000, 1024, 1031):
+                start, step, iters = fft.get_fft_stats(l, size, overlapDec)
+                c0 = incr.get_dirty_col(l, size, overlapDec)
+                cols = start + (np.arange(0, iters) * step) + size
+
+                # Every column before `c0' is wholly inside the samples
+                self.assertTrue(np.all(cols[0:c0] <= l))
+                self.assertTrue(np.all(cols[c0:] > l))
+
+    def test_append_matches_whole(self):
+        for size, overlapDec in ((256, 0.5), (64, 0.875), (128, 0.0)):
+            with self.subTest(size=size, overlapDec=overlapDec):
+                for l in (3000, 3001, 7000, 12000):
+                    self.write_wav(l)
+                    fileNames = incr.update(self.fileName, size, overlapDec)
+
+                    if l > 3000:
+                        # Only from the old padded columns onwards
+                        self.assertEqual(
+                                incr.get_dirty_col(lastL, size, overlapDec),
+                                self.last_chunk_start(fileNames[0]))
+
+                    lastL = l
+
+                self.check_archives(fileNames, self.wav, size, overlapDec)
+
+    def test_unchanged(self):
+        self.write_wav(5000)
+        fileNames = incr.update(self.fileName, 256, 0.5)
+        mtime = os.stat(fileNames[0]).st_mtime_ns
+
+        incr.update(self.fileName, 256, 0.5)
+        self.assertEqual(mtime, os.stat(fileNames[0]).st_mtime_ns)
+
+    def test_rewritten(self):
+        self.write_wav(5000)
+        incr.update(self.fileName, 256, 0.5)
+
+        # Same length and more, but not an append
+        other = self.wav[::-1].copy()
+        self.write_wav(8000, other)
+        fileNames = incr.update(self.fileName, 256, 0.5)
+
+        self.assertEqual(0, self.last_chunk_start(fileNames[0]))
+        self.check_archives(fileNames, other[0:8000], 256, 0.5)
+
+    def test_float_new_peak(self):
+        wav = (self.wav / 40000.0).astype("float32")
+        wav[100, 1] = 0.8
+        wav[6000, 0] = 0.9
+
+        self.write_wav(5000, wav)
+        incr.update(self.fileName, 256, 0.5)
+        self.write_wav(5500, wav)
+        fileNames = incr.update(self.fileName, 256, 0.5)
+        self.assertNotEqual(0, self.last_chunk_start(fileNames[0]))
+        self.check_archives(fileNames, wav[0:5500], 256, 0.5)
+
+        # Louder samples rescale every column
+        self.write_wav(7000, wav)
+        fileNames = incr.update(self.fileName, 256, 0.5)
+        self.assertEqual(0, self.last_chunk_start(fileNames[0]))
+        self.check_archives(fileNames, wav[0:7000], 256, 0.5)
+
+    def test_export(self):
+        self.write_wav(12000)
+        whole = jobs.export(self.fileName, self.fs, util.norm(self.wav), 256,
+                0.5)
+        data = {}
+
+        for fileName in whole:
+            with open(fileName, "rb") as f:
+                data[fileName] = f.read()
+
+            os.remove(fileName)
+
+        self.write_wav(6000)
+        jobs.export_incremental(self.fileName, 256, 0.5)
+        self.write_wav(12000)
+        fileNames = jobs.export_incremental(self.fileName, 256, 0.5)
+
+        for fileName in whole:
+            self.assertIn(fileName, fileNames)
+
+            with open(fileName, "rb") as f:
+                self.assertEqual(data[fileName], f.read(), msg=fileName)
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
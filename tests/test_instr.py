@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+import w2b.fft as fft
+import w2b.img as img
+import w2b.instr as instr
+
+
+################################################################################
+class TestInstr(unittest.TestCase):
+    def setUp(self):
+        instr.reset()
+
+    def tearDown(self):
+        instr.disable()
+        instr.reset()
+
+    def test_disabled(self):
+        instr.disable()
+
+        with instr.span("stft", 10) as s:
+            s.items = 20
+
+        self.assertTrue(instr.span("stft") is instr.NULL_SPAN)
+        self.assertEqual(0, instr.NULL_SPAN.items)
+        self.assertEqual({}, instr.report())
+
+    def test_nested(self):
+        instr.enable()
+
+        with instr.span("outer", 1):
+            a = np.ones(1 << 20, dtype="uint8")
+
+            with instr.span("inner", 2) as s:
+                b = np.ones(1 << 21, dtype="uint8")
+                del b
+                s.items += 1
+
+            del a
+
+        r = instr.report()
+        self.assertEqual(["inner", "outer"], sorted(r.keys()))
+        self.assertEqual(3, r["inner"]["items"])
+        self.assertEqual(1, r["outer"]["calls"])
+        self.assertTrue(r["inner"]["peakBytes"] >= (1 << 21))
+        self.assertTrue(r["outer"]["peakBytes"] >= (3 << 20))
+        self.assertTrue(r["outer"]["wall"] >= r["inner"]["wall"])
+
+    def test_threads(self):
+        instr.enable()
+
+        def work(i):
+            with instr.span("outer", 1):
+                for j in range(0, 10):
+                    with instr.span("inner", 1):
+                        pass
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(work, range(0, 40)))
+
+        r = instr.report()
+        self.assertEqual(40, r["outer"]["calls"])
+        self.assertEqual(400, r["inner"]["items"])
+
+    def test_pipeline(self):
+        instr.enable()
+
+        fs = 8000
+        size = 256
+        overlapDec = 0.5
+        rng = np.random.default_rng(41)
+        wav = rng.uniform(-1.0, 1.0, 20000).astype("float32")
+
+        ab, an, x = fft.wav2bmp(fs, wav, size, overlapDec, window=None)
+        fft.bmp2wav(fs, wav.shape[0], x, np.ones(ab.shape, dtype="float32"),
+                size, overlapDec)
+
+        with tempfile.TemporaryDirectory() as d:
+            img.write_all(os.path.join(d, "test"), fs, size, overlapDec, ab,
+                    an)
+
+            fileName = os.path.join(d, "report.json")
+            instr.write_report(fileName)
+
+            with open(fileName) as f:
+                r = json.load(f)["stages"]
+
+        for stage in ("stft", "angle", "dB", "colourmap", "img.write",
+                "npy.write", "resynth"):
+            with self.subTest(msg=stage):
+                self.assertTrue(stage in r)
+                self.assertTrue(r[stage]["calls"] > 0)
+
+        self.assertEqual(ab.shape[1], r["stft"]["items"])
+        self.assertEqual(ab.shape[1], r["resynth"]["items"])
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+
+import unittest
+import numpy as np
+from scipy.ndimage import maximum_filter
+
+import w2b.fft as fft
+import w2b.mask as mask
+
+
+################################################################################
+def replicate_harmonics_slow(m):
+    """The original per-column loop from gen_harmonics.py."""
+
+    mask2 = np.array(m, dtype="float32")
+    mask3 = np.array(m, dtype="float32")
+    fn = mask2.shape[0]
+    tn = mask2.shape[1]
+    z = np.zeros(fn, dtype="float32")
+
+    for t in range(0, tn):
+        low = -1
+        high = -1
+
+        closeArray = np.isclose(z, mask2[:, t])
+
+        for f in range(0, fn):
+            if (low == -1) and (~closeArray[f]):
+                low = f
+            elif (low != -1) and (high == -1) and closeArray[f]:
+                high = f
+                break
+
+        if (low != -1) and (high != -1):
+            frange = int(high - low)
+            frangeDiv2 = int(frange / 2.0)
+            fundFreqIdx = low + frangeDiv2
+            nextFreqIdx = fundFreqIdx * 2
+
+            while (nextFreqIdx + frangeDiv2) < fn:
+                dstStart = nextFreqIdx - frangeDiv2
+                dstEnd = nextFreqIdx + frangeDiv2
+                srcStart = fundFreqIdx - frangeDiv2
+                srcEnd = fundFreqIdx + frangeDiv2
+
+                mask3[dstStart:dstEnd, t] = mask2[srcStart:srcEnd, t]
+
+                nextFreqIdx += fundFreqIdx
+
+    return mask3
+
+
+################################################################################
+class TestReplicateHarmonics(unittest.TestCase):
+    def test_matches_script(self):
+        rng = np.random.default_rng(5)
+        fn = 257
+        tn = 300
+        m = np.zeros((fn, tn), dtype="float32")
+
+        # A band per column, from a handful of distinct bands, with some
+        # empty columns and some bands that run to the top bin
+        for t in range(0, tn):
+            kind = rng.integers(0, 5)
+
+            if kind == 0:
+                continue
+
+            low = int(rng.integers(1, 40)) if kind < 4 else 200
+            high = low + int(rng.integers(1, 12)) if kind < 4 else fn
+            m[low:high, t] = rng.uniform(0.1, 1.0, high - low)
+
+        self.assertTrue(np.array_equal(
+            replicate_harmonics_slow(m), mask.replicate_harmonics(m)))
+
+    def test_extents(self):
+        m = np.zeros((8, 4), dtype="float32")
+        m[2:5, 1] = 1.0
+        m[6:8, 2] = 1.0
+        m[0, 3] = 1.0
+        m[3, 3] = 1.0
+
+        low, high = mask.get_extents(m)
+        self.assertEqual([-1, 2, 6, 0], list(low))
+        self.assertEqual([-1, 5, -1, 1], list(high))
+
+    def test_fundamental_bin_zero(self):
+        m = np.zeros((8, 1), dtype="float32")
+        m[0, 0] = 1.0
+
+        self.assertTrue(np.array_equal(m, mask.replicate_harmonics(m)))
+
+
+################################################################################
+class TestMaskExpr(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(6)
+        cls.shape = (65, 400)
+        cls.a = (rng.random(cls.shape) > 0.95).astype("float32")
+        cls.b = rng.random(cls.shape).astype("float32")
+
+    def check_tiles(self, expr, expected):
+        for tileCols in (1, 7, 256, 1000):
+            with self.subTest(msg="tileCols={}".format(tileCols)):
+                actual = np.concatenate(
+                        [t for c0, c1, t in expr.iter_tiles(tileCols)],
+                        axis=1)
+                self.assertTrue(np.allclose(expected, actual))
+
+    def test_operators(self):
+        a = mask.Image(self.a)
+        b = mask.Image(self.b)
+
+        self.check_tiles(a | b, np.maximum(self.a, self.b))
+        self.check_tiles(a & b, np.minimum(self.a, self.b))
+        self.check_tiles(0.5 * a * b, 0.5 * self.a * self.b)
+        self.assertRaises(ValueError, mask.Union, a, mask.Const((65, 1)))
+
+    def test_band(self):
+        band = mask.Band(self.shape, 10, 20, 0.0, 1.0)
+        expected = np.ones(self.shape, dtype="float32")
+        expected[10:20, :] = 0.0
+
+        self.check_tiles(band, expected)
+
+    def test_dilate(self):
+        expr = mask.Dilate(mask.Image(self.a), timeCols=3, freqBins=2)
+        self.check_tiles(expr, maximum_filter(self.a, size=(5, 7)))
+
+    def test_harmonics(self):
+        m = np.zeros(self.shape, dtype="float32")
+        m[5:9, 100:300] = 1.0
+
+        self.check_tiles(mask.Harmonics(mask.Image(m)),
+                replicate_harmonics_slow(m))
+
+    def test_bmp2wav(self):
+        size = 64
+        overlapDec = 0.75
+        rng = np.random.default_rng(7)
+        ar = rng.uniform(-1.0, 1.0, 5000).astype("float32")
+        ab, an, x = fft.wav2bmp(1000, ar, size, overlapDec, window=None)
+
+        expr = mask.Band(ab.shape, 3, 8, 0.0, 1.0) * \
+                mask.Dilate(mask.Image(ab > 0.01), timeCols=2)
+        out = fft.bmp2wav(1000, ar.size, x, expr, size, overlapDec)
+        expected = fft.bmp2wav(1000, ar.size, x, expr.eval(), size,
+                overlapDec)
+
+        self.assertTrue(np.allclose(expected, out))
+
+
+################################################################################
+class TestVectorMask(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fs = 1000
+        cls.l = 5000
+
+    def test_band(self):
+        spec = {"shapes": [
+            {"type": "band", "f0": 100.0, "f1": 200.0, "t0": 1.0, "t1": 2.0,
+                "gain": 0.25}]}
+
+        for size, overlapDec in ((64, 0.5), (256, 0.875)):
+            with self.subTest(msg="size={}, overlapDec={}".format(
+                    size, overlapDec)):
+
+                v = mask.Vector(spec, self.fs, self.l, size, overlapDec)
+                freqs = np.fft.rfftfreq(size, d=(1.0 / self.fs))
+                times = fft.get_col_times(self.fs, self.l, size, overlapDec)
+                rows = (freqs >= 100.0) & (freqs < 200.0)
+                cols = (times >= 1.0) & (times < 2.0)
+
+                expected = np.ones(v.shape, dtype="float32")
+                expected[np.ix_(rows, cols)] = 0.25
+
+                self.assertEqual((size // 2 + 1, times.size), v.shape)
+                self.assertTrue(np.array_equal(expected, v.eval()))
+
+    def test_polygon(self):
+        # A triangle, and gains multiplying where shapes overlap
+        spec = {"gain": 0.5, "shapes": [
+            {"type": "polygon", "gain": 0.0,
+                "points": [[1.0, 100.0], [3.0, 100.0], [1.0, 300.0]]},
+            {"type": "band", "f0": 0.0, "f1": 50.0, "gain": 2.0}]}
+        v = mask.Vector(spec, self.fs, self.l, 128, 0.75)
+
+        freqs = np.fft.rfftfreq(128, d=(1.0 / self.fs))[:, np.newaxis]
+        times = fft.get_col_times(self.fs, self.l, 128, 0.75)[np.newaxis, :]
+        inside = (times > 1.0) & (freqs > 100.0) & \
+                (freqs < 300.0 - (100.0 * (times - 1.0)))
+
+        expected = np.full(v.shape, 0.5, dtype="float32")
+        expected[inside] = 0.0
+        expected[freqs[:, 0] < 50.0, :] *= 2.0
+
+        self.assertTrue(np.array_equal(expected, v.eval()))
+
+    def test_unknown_shape(self):
+        self.assertRaises(ValueError, mask.Vector,
+                {"shapes": [{"type": "circle"}]}, self.fs, self.l, 64, 0.5)
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
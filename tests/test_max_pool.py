@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+import unittest
+import numpy as np
+
+import w2b.util as util
+
+
+################################################################################
+class TestMaxPoolParam(unittest.TestCase):
+    """Parameters: (shape, rowFactor, colFactor, stripCols)"""
+    @classmethod
+    def setUpClass(cls):
+        cls.param_list = [
+                ((  1,    1), 1, 1, 256),
+                (( 10,   10), 1, 1, 256),
+                ((  7,    5), 2, 2, 256),
+                (( 33, 1000), 3, 7,  13),
+                ((  4,  600), 4, 2,   1),
+                ((513,   17), 1, 20, 256)
+        ]
+
+    def pool_slow(self, ar, other, rowFactor, colFactor):
+        rows = -(-ar.shape[0] // rowFactor)
+        cols = -(-ar.shape[1] // colFactor)
+        ret = np.ndarray((rows, cols), dtype=ar.dtype)
+        retOther = np.ndarray((rows, cols), dtype=other.dtype)
+
+        for i in range(0, rows):
+            for j in range(0, cols):
+                r = slice(i * rowFactor, (i + 1) * rowFactor)
+                c = slice(j * colFactor, (j + 1) * colFactor)
+                k = np.unravel_index(np.argmax(ar[r, c]), ar[r, c].shape)
+                ret[i, j] = ar[r, c][k]
+                retOther[i, j] = other[r, c][k]
+
+        return ret, retOther
+
+    def test_max_pool(self):
+        rng = np.random.default_rng(3)
+
+        for shape, rowFactor, colFactor, stripCols in self.param_list:
+            with self.subTest(msg="shape={}, factors=({}, {})".format(
+                    shape, rowFactor, colFactor)):
+
+                ar = rng.random(shape).astype("float32")
+                other = rng.random(shape)
+                expected, expectedOther = self.pool_slow(
+                        ar, other, rowFactor, colFactor)
+
+                actual = util.max_pool(ar, rowFactor, colFactor,
+                        stripCols=stripCols)
+                actual2, actualOther = util.max_pool(ar, rowFactor, colFactor,
+                        other, stripCols=stripCols)
+
+                self.assertTrue(np.array_equal(expected, actual))
+                self.assertTrue(np.array_equal(expected, actual2))
+                self.assertTrue(np.array_equal(expectedOther, actualOther))
+
+    def test_max_pool_db_commutes(self):
+        rng = np.random.default_rng(4)
+        ab = rng.random((64, 300)).astype("float32")
+        ab[:, 100:120] = 0.0
+        dbMin = util.mag2db_min(np.amin(20.0 * np.ma.log10(ab)))
+
+        self.assertTrue(np.allclose(
+            util.max_pool(util.mag2db_norm(ab), 4, 9),
+            util.mag2db_norm(util.max_pool(ab, 4, 9), dbMin)))
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
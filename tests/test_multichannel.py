@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+
+import unittest
+import numpy as np
+
+import w2b.fft as fft
+
+
+################################################################################
+class TestMultichannel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fs = 1000
+        cls.size = 128
+        cls.overlapDec = 0.75
+        rng = np.random.default_rng(8)
+        cls.wav = rng.uniform(-1.0, 1.0, (5001, 3)).astype("float32")
+
+    def test_wav2bmp_matches_mono(self):
+        ab, an, x = fft.wav2bmp(self.fs, self.wav, self.size, self.overlapDec)
+        self.assertEqual(3, ab.shape[0])
+
+        for c in range(0, 3):
+            with self.subTest(msg="channel={}".format(c)):
+                ab2, an2, x2 = fft.wav2bmp(self.fs, self.wav[:, c], self.size,
+                        self.overlapDec)
+
+                self.assertTrue(np.array_equal(ab2, ab[c]))
+                self.assertTrue(np.array_equal(an2, an[c]))
+                self.assertTrue(np.array_equal(x2, x[c]))
+
+    def test_compute_matches_wav2bmp(self):
+        ab, an, x = fft.wav2bmp(self.fs, self.wav, self.size, self.overlapDec)
+        ab2, an2, x2, cols = fft.compute(self.fs, self.wav, self.size,
+                self.overlapDec, 1000, 2000)
+
+        self.assertTrue(np.allclose(ab[:, :, cols], ab2))
+
+    def test_bmp2wav_shared_and_per_channel_mask(self):
+        ab, an, x = fft.wav2bmp(self.fs, self.wav, self.size, self.overlapDec,
+                window=None)
+        l = self.wav.shape[0]
+
+        shared = np.ones(ab.shape[1:], dtype="float32")
+        shared[10:20, 50:60] = 0.0
+        perChannel = np.ones(ab.shape, dtype="float32")
+        perChannel[1, 30:40, 5:25] = 0.0
+
+        for mask in (shared, perChannel):
+            with self.subTest(msg="mask shape={}".format(mask.shape)):
+                out = fft.bmp2wav(self.fs, l, x, mask, self.size,
+                        self.overlapDec)
+                sparse = fft.bmp2wav_sparse(self.fs, self.wav, mask, self.size,
+                        self.overlapDec)
+                self.assertEqual(self.wav.shape, out.shape)
+                self.assertTrue(np.allclose(out, sparse, atol=1e-6))
+
+                for c in range(0, 3):
+                    if mask.ndim == 3:
+                        m = mask[c]
+                    else:
+                        m = mask
+
+                    expected = fft.bmp2wav(self.fs, l, x[c], m, self.size,
+                            self.overlapDec)
+                    self.assertTrue(np.allclose(expected, out[:, c]))
+
+    def test_bmp2wav_round_trip(self):
+        ab, an, x = fft.wav2bmp(self.fs, self.wav, self.size, self.overlapDec,
+                window=None)
+        mask = np.ones(ab.shape[1:], dtype="float32")
+        out = fft.bmp2wav(self.fs, self.wav.shape[0], x, mask, self.size,
+                self.overlapDec)
+
+        self.assertTrue(np.allclose(self.wav, out, atol=1e-6))
+
+    def test_errors(self):
+        self.assertRaises(ValueError, fft.wav2bmp, self.fs,
+                np.zeros((1000, 2, 2), dtype="float32"), self.size)
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
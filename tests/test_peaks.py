@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import unittest
+import numpy as np
+
+import w2b.fft as fft
+import w2b.jobs as jobs
+import w2b.peaks as peaks
+
+
+################################################################################
+class TestPeakIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fs = 8000
+        cls.size = 256
+        cls.overlapDec = 0.5
+
+        # Quiet noise, with a tone switched on at 1 s and 2 s
+        rng = np.random.default_rng(38)
+        t = np.arange(0, 3 * cls.fs) / cls.fs
+        cls.wav = rng.uniform(-0.01, 0.01, t.shape[0])
+        cls.wav[cls.fs:] += 0.5 * np.sin(2.0 * np.pi * 1000.0 * t[cls.fs:])
+        cls.wav[(2 * cls.fs):] += 0.5 * np.sin(2.0 * np.pi * 2500.0 *
+                t[(2 * cls.fs):])
+        cls.wav = cls.wav.astype("float32")
+
+    def test_incremental_matches_whole(self):
+        ab, an, x = fft.wav2bmp(self.fs, self.wav, self.size, self.overlapDec)
+        whole = peaks.PeakIndex(self.fs, self.size, self.overlapDec, k=4)
+        whole.update(ab)
+
+        blocks = peaks.PeakIndex(self.fs, self.size, self.overlapDec, k=4)
+
+        for c0 in range(0, ab.shape[1], 7):
+            blocks.update(ab[:, c0:(c0 + 7)])
+
+        self.assertEqual(ab.shape[1], len(blocks))
+        self.assertTrue(np.array_equal(whole.peaks()[0], blocks.peaks()[0]))
+        self.assertTrue(np.array_equal(whole.peaks()[1], blocks.peaks()[1]))
+        self.assertTrue(np.allclose(whole.flux(), blocks.flux()))
+
+    def test_top_k(self):
+        index = peaks.PeakIndex(self.fs, self.size, self.overlapDec, k=3)
+        ab, an, x = fft.wav2bmp(self.fs, self.wav, self.size, self.overlapDec,
+                index=index)
+        bins, mags = index.peaks()
+
+        self.assertEqual((3, ab.shape[1]), bins.shape)
+        self.assertTrue(np.array_equal(np.argmax(ab, axis=0), bins[0]))
+        self.assertTrue(np.array_equal(np.sort(ab, axis=0)[::-1][:3], mags))
+
+    def test_onsets(self):
+        index = peaks.PeakIndex(self.fs, self.size, self.overlapDec)
+        fft.wav2bmp(self.fs, self.wav, self.size, self.overlapDec, index=index)
+        times = index.onset_times()
+
+        # Both tones, and nothing else until the (zero-padded) end; a frame is
+        # 32 ms here
+        times = times[times < 2.9]
+        self.assertEqual(2, times.shape[0])
+        self.assertTrue(np.allclose([1.0, 2.0], times, atol=0.032))
+
+    def test_save_load_update(self):
+        ab, an, x = fft.wav2bmp(self.fs, self.wav, self.size, self.overlapDec)
+        whole = peaks.PeakIndex(self.fs, self.size, self.overlapDec)
+        whole.update(ab)
+
+        index = peaks.PeakIndex(self.fs, self.size, self.overlapDec)
+        index.update(ab[:, :100])
+
+        with tempfile.TemporaryDirectory() as d:
+            fileName = os.path.join(d, "peaks.npz")
+            index.save(fileName)
+            loaded = peaks.load(fileName)
+
+        loaded.update(ab[:, 100:])
+
+        self.assertEqual(whole.size, loaded.size)
+        self.assertTrue(np.array_equal(whole.peaks()[0], loaded.peaks()[0]))
+        self.assertTrue(np.allclose(whole.flux(), loaded.flux()))
+
+    def test_multichannel(self):
+        wav = np.stack([self.wav, self.wav[::-1]], axis=1)
+        index = [peaks.PeakIndex(self.fs, self.size, self.overlapDec)
+                for c in range(0, 2)]
+        ab, an, x = fft.wav2bmp(self.fs, wav, self.size, self.overlapDec,
+                index=index)
+
+        for c in range(0, 2):
+            self.assertTrue(np.array_equal(np.argmax(ab[c], axis=0),
+                    index[c].peaks()[0][0]))
+
+        # As `wav2bmp.py' feeds it
+        jobsIndex = [peaks.PeakIndex(self.fs, self.size, self.overlapDec)
+                for c in range(0, 2)]
+        jobs.transform(self.fs, wav, self.size, self.overlapDec,
+                index=jobsIndex)
+
+        for c in range(0, 2):
+            self.assertTrue(np.array_equal(index[c].peaks()[0],
+                    jobsIndex[c].peaks()[0]))
+            self.assertTrue(np.array_equal(index[c].flux(),
+                    jobsIndex[c].flux()))
+
+    def test_errors(self):
+        index = peaks.PeakIndex(self.fs, self.size, self.overlapDec)
+
+        with self.assertRaisesRegex(ValueError, "Expected"):
+            index.update(np.zeros((10, 10)))
+
+        self.assertEqual(0, index.onsets().shape[0])
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
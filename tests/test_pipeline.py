@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+import numpy as np
+from scipy.io import wavfile
+
+import w2b.jobs as jobs
+import w2b.pipeline as pipeline
+
+
+################################################################################
+class TestPipeline(unittest.TestCase):
+    def test_order_and_results(self):
+        ret = pipeline.run_stages(range(0, 20), [lambda i: i + 1,
+                lambda i: i * 2, str], queueSize=1)
+
+        self.assertEqual([str((i + 1) * 2) for i in range(0, 20)], ret)
+
+    def test_back_pressure(self):
+        lock = threading.Lock()
+        state = {"inFlight": 0, "most": 0}
+
+        def start(i):
+            with lock:
+                state["inFlight"] += 1
+                state["most"] = max(state["most"], state["inFlight"])
+
+            return i
+
+        def slow(i):
+            time.sleep(0.002)
+            return i
+
+        def finish(i):
+            time.sleep(0.01)
+
+            with lock:
+                state["inFlight"] -= 1
+
+            return i
+
+        queueSize = 2
+        stages = [start, slow, finish]
+        ret = pipeline.run_stages(range(0, 50), stages, queueSize)
+
+        self.assertEqual(list(range(0, 50)), ret)
+        self.assertLessEqual(state["most"],
+                len(stages) + ((len(stages) - 1) * queueSize))
+
+    def test_error(self):
+        def fail(i):
+            if i == 3:
+                raise ValueError("three")
+
+            return i
+
+        with self.assertRaisesRegex(ValueError, "three"):
+            pipeline.run_stages(range(0, 10), [fail, str], queueSize=1)
+
+    def test_export_all(self):
+        rng = np.random.default_rng(45)
+
+        with tempfile.TemporaryDirectory() as d:
+            fileNames = []
+
+            for i in range(0, 4):
+                fileName = os.path.join(d, "{}.wav".format(i))
+                wavfile.write(fileName, 8000, rng.uniform(-0.5, 0.5,
+                        (3000 + (1000 * i), 1 + (i % 2))).astype("float32"))
+                fileNames.append(fileName)
+
+            ret = pipeline.export_all(fileNames, 256, 0.5, queueSize=1)
+            data = {}
+
+            for outNames in ret:
+                for outName in outNames:
+                    with open(outName, "rb") as f:
+                        data[outName] = f.read()
+
+            for fileName, outNames in zip(fileNames, ret):
+                fs, s, l = jobs.read_channels(fileName)
+                self.assertEqual(outNames, jobs.export(fileName, fs, s, 256,
+                        0.5))
+
+                for outName in outNames:
+                    with open(outName, "rb") as f:
+                        self.assertEqual(data[outName], f.read())
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from scipy.io import wavfile
+
+import w2b.fft as fft
+import w2b.img as img
+import w2b.jobs as jobs
+import w2b.plan as plan
+import w2b.wav as wav
+
+
+################################################################################
+class TestPlan(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        cls.fs = 8000
+        cls.size = 256
+        cls.overlapDec = 0.75
+        cls.wav = np.zeros((12345, 2), dtype="int16")
+        cls.fileName = os.path.join(cls.dir.name, "test.wav")
+        wavfile.write(cls.fileName, cls.fs, cls.wav)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.dir.cleanup()
+
+    def test_read_header(self):
+        header = plan.read_header(self.fileName)
+
+        self.assertEqual({"fs": self.fs, "channels": 2, "bits": 16,
+                "length": 12345}, header)
+
+    def test_read_header_skips_chunks(self):
+        fileName = os.path.join(self.dir.name, "list.wav")
+
+        # An odd-length chunk (plus its pad byte) before "fmt "
+        with open(self.fileName, "rb") as f:
+            data = f.read()
+
+        extra = b"LIST" + (3).to_bytes(4, "little") + b"abc\0"
+
+        with open(fileName, "wb") as f:
+            f.write(data[:12] + extra + data[12:])
+
+        self.assertEqual(12345, plan.read_header(fileName)["length"])
+
+        with open(fileName, "wb") as f:
+            f.write(b"RIFF\0\0\0\0JUNK")
+
+        with self.assertRaisesRegex(ValueError, "Not a RIFF WAVE"):
+            plan.read_header(fileName)
+
+    def test_sizes_match_files(self):
+        l = self.wav.shape[0]
+        start, step, iters = fft.get_fft_stats(l, self.size, self.overlapDec)
+        sizes = plan.get_sizes(l, 1, self.size, self.overlapDec)
+        rng = np.random.default_rng(39)
+        ab, an, x = fft.wav2bmp(self.fs, rng.uniform(-1.0, 1.0, l).astype(
+                "float32"), self.size, self.overlapDec)
+
+        self.assertEqual(ab.nbytes, sizes["ab"])
+        self.assertEqual(an.nbytes, sizes["an"])
+        self.assertEqual(x.nbytes, sizes["x"])
+
+        fileNames = img.write_all(os.path.join(self.dir.name, "sizes"),
+                self.fs, self.size, self.overlapDec, ab, an)
+
+        for fileName in fileNames:
+            p = fileName.split("_")[-1]
+
+            with self.subTest(msg=p):
+                self.assertEqual(os.path.getsize(fileName), sizes[p])
+
+    def test_choose_mode(self):
+        sizes = plan.get_sizes(10000000, 2, 4096, 0.9375)
+        modeBytes = plan.get_mode_bytes(sizes)
+
+        self.assertEqual("memory", plan.choose_mode(sizes,
+                modeBytes["memory"]))
+        self.assertEqual("memmap", plan.choose_mode(sizes,
+                modeBytes["memory"] - 1))
+        self.assertEqual("stream", plan.choose_mode(sizes,
+                modeBytes["memmap"] - 1))
+
+        with self.assertRaisesRegex(ValueError, "Nothing fits"):
+            plan.choose_mode(sizes, modeBytes["stream"] - 1)
+
+    def test_plan(self):
+        p = plan.plan(self.fileName, self.size, self.overlapDec,
+                budget=(1 << 40), secsPerCol=0.001)
+        start, step, iters = fft.get_fft_stats(12345, self.size,
+                self.overlapDec)
+
+        self.assertEqual(iters, p["iters"])
+        self.assertEqual("memory", p["mode"])
+        self.assertAlmostEqual(iters * 0.001, p["seconds"])
+
+        p = plan.plan(self.fileName, self.size, self.overlapDec, budget=1,
+                secsPerCol=0.001)
+        self.assertEqual(None, p["mode"])
+
+    def test_memmap_mode(self):
+        rng = np.random.default_rng(39)
+        wav = rng.uniform(-1.0, 1.0, (5000, 2)).astype("float32")
+        ab, an, x = fft.wav2bmp(self.fs, wav, self.size, self.overlapDec)
+
+        abMap = np.lib.format.open_memmap(os.path.join(self.dir.name,
+                "ab.npy"), mode="w+", dtype="float32", shape=ab.shape)
+        ret = fft.wav2bmp(self.fs, wav, self.size, self.overlapDec,
+                out=(abMap, None, None))
+
+        self.assertTrue(ret[0] is abMap)
+        self.assertEqual(None, ret[1])
+        self.assertTrue(np.array_equal(ab, abMap))
+
+        with self.assertRaisesRegex(ValueError, "Expected `out'"):
+            fft.wav2bmp(self.fs, wav[:, 0], self.size, self.overlapDec,
+                    out=(abMap, None, None))
+
+    def test_get_mode(self):
+        self.assertEqual("memory", plan.get_mode(self.fileName, self.size,
+                self.overlapDec, budget=(1 << 40)))
+
+        # Nothing fits, so the leanest
+        self.assertEqual("stream", plan.get_mode(self.fileName, self.size,
+                self.overlapDec, budget=1))
+
+    def test_samples(self):
+        rng = np.random.default_rng(39)
+
+        for dtype in ("int16", "float32"):
+            with self.subTest(msg=dtype):
+                fileName = os.path.join(self.dir.name, dtype + ".wav")
+                ar = rng.uniform(-0.5, 0.5, (5000, 2))
+
+                if dtype == "int16":
+                    ar = (ar * 32767).astype(dtype)
+                else:
+                    ar = ar.astype(dtype)
+
+                wavfile.write(fileName, self.fs, ar)
+                fs, s, l = jobs.read_channels(fileName)
+                samples = wav.Samples(fileName, blockLen=1000)
+
+                self.assertEqual(self.fs, samples.fs)
+                self.assertEqual(s.shape, samples.shape)
+                self.assertTrue(np.array_equal(s, samples[:]))
+                self.assertTrue(np.array_equal(s[123:4567],
+                        samples[123:4567]))
+
+    def test_stream(self):
+        rng = np.random.default_rng(39)
+        s = rng.uniform(-1.0, 1.0, (5000, 2)).astype("float32")
+        ab, an = jobs.transform(self.fs, s, self.size, self.overlapDec)
+        stream = plan.Stream(s, self.size, self.overlapDec)
+
+        for c in range(0, 2):
+            abView = stream.view("ab", c)
+            anView = stream.view("an", c)
+            self.assertEqual(ab[c].shape, abView.shape)
+            self.assertTrue(np.array_equal(ab[c][:, 10:30], abView[:, 10:30]))
+            self.assertTrue(np.array_equal(an[c][:, 10:30], anView[:, 10:30]))
+            self.assertTrue(np.array_equal(ab[c][:, 70:], abView[:, 70:]))
+
+        with self.assertRaisesRegex(ValueError, "Expected"):
+            abView[5, 10:30]
+
+        with self.assertRaisesRegex(ValueError, "Expected"):
+            abView[:, 10:30:2]
+
+    def test_export_modes(self):
+        rng = np.random.default_rng(39)
+        ar = rng.uniform(-0.5, 0.5, (5000, 2)).astype("float32")
+        files = {}
+
+        for mode in plan.MODES:
+            dirName = os.path.join(self.dir.name, mode)
+            os.mkdir(dirName)
+            fileName = os.path.join(dirName, "test.wav")
+            wavfile.write(fileName, self.fs, ar)
+
+            if mode == "stream":
+                s = wav.Samples(fileName)
+                fs = s.fs
+            else:
+                fs, s, l = jobs.read_channels(fileName)
+
+            names = jobs.export(fileName, fs, s, self.size, self.overlapDec,
+                    mode=mode)
+            files[mode] = {}
+
+            for name in names:
+                with open(name, "rb") as f:
+                    files[mode][os.path.basename(name)] = f.read()
+
+            # The memory maps are gone
+            self.assertEqual(len(names) + 1, len(os.listdir(dirName)))
+
+        self.assertEqual(files["memory"], files["memmap"])
+        self.assertEqual(files["memory"], files["stream"])
+
+        with self.assertRaisesRegex(ValueError, "Can't plot"):
+            jobs.export(fileName, fs, s, self.size, self.overlapDec,
+                    plot=True, mode="stream")
+
+    def test_calibrate(self):
+        self.assertTrue(plan.calibrate(self.size, self.overlapDec, 2,
+                cols=64, repeat=1) > 0.0)
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+
+import unittest
+import numpy as np
+
+import w2b.fft as fft
+
+
+################################################################################
+class TestStats(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fs = 8000
+        cls.size = 256
+        cls.overlapDec = 0.75
+        rng = np.random.default_rng(37)
+        cls.wav = rng.uniform(-1.0, 1.0, 100001).astype("float32")
+
+    def test_matches_wav2bmp(self):
+        ab, an, x = fft.wav2bmp(self.fs, self.wav, self.size, self.overlapDec)
+        stats = fft.wav2stats(self.fs, self.wav, self.size, self.overlapDec)
+        freqs = np.arange(0, ab.shape[0]) * self.fs / self.size
+
+        self.assertEqual((ab.shape[1],), stats.shape)
+        self.assertTrue(np.array_equal(fft.get_col_times(self.fs,
+                self.wav.shape[0], self.size, self.overlapDec), stats["time"]))
+        self.assertTrue(np.array_equal(np.argmax(ab, axis=0), stats["peak"]))
+        self.assertTrue(np.allclose(np.sum(freqs[:, np.newaxis] * ab, axis=0)
+                / np.sum(ab, axis=0), stats["centroid"]))
+
+    def test_rms(self):
+        stats = fft.wav2stats(self.fs, self.wav, self.size, self.overlapDec,
+                window=None)
+        start, step, iters = fft.get_fft_stats(self.wav.shape[0], self.size,
+                self.overlapDec)
+        frames = fft.get_frames(self.wav, self.size, start, step, 0, iters)
+
+        self.assertTrue(np.allclose(np.sqrt(np.mean(np.square(frames),
+                axis=0)), stats["rms"], rtol=1e-4))
+
+    def test_tone_and_silence(self):
+        t = np.arange(0, 20000) / self.fs
+        tone = (0.5 * np.sin(2.0 * np.pi * 1000.0 * t)).astype("float32")
+        wav = np.stack([tone, np.zeros_like(tone)], axis=1)
+        stats = fft.wav2stats(self.fs, wav, self.size, self.overlapDec,
+                window=None)
+
+        # Away from the (zero-padded) ends
+        mid = stats[0, 10:-10]
+        self.assertTrue(np.all(mid["peak"] == 1000 * self.size / self.fs))
+        self.assertTrue(np.allclose(mid["centroid"], 1000.0))
+        self.assertTrue(np.allclose(mid["rms"], 0.5 / np.sqrt(2.0)))
+
+        self.assertTrue(np.all(stats[1]["rms"] == 0.0))
+        self.assertTrue(np.all(stats[1]["centroid"] == 0.0))
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+
+import unittest
+import numpy as np
+
+import w2b.fft as fft
+import w2b.tiles as tiles
+import w2b.util as util
+
+
+################################################################################
+class TestTileCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        tile = np.zeros(100, dtype="uint8")
+        cache = tiles.TileCache(maxBytes=300)
+
+        for key in ("a", "b", "c"):
+            cache.get(key, lambda: tile.copy())
+
+        # Touch "a" so that "b" is the least recently used
+        cache.get("a", lambda: None)
+        cache.get("d", lambda: tile.copy())
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertIn("d", cache)
+        self.assertEqual(300, cache.nbytes)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(4, cache.misses)
+
+    def test_oversized_tile_kept(self):
+        cache = tiles.TileCache(maxBytes=10)
+        cache.get("a", lambda: np.zeros(100, dtype="uint8"))
+
+        self.assertIn("a", cache)
+
+
+################################################################################
+class TestTileSource(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.fs = 1000
+        cls.size = 64
+        cls.overlapDec = 0.75
+        rng = np.random.default_rng(2)
+        cls.wav = rng.uniform(-1.0, 1.0, 20000).astype("float32")
+        cls.ab, an, x = fft.wav2bmp(cls.fs, cls.wav, cls.size, cls.overlapDec)
+
+    def test_levels_match_pooled_spectrogram(self):
+        cache = tiles.TileCache()
+        source = tiles.TileSource(self.fs, self.wav, self.size,
+                self.overlapDec, cache, tileCols=100)
+
+        for level in range(0, 6):
+            with self.subTest(msg="level={}".format(level)):
+                img = np.concatenate([source.tile("ab", level, i)
+                    for i in range(0, source.get_tile_count(level))], axis=1)
+                expected = util.max_pool_cols(self.ab, 1 << level)
+
+                self.assertTrue(np.allclose(expected, img))
+
+    def test_view(self):
+        cache = tiles.TileCache()
+        source = tiles.TileSource(self.fs, self.wav, self.size,
+                self.overlapDec, cache, tileCols=100)
+
+        img, level, v0, v1 = source.view("ab", 250, 1100, maxCols=300)
+        self.assertEqual(2, level)
+        self.assertLessEqual(v0, 250)
+        self.assertGreaterEqual(v1, 1100)
+        self.assertTrue(np.allclose(
+            util.max_pool_cols(self.ab[:, v0:v1], 4), img))
+
+        # The same view again is served entirely from the cache
+        misses = cache.misses
+        source.view("ab", 250, 1100, maxCols=300)
+        self.assertEqual(misses, cache.misses)
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import numpy as np
+from scipy.io import wavfile
+
+import w2b.fft as fft
+import w2b.util as util
+import w2b.worker as worker
+
+
+################################################################################
+class TestWorker(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.TemporaryDirectory()
+        cls.fs = 8000
+        rng = np.random.default_rng(44)
+        cls.wav = rng.uniform(-0.5, 0.5, 10000).astype("float32")
+        cls.fileName = os.path.join(cls.dir.name, "test.wav")
+        wavfile.write(cls.fileName, cls.fs, cls.wav)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.dir.cleanup()
+
+    def serve(self, w, reqs):
+        inFile = io.StringIO("".join(json.dumps(r) + "\n" for r in reqs))
+        outFile = io.StringIO()
+        w.serve(inFile, outFile)
+
+        return [json.loads(l) for l in outFile.getvalue().splitlines()]
+
+    def test_compute_cached(self):
+        w = worker.Worker()
+        req = {"op": "compute", "wav": self.fileName, "size": 256,
+                "overlap": 0.5}
+        resps = self.serve(w, [dict(req, id=1), dict(req, id=2),
+                dict(req, id=3, stats=True)])
+
+        self.assertEqual([1, 2, 3], [r["id"] for r in resps])
+        self.assertTrue(all(r["ok"] for r in resps))
+
+        # Read once, and the window made once
+        self.assertEqual(1, w.wavs.misses)
+        self.assertEqual(2, w.wavs.hits)
+        self.assertEqual([256], list(w.windows.keys()))
+
+        ab, an, x = fft.wav2bmp(self.fs, util.norm(self.wav), 256, 0.5)
+
+        with np.load(resps[0]["files"][0]) as f:
+            self.assertTrue(np.array_equal(ab, f["ab"]))
+
+    def test_evicted_with_rate(self):
+        # Room for one WAV at a time
+        w = worker.Worker(maxWavBytes=1)
+        fileName = os.path.join(self.dir.name, "other.wav")
+        wavfile.write(fileName, 4000, self.wav[:5000])
+
+        for name, fs in ((self.fileName, self.fs), (fileName, 4000),
+                (self.fileName, self.fs)):
+            self.assertEqual(fs, w.get_wav(name)[0])
+            self.assertEqual(1, len(w.wavs))
+
+    def test_reread_when_changed(self):
+        w = worker.Worker()
+        fileName = os.path.join(self.dir.name, "changed.wav")
+        req = {"op": "compute", "wav": fileName, "size": 256, "overlap": 0.5}
+
+        wavfile.write(fileName, self.fs, self.wav)
+        self.serve(w, [req])
+        wavfile.write(fileName, self.fs, self.wav[:5000])
+        resps = self.serve(w, [req])
+
+        self.assertEqual(2, w.wavs.misses)
+
+        with np.load(resps[0]["files"][0]) as f:
+            self.assertEqual(fft.get_fft_stats(5000, 256, 0.5)[2],
+                    f["ab"].shape[1])
+
+    def test_errors_and_shutdown(self):
+        w = worker.Worker()
+        inFile = io.StringIO("not json\n\n" +
+                json.dumps({"id": 1, "op": "nope", "wav": self.fileName,
+                        "size": 256, "overlap": 0.5}) + "\n" +
+                json.dumps({"id": 2, "op": "shutdown"}) + "\n" +
+                json.dumps({"id": 3, "op": "ping"}) + "\n")
+        outFile = io.StringIO()
+        w.serve(inFile, outFile)
+        resps = [json.loads(l) for l in outFile.getvalue().splitlines()]
+
+        self.assertEqual([None, 1, 2], [r["id"] for r in resps])
+        self.assertEqual([False, False, True], [r["ok"] for r in resps])
+        self.assertTrue("nope" in resps[1]["error"])
+        self.assertFalse(w.running)
+
+    def test_resynth(self):
+        w = worker.Worker()
+        spec = os.path.join(self.dir.name, "mask.json")
+        outName = os.path.join(self.dir.name, "out.wav")
+
+        with open(spec, "w") as f:
+            f.write('{"shapes": []}')
+
+        resps = self.serve(w, [{"op": "resynth", "wav": self.fileName,
+                "mask": spec, "output": outName, "size": 256,
+                "overlap": 0.5}])
+
+        self.assertTrue(resps[0]["ok"])
+        fs, out = wavfile.read(outName)
+        self.assertEqual(1, out.ndim)
+        self.assertTrue(np.allclose(util.norm(self.wav), out))
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Needs Unix sockets")
+    def test_socket(self):
+        w = worker.Worker()
+        path = os.path.join(self.dir.name, "worker.sock")
+        t = threading.Thread(target=worker.serve_socket, args=(w, path))
+        t.start()
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            # Until the worker is listening
+            for i in range(0, 1000):
+                try:
+                    sock.connect(path)
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    time.sleep(0.01)
+
+            f = sock.makefile("rw")
+            f.write(json.dumps({"id": 7, "op": "ping"}) + "\n")
+            f.write(json.dumps({"id": 8, "op": "shutdown"}) + "\n")
+            f.flush()
+            resps = [json.loads(f.readline()) for i in range(0, 2)]
+
+        t.join(10.0)
+        self.assertFalse(t.is_alive())
+        self.assertEqual([7, 8], [r["id"] for r in resps])
+
+
+################################################################################
+if __name__ == "__main__":
+    unittest.main()
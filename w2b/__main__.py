@@ -0,0 +1,209 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# The `python -m w2b' command line:
+#
+#   python -m w2b compute <WAV file> <size> <overlap> [--stats|--incremental]
+#   python -m w2b resynth <WAV file> <mask BMP or JSON> <size> <overlap>
+#   python -m w2b export <WAV file> <size> <overlap> [--products ...] [--plot]
+#           [--incremental] [--mode auto|memory|memmap|stream]
+#   python -m w2b batch <size> <overlap> <WAV file>... [--products ...]
+#
+# Unlike the scripts, nothing is drawn unless asked for: matplotlib and imageio
+# are only imported by the options that need them (see `jobs'), so short jobs
+# start fast and need no display.
+
+import argparse
+import logging
+import sys
+
+import numpy as np
+
+from . import fft
+from . import jobs
+from . import util
+
+
+log = logging.getLogger(__name__)
+
+
+################################################################################
+def get_window(name):
+    return np.hanning if name == "hanning" else None
+
+
+################################################################################
+def cmd_compute(args):
+    """Save the raw spectrogram (or per-column statistics) of each channel."""
+
+    if args.incremental:
+        from . import incr
+        return incr.update(args.wav, args.size, args.overlap,
+                get_window(args.window))
+
+    fs, s, l = jobs.read_channels(args.wav)
+
+    return jobs.compute(args.wav, fs, s, args.size, args.overlap,
+            get_window(args.window), args.stats)
+
+
+################################################################################
+def cmd_resynth(args):
+    """Apply a mask to a WAV and write the result."""
+
+    fs, s, l = jobs.read_channels(args.wav)
+    mask = jobs.read_mask(args.mask, fs, l, args.size, args.overlap)
+    fileName = args.output if args.output else args.mask + "_out.wav"
+
+    return jobs.resynth(fileName, fs, s, mask, args.size, args.overlap,
+            get_window(args.window))
+
+
+################################################################################
+def cmd_export(args):
+    """Write the spectrogram images and raw files of each channel, and
+    optionally graphs of them."""
+
+    if args.incremental:
+        return jobs.export_incremental(args.wav, args.size, args.overlap,
+                get_window(args.window), tuple(args.products.split(",")),
+                args.raw_format, args.plot)
+
+    products = tuple(args.products.split(","))
+    mode = args.mode
+
+    if mode == "auto":
+        from . import plan
+        mode = plan.get_mode(args.wav, args.size, args.overlap, products)
+
+        # Graphs need the whole spectrogram
+        if (mode == "stream") and args.plot:
+            mode = "memmap"
+
+        log.info("Mode: %s", mode)
+
+    if mode == "stream":
+        from . import wav
+        s = wav.Samples(args.wav)
+        fs = s.fs
+    else:
+        fs, s, l = jobs.read_channels(args.wav)
+
+    return jobs.export(args.wav, fs, s, args.size, args.overlap,
+            get_window(args.window), products, args.raw_format, args.plot,
+            mode)
+
+
+################################################################################
+def cmd_batch(args):
+    """Export many WAVs, reading, transforming and writing concurrently."""
+
+    from . import pipeline
+
+    ret = pipeline.export_all(args.wavs, args.size, args.overlap,
+            get_window(args.window), tuple(args.products.split(",")),
+            args.raw_format, args.queue)
+
+    return [fileName for fileNames in ret for fileName in fileNames]
+
+
+################################################################################
+def get_parser():
+    parser = argparse.ArgumentParser(prog="python -m w2b",
+            description="Spectrogram analysis and resynthesis.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p, mask=False):
+        p.add_argument("wav", help="WAV file")
+
+        if mask:
+            p.add_argument("mask", help="mask BMP or vector mask JSON")
+
+        p.add_argument("size", type=int, help="FFT size")
+        p.add_argument("overlap", type=float, help="FFT overlap (decimal)")
+
+    p = sub.add_parser("compute", help=cmd_compute.__doc__)
+    add_common(p)
+    g = p.add_mutually_exclusive_group()
+    g.add_argument("--stats", action="store_true",
+            help="save per-column statistics instead of the spectrogram")
+    g.add_argument("--incremental", action="store_true",
+            help="keep the spectrogram as archives, transforming only what "
+            "has been appended to the WAV since the last run")
+    p.add_argument("--window", choices=("hanning", "none"), default="hanning")
+    p.set_defaults(func=cmd_compute)
+
+    p = sub.add_parser("resynth", help=cmd_resynth.__doc__)
+    add_common(p, mask=True)
+    p.add_argument("-o", "--output", help="output WAV (default: "
+            "<mask>_out.wav)")
+    p.add_argument("--window", choices=("hanning", "none"), default="hanning")
+    p.set_defaults(func=cmd_resynth)
+
+    p = sub.add_parser("export", help=cmd_export.__doc__)
+    add_common(p)
+    p.add_argument("--products", default="ab,ab-dB,an",
+            help="comma-separated products (default: ab,ab-dB,an)")
+    p.add_argument("--raw-format", choices=("npy", "w2bz"), default="npy")
+    p.add_argument("--window", choices=("hanning", "none"), default="hanning")
+    p.add_argument("--plot", action="store_true",
+            help="also save a dB graph of each channel as a PNG")
+    p.add_argument("--incremental", action="store_true",
+            help="as for compute, then draw the images from the archives")
+    p.add_argument("--mode", choices=("auto", "memory", "memmap", "stream"),
+            default="auto", help="where to keep the spectrogram (default: "
+            "the fastest that fits in memory; see w2b.plan)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("batch", help=cmd_batch.__doc__)
+    p.add_argument("size", type=int, help="FFT size")
+    p.add_argument("overlap", type=float, help="FFT overlap (decimal)")
+    p.add_argument("wavs", nargs="+", metavar="wav", help="WAV files")
+    p.add_argument("--products", default="ab,ab-dB,an",
+            help="comma-separated products (default: ab,ab-dB,an)")
+    p.add_argument("--raw-format", choices=("npy", "w2bz"), default="npy")
+    p.add_argument("--window", choices=("hanning", "none"), default="hanning")
+    p.add_argument("--queue", type=int, default=2,
+            help="WAVs waiting between stages (default: 2)")
+    p.set_defaults(func=cmd_batch)
+
+    return parser
+
+
+################################################################################
+def main(argv=None):
+    util.init_logging()
+    args = get_parser().parse_args(argv)
+
+    if args.size != fft.get_fast_size(args.size):
+        log.warning("Size %s is slow to transform; %s is the next fast size",
+                args.size, fft.get_fast_size(args.size))
+
+    for fileName in args.func(args):
+        print(fileName)
+
+    return 0
+
+
+################################################################################
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import re
+import zipfile
+
+import numpy as np
+
+from . import util
+
+
+# An archive is a zip file holding a "meta.json" member and any number of
+# time-tile chunks, each a `.npy' of shape `(rows, end - start)'. Chunk member
+# names carry their sequence number and column range, so the chunk index is
+# just the zip directory: a time window can be read by decompressing only the
+# chunks that intersect it. Where chunks overlap (e.g. after appending), the
+# later chunk wins.
+
+VERSION = 1
+META_NAME = "meta.json"
+CHUNK_RE = re.compile(r"^c(\d{6})_(\d{10})_(\d{10})\.npy$")
+
+
+################################################################################
+def chunk_name(seq, start, end):
+    return "c{:06d}_{:010d}_{:010d}.npy".format(seq, start, end)
+
+
+################################################################################
+def gen_meta(name, fs, size, overlapDec, fileType, rows, dtype,
+        bins=None, startFreq=None, endFreq=None):
+    """Returns the archive metadata; the same fields that `util.gen_filename()'
+    encodes into file names."""
+
+    if (bins == None) or (startFreq == None) or (endFreq == None):
+        binFreqs, logFreqs = util.log_freq(fs, size)
+
+        if bins == None:
+            bins = len(binFreqs)
+
+        if startFreq == None:
+            startFreq = binFreqs[0]
+
+        if endFreq == None:
+            endFreq = binFreqs[-1]
+
+    return {
+        "version": VERSION,
+        "fileName": name,
+        "sampleRate": float(fs),
+        "size": int(size),
+        "bins": int(bins),
+        "startFreq": float(startFreq),
+        "endFreq": float(endFreq),
+        "overlapDec": float(overlapDec),
+        "fileType": fileType,
+        "rows": int(rows),
+        "dtype": np.dtype(dtype).str
+    }
+
+
+################################################################################
+class Writer:
+    """Writes a spectrogram to an archive, one time-tile chunk at a time.
+
+    Columns passed to `append()' are buffered until `chunkCols' of them are
+    available, so callers can feed tiles of any width. With `append=True' an
+    existing archive is extended instead; `start' then gives the first column
+    written (by default, the current end of the archive). Columns before the
+    current end are overwritten.
+    """
+
+    def __init__(self, fileName, meta=None, chunkCols=1024, append=False,
+            start=None, compressLevel=1):
+        self.chunkCols = chunkCols
+
+        if append:
+            self.zip = zipfile.ZipFile(fileName, "a",
+                    compression=zipfile.ZIP_DEFLATED,
+                    compresslevel=compressLevel)
+            self.meta = json.loads(self.zip.read(META_NAME))
+            index = read_index(self.zip)
+            self.seq = len(index)
+            end = max([e for s, e, n in index], default=0)
+
+            if start == None:
+                start = end
+            elif (start < 0) or (start > end):
+                raise ValueError("`start' must be within the archive")
+        else:
+            if meta == None:
+                raise ValueError("Expected `meta' for a new archive")
+
+            self.zip = zipfile.ZipFile(fileName, "w",
+                    compression=zipfile.ZIP_DEFLATED,
+                    compresslevel=compressLevel)
+            self.zip.writestr(META_NAME, json.dumps(meta, indent=4))
+            self.meta = meta
+            self.seq = 0
+            start = 0
+
+        self.rows = self.meta["rows"]
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.pos = start
+        self.pending = []
+        self.pendingCols = 0
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def append(self, ar):
+        if (ar.ndim != 2) or (ar.shape[0] != self.rows):
+            raise ValueError("Expected shape `(rows, n)'")
+
+        self.pending.append(np.asarray(ar, dtype=self.dtype))
+        self.pendingCols += ar.shape[1]
+
+        while self.pendingCols >= self.chunkCols:
+            self.write_chunk(self.chunkCols)
+
+
+    def write_chunk(self, cols):
+        buf = np.concatenate(self.pending, axis=1)
+        name = chunk_name(self.seq, self.pos, self.pos + cols)
+
+        with self.zip.open(name, "w") as f:
+            np.lib.format.write_array(f, np.ascontiguousarray(buf[:, 0:cols]))
+
+        self.pending = [buf[:, cols:]]
+        self.pendingCols -= cols
+        self.pos += cols
+        self.seq += 1
+
+
+    def close(self):
+        if self.zip == None:
+            return
+
+        if self.pendingCols > 0:
+            self.write_chunk(self.pendingCols)
+
+        self.zip.close()
+        self.zip = None
+
+
+################################################################################
+def read_index(zf):
+    """Returns `[(start, end, memberName), ...]' in the order written."""
+
+    ret = []
+
+    for name in zf.namelist():
+        m = CHUNK_RE.match(name)
+
+        if m:
+            ret.append((int(m.group(1)), int(m.group(2)), int(m.group(3)),
+                name))
+
+    ret.sort()
+    return [(s, e, n) for seq, s, e, n in ret]
+
+
+################################################################################
+class Reader:
+    """Random access to the columns of an archive.
+
+    Supports `reader[rows, c0:c1]' slicing (the column slice must have unit
+    step) so it can stand in for a 2-dim array in column-tiled code such as
+    `img.write_all()'.
+    """
+
+    def __init__(self, fileName):
+        self.zip = zipfile.ZipFile(fileName, "r")
+        self.meta = json.loads(self.zip.read(META_NAME))
+
+        if self.meta["version"] > VERSION:
+            raise ValueError("Unsupported archive version {}".format(
+                self.meta["version"]))
+
+        self.index = read_index(self.zip)
+        self.dtype = np.dtype(self.meta["dtype"])
+        cols = max([e for s, e, n in self.index], default=0)
+        self.shape = (self.meta["rows"], cols)
+        self.ndim = 2
+        self.cache = (None, None)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def close(self):
+        self.zip.close()
+
+
+    def fields(self, fileExt):
+        """Returns the `util.gen_filename_w_dict()' fields for this archive."""
+
+        ret = {k: self.meta[k] for k in ("fileName", "sampleRate", "size",
+            "bins", "startFreq", "endFreq", "overlapDec", "fileType")}
+        ret["fileExt"] = fileExt
+        ret["isNorm"] = False
+
+        return ret
+
+
+    def load_chunk(self, name):
+        if self.cache[0] != name:
+            with self.zip.open(name, "r") as f:
+                self.cache = (name, np.lib.format.read_array(f))
+
+        return self.cache[1]
+
+
+    def read_cols(self, c0, c1):
+        """Returns columns `c0' (inclusive) to `c1' (exclusive)."""
+
+        if (c0 < 0) or (c1 > self.shape[1]) or (c0 > c1):
+            raise ValueError("Column range out of bounds")
+
+        ret = np.zeros((self.shape[0], c1 - c0), dtype=self.dtype)
+
+        for s, e, name in self.index:
+            if (e <= c0) or (s >= c1):
+                continue
+
+            a = max(s, c0)
+            b = min(e, c1)
+            chunk = self.load_chunk(name)
+            ret[:, (a - c0):(b - c0)] = chunk[:, (a - s):(b - s)]
+
+        return ret
+
+
+    def __getitem__(self, key):
+        if type(key) != tuple:
+            key = (key, slice(None))
+
+        rows, cols = key
+
+        if type(cols) == slice:
+            c0, c1, step = cols.indices(self.shape[1])
+
+            if step != 1:
+                raise ValueError("Expected unit column step")
+
+            return self.read_cols(c0, max(c0, c1))[rows, :]
+        else:
+            if cols < 0:
+                cols += self.shape[1]
+
+            return self.read_cols(cols, cols + 1)[rows, 0]
+
+
+################################################################################
+def write(fileName, ar, meta, chunkCols=1024):
+    """Write a whole 2-dim array to a new archive."""
+
+    with Writer(fileName, meta, chunkCols) as w:
+        for c0 in range(0, ar.shape[1], chunkCols):
+            w.append(ar[:, c0:(c0 + chunkCols)])
+
+
+################################################################################
+def read(fileName):
+    """Read a whole archive; returns `(meta, ar)'."""
+
+    with Reader(fileName) as r:
+        return r.meta, r.read_cols(0, r.shape[1])
@@ -0,0 +1,222 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import hashlib
+import logging
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from . import fft
+from . import util
+
+
+log = logging.getLogger(__name__)
+
+# A persistent cache of results, shared between runs (and processes). Unlike
+# the names from `util.gen_filename()', which only carry the parameters, an
+# entry's key also covers the content of the input, so a changed WAV can
+# never be served a stale result. Each entry is one `.npz' file named by its
+# key; entries are written aside and renamed into place, so readers only ever
+# see whole entries, and concurrent writers of one key just race to write the
+# same thing. The least recently used entries (by modification time, which a
+# hit refreshes) are removed once the cache is over its size limit.
+#
+# The scripts use the cache when the W2B_CACHE environment variable names its
+# directory; W2B_CACHE_MIB sets its limit.
+
+VERSION = 1
+ENV_VAR = "W2B_CACHE"
+ENV_VAR_MIB = "W2B_CACHE_MIB"
+EXT = ".npz"
+
+
+################################################################################
+def get_key(contentHash, size, overlapDec, window=np.hanning, bins=None,
+        startFreq=None, endFreq=None, product="stft"):
+    """Returns the cache key of a result: `product' of the input with hash
+    `contentHash' (e.g. `util.file_hash()'), with the given parameters."""
+
+    fields = (VERSION, contentHash, int(size), float(overlapDec),
+            fft.get_window_key(window), bins, startFreq, endFreq, product)
+
+    return hashlib.sha1(repr(fields).encode()).hexdigest()
+
+
+################################################################################
+class Cache:
+    """A directory of cached result arrays, limited to `maxBytes'."""
+
+    def __init__(self, dirName, maxBytes=(1024 * 1024 * 1024)):
+        self.dirName = dirName
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(dirName, exist_ok=True)
+
+
+    def get_path(self, key):
+        return os.path.join(self.dirName, key + EXT)
+
+
+    def load(self, key):
+        """Returns the arrays stored under `key' (as a dict), or `None'."""
+
+        path = self.get_path(key)
+
+        try:
+            with np.load(path) as f:
+                ret = {k: f[k] for k in f.files}
+
+            # Most recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            log.warning("Ignoring bad cache entry \"%s\": %s", path, e)
+            return None
+
+        return ret
+
+
+    def save(self, key, arrays):
+        """Store the dict of `arrays' under `key'."""
+
+        fd, tmpName = tempfile.mkstemp(suffix=".tmp", prefix=key + "_",
+                dir=self.dirName)
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+
+            os.replace(tmpName, self.get_path(key))
+        except BaseException:
+            os.remove(tmpName)
+            raise
+
+        self.evict()
+
+
+    def get(self, key, generate):
+        """Returns the arrays under `key', calling `generate()' for them (and
+        storing what it returns) on a miss."""
+
+        ret = self.load(key)
+
+        if ret != None:
+            self.hits += 1
+            log.info("Cache hit: %s", key)
+            return ret
+
+        self.misses += 1
+        ret = generate()
+        self.save(key, ret)
+
+        return ret
+
+
+    def get_entries(self):
+        """Returns `[(mtime, bytes, path), ...]', oldest first."""
+
+        ret = []
+
+        for name in os.listdir(self.dirName):
+            if not name.endswith(EXT):
+                continue
+
+            path = os.path.join(self.dirName, name)
+
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+            ret.append((st.st_mtime_ns, st.st_size, path))
+
+        ret.sort()
+        return ret
+
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in
+        `maxBytes' (never the newest entry, even if it alone is over)."""
+
+        entries = self.get_entries()
+        total = sum(e[1] for e in entries)
+
+        for mtime, nbytes, path in entries[:-1]:
+            if total <= self.maxBytes:
+                break
+
+            # Another process may have got there first
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            total -= nbytes
+
+
+    def clear(self):
+        for mtime, nbytes, path in self.get_entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+################################################################################
+def from_env():
+    """Returns the `Cache' named by the W2B_CACHE environment variable, or
+    `None' if it is not set."""
+
+    dirName = os.environ.get(ENV_VAR)
+
+    if not dirName:
+        return None
+
+    mib = int(os.environ.get(ENV_VAR_MIB, "1024"))
+
+    return Cache(dirName, mib * 1024 * 1024)
+
+
+################################################################################
+def cached(generate, fileNames, size, overlapDec, window=np.hanning,
+        bins=None, startFreq=None, endFreq=None, product="stft", store=None):
+    """Returns `generate()' (a dict of arrays), computed from `fileNames' with
+    the given parameters, going through `store' (by default, `from_env()';
+    with no cache, just calls `generate()')."""
+
+    if store == None:
+        store = from_env()
+
+    if store == None:
+        return generate()
+
+    contentHash = "_".join(util.file_hash(f) for f in fileNames)
+    key = get_key(contentHash, size, overlapDec, window, bins, startFreq,
+            endFreq, product)
+
+    return store.get(key, generate)
@@ -22,10 +22,17 @@
 
 import numpy as np
 from numpy.fft import rfft, irfft
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import next_fast_len
 
+from . import instr
 from . import util
 
 
+# Number of FFT columns transformed together
+BLOCK_COLS = 256
+
+
 ################################################################################
 def get_fft_stats(n, size, overlapDec):
     """Calculate the stats needed to iteratively compute the FFT over a set of
@@ -37,40 +44,30 @@ def get_fft_stats(n, size, overlapDec):
 
     if (overlapDec >= 1.0) or (overlapDec < 0.0):
         raise ValueError("Overlap must be LT 1.0, GE 0.0")
-    elif overlapDec != 0.0:
-        overlapLog2 = np.log2(1.0 / (1.0 - overlapDec))
-
-        if int(overlapLog2) != overlapLog2:
-            raise ValueError("Overlap must be 1 / (2^n)")
 
     if size < 2:
         raise ValueError("Size must be GE 2")
 
-    sizeLog2 = np.log2(size)
-
-    if int(sizeLog2) != sizeLog2:
-        raise ValueError("Size must be 2^n")
-
+    # Any whole number of samples (allowing for `overlapDec' not being exact
+    # in binary, e.g. 1000 * 0.7)
     sizeOverlap = size * overlapDec
+    overlap = int(round(sizeOverlap))
 
-    if int(sizeOverlap) != sizeOverlap:
-        raise ValueError("Size is not wholly divisible by overlap")
-
-    # So, start the spectrogram with size * overlapDec's worth of samples not
-    # in the FFT (4 zeros 50%, 6 zeroes 75%, 7 zeroes 87.5%, etc.)
-    overlap = int(size * overlapDec)
     step = size - overlap
 
-    if int(step) != step:
-        raise ValueError("`overlapDec' must produce whole step")
+    # Rounding can take an overlap just under 1.0 to the whole size
+    if (abs(sizeOverlap - overlap) > (1e-9 * size)) or (step < 1):
+        raise ValueError("Size is not wholly divisible by overlap")
 
-    nDivStep = int(n / step)
+    nDivStep = int(n // step)
     nModStep = int(n % step)
-    sizeDivStep = int(size / step)
 
-    # Left iterations is going to be one less than the number of times that
-    # step goes into size
-    leftPadIters = sizeDivStep - 1
+    # So, start the spectrogram with enough padding columns that the first
+    # sample is in as many frames as every other one (4 zeros 50%, 6 zeroes
+    # 75%, 7 zeroes 87.5%, etc.); this is one less than the number of times
+    # that step goes into size (rounded up, for a step that doesn't divide
+    # size)
+    leftPadIters = -(-size // step) - 1
     start = -(leftPadIters * step)
 
     # Right iterations is a little harder; we need to check how many samples are
@@ -112,21 +109,26 @@ def get_fft_stats(n, size, overlapDec):
 
 
 ################################################################################
-def wav2bmp(fs, wav, size=1024, overlapDec=0.0, window=np.hanning):
-    """Transform wave samples into a spectrogram image.
+def get_fast_size(size):
+    """Returns the first size from `size' up whose only prime factors are 2, 3
+    and 5; those transform almost as fast as powers of two, while sizes with
+    large prime factors can be several times slower."""
 
-    Warning: using a window in the bmp2wav flow (when recomputing the complex
-    FFT result for resynthesis with the mask image) will result in a very badly
-    scaled result!
+    return next_fast_len(size, real=True)
 
-    See tests/test_bmp2wav.py.
-    """
 
-    if wav.ndim != 1:
-        raise ValueError("Expected 1-dim array")
-    l = wav.shape[0]
+################################################################################
+def get_col_times(fs, l, size, overlapDec):
+    """Returns the time (in seconds) of the centre of every FFT column."""
 
-    fftLen = int(size / 2) + 1
+    start, step, iters = get_fft_stats(l, size, overlapDec)
+
+    return (start + (np.arange(0, iters) * step) + (size / 2.0)) / fs
+
+
+################################################################################
+def get_window(window, size):
+    """Returns the window array for `window' (a function, array or `None')."""
 
     if callable(window):
         wnd = window(size)
@@ -142,63 +144,455 @@ def wav2bmp(fs, wav, size=1024, overlapDec=0.0, window=np.hanning):
     else:
         raise ValueError("Expected `window' to be a function or NumPy array")
 
+    return wnd
+
+
+################################################################################
+def get_window_key(window):
+    """Returns a string identifying `window' (as `get_window()' takes it)."""
+
+    if type(window) == np.ndarray:
+        return "array_" + util.array_hash(window)
+    elif callable(window):
+        return window.__name__
+    elif window == None:
+        return "none"
+    else:
+        raise ValueError("Expected `window' to be a function or NumPy array")
+
+
+################################################################################
+def get_frames(wav, size, start, step, c0, c1):
+    """Returns the wave samples of FFT columns `c0' (inclusive) to `c1'
+    (exclusive) as a `(size, c1 - c0)' array, or `(channels, size, c1 - c0)'
+    if `wav' is `(n, channels)'.
+
+    Samples before the start or after the end of `wav' are zero, exactly as
+    the left and right padding columns from `get_fft_stats()' expect. Only the
+    span of samples covered by the columns is copied; the frames themselves
+    are a strided view onto it.
+    """
+
+    l = wav.shape[0]
+    spanStart = start + (c0 * step)
+    spanEnd = start + ((c1 - 1) * step) + size
+
+    # Channels first, so that each frame is contiguous
+    span = np.zeros(wav.shape[1:] + (spanEnd - spanStart,), dtype="float32")
+
+    wavStart = max(spanStart, 0)
+    wavEnd = min(spanEnd, l)
+
+    if wavEnd > wavStart:
+        span[..., (wavStart - spanStart):(wavEnd - spanStart)] = \
+                wav[wavStart:wavEnd].T
+
+    # ([channels,] cols, size) -> ([channels,] size, cols)
+    frames = sliding_window_view(span, size, axis=-1)[..., ::step, :]
+
+    return np.swapaxes(frames, -1, -2)
+
+
+################################################################################
+def stft_cols(wav, size, start, step, c0, c1, wnd=None):
+    """Returns the complex FFT of columns `c0' to `c1' (of every channel) in
+    one batched transform."""
+
+    with instr.span("stft", c1 - c0):
+        frames = get_frames(wav, size, start, step, c0, c1)
+
+        if type(wnd) != type(None):
+            # Window in float32, as the per-column buffer always has
+            frames = (frames * wnd[:, np.newaxis]).astype("float32")
+
+        return rfft(frames, axis=-2)
+
+
+################################################################################
+def get_angle(X):
+    """`util.angle()' of FFT data with any number of channels."""
+
+    with instr.span("angle", X.shape[-1]):
+        if X.ndim == 3:
+            return np.stack([util.angle(Xc) for Xc in X])
+        else:
+            return util.angle(X)
+
+
+################################################################################
+def get_out_shape(wav, fftLen, iters):
+    if wav.ndim == 1:
+        return (fftLen, iters)
+    elif wav.ndim == 2:
+        return (wav.shape[1], fftLen, iters)
+    else:
+        raise ValueError("Expected 1-dim or 2-dim array")
+
+
+################################################################################
+def wav2bmp(fs, wav, size=1024, overlapDec=0.0, window=np.hanning,
+        index=None, out=None):
+    """Transform wave samples into a spectrogram image.
+
+    The complex result `x' can be resynthesised by `bmp2wav()' whatever the
+    window, as long as that is told the same `window'.
+
+    A `(n, channels)' `wav' gives `(channels, size/2+1, iters)' results, with
+    every channel transformed together.
+
+    `index' (a `peaks.PeakIndex', or a list of one per channel) is updated
+    with each block of columns as it is computed.
+
+    `out' may give the `(ab, an, x)' arrays to fill instead (e.g. memory maps;
+    see `plan'); any of them may be `None' to not keep that result at all.
+    """
+
+    l = wav.shape[0]
+
+    fftLen = int(size / 2) + 1
+    wnd = get_window(window, size)
+
     start, step, iters = get_fft_stats(l, size, overlapDec)
-    c = 0
-    ab = np.zeros((fftLen, iters), dtype="float32")
-    an = np.zeros((fftLen, iters), dtype="float32")
-    x = np.zeros((fftLen, iters), dtype=complex)
-    buf = np.ndarray(size, dtype="float32")
-
-    for i in range(start, l, step):
-        # Do stuff
-
-        if i < 0:
-            bufStart = size - (size + i)
-            bufEnd = size
-            wavEnd = i + size
-
-            #print("[<] i =", i, "\tbuf: 0 to", bufStart, "to", bufEnd, \
-            #        "\twav: 0 to", wavEnd, "|", wavEnd)
-
-            buf[0:bufStart] = 0.0
-            buf[bufStart:bufEnd] = wav[0:wavEnd]
-        elif (i + size) >= l:
-            bufEnd = l - i
-            wavStart = i
-
-            #print("[>] i =", i, "\tbuf: 0 to", bufEnd, "to", size, \
-            #        "\twav:", wavStart, "to", l, "|", (l - wavStart))
-
-            buf[0:bufEnd] = wav[wavStart:l]
-            buf[bufEnd:size] = 0.0
+    shape = get_out_shape(wav, fftLen, iters)
+
+    if out == None:
+        ab = np.zeros(shape, dtype="float32")
+        an = np.zeros(shape, dtype="float32")
+        x = np.zeros(shape, dtype=complex)
+    else:
+        ab, an, x = out
+
+        for ar in out:
+            if (type(ar) != type(None)) and (ar.shape != shape):
+                raise ValueError("Expected `out' arrays of shape {}".format(
+                        shape))
+
+    for c0 in range(0, iters, BLOCK_COLS):
+        c1 = min(c0 + BLOCK_COLS, iters)
+        X = stft_cols(wav, size, start, step, c0, c1, wnd)
+        blockAb = (np.abs(X) / size).astype("float32")
+
+        if type(ab) != type(None):
+            ab[..., c0:c1] = blockAb
+
+        if type(an) != type(None):
+            an[..., c0:c1] = get_angle(X)
+
+        if type(x) != type(None):
+            x[..., c0:c1] = X
+
+        if index == None:
+            pass
+        elif blockAb.ndim == 3:
+            for c in range(0, blockAb.shape[0]):
+                index[c].update(blockAb[c])
         else:
-            wavStart = i
-            wavEnd = wavStart + size
+            index.update(blockAb)
+
+    return ab, an, x
+
+
+################################################################################
+def wav2bmp_batch(fs, wavs, size=1024, overlapDec=0.0, window=np.hanning,
+        batchCols=8192):
+    """`wav2bmp()' for many (short) waves at once.
+
+    The frames of consecutive waves are packed side by side into one frame
+    matrix, with each wave's offset into it recorded, so that a whole batch
+    of waves (up to `batchCols' columns, or one wave if longer) is windowed
+    and transformed in one go. This avoids paying the per-call overhead of
+    `wav2bmp()' for every wave.
+
+    The waves may differ in length but must have the same number of channels.
+    Returns a list of `(ab, an, x)', one per wave, which are views into the
+    batch's arrays.
+    """
+
+    if len(wavs) == 0:
+        return []
+
+    wnd = get_window(window, size)
+    chShape = wavs[0].shape[1:]
+    stats = []
+
+    for w in wavs:
+        if w.shape[1:] != chShape:
+            raise ValueError("Expected every wave to have the same channels")
+
+        stats.append(get_fft_stats(w.shape[0], size, overlapDec))
+
+    ret = []
+    i = 0
+
+    while i < len(wavs):
+        # Gather waves until the batch is full
+        j = i + 1
+        cols = stats[i][2]
 
-            #print("[=] i =", i, "\tbuf: 0 to", size, \
-            #        "\t\twav:", wavStart, "to", wavEnd, \
-            #        "|", (wavEnd - wavStart))
+        while (j < len(wavs)) and ((cols + stats[j][2]) <= batchCols):
+            cols += stats[j][2]
+            j += 1
 
-            buf[:] = wav[wavStart:wavEnd]
+        offsets = np.cumsum([0] + [stats[k][2] for k in range(i, j)])
+        frames = np.ndarray(chShape + (size, cols), dtype="float32")
+
+        for k in range(i, j):
+            start, step, iters = stats[k]
+            o = offsets[k - i]
+            frames[..., o:(o + iters)] = get_frames(
+                    wavs[k], size, start, step, 0, iters)
 
         if type(wnd) != type(None):
-            buf *= wnd
+            frames *= wnd[:, np.newaxis]
 
-        X = rfft(buf)
+        X = rfft(frames, axis=-2)
+        ab = (np.abs(X) / size).astype("float32")
+        an = get_angle(X).astype("float32")
 
-        absNorm = np.abs(X) / size
-        ab[:, c] = absNorm
-        an[:, c] = util.angle(X)
-        x[:, c] = X
+        for k in range(0, j - i):
+            o0 = offsets[k]
+            o1 = offsets[k + 1]
+            ret.append((ab[..., o0:o1], an[..., o0:o1], X[..., o0:o1]))
 
-        c += 1
+        i = j
+
+    return ret
 
-    assert c == iters
-    return ab, an, x
+
+################################################################################
+STATS_DTYPE = np.dtype([("time", "float64"), ("rms", "float32"),
+        ("peak", "int32"), ("centroid", "float32")])
 
 
 ################################################################################
-def bmp2wav(fs, l, x, mask, size, overlapDec):
+def wav2stats(fs, wav, size=1024, overlapDec=0.0, window=np.hanning):
+    """Per-column statistics of the spectrogram `wav2bmp()' would produce,
+    without ever storing it.
+
+    Returns a `STATS_DTYPE' structured array of `iters' columns (or
+    `(channels, iters)' for a multichannel `wav'):
+
+      time:     centre of the column in seconds (`get_col_times()');
+      rms:      RMS of the (windowed) column samples, by Parseval's theorem;
+      peak:     index of the loudest frequency bin;
+      centroid: magnitude-weighted mean frequency in Hz (0 for silence).
+
+    Each block of `BLOCK_COLS' columns is transformed and reduced straight
+    away, so memory is O(iters) rather than O(size * iters).
+    """
+
+    l = wav.shape[0]
+    wnd = get_window(window, size)
+
+    start, step, iters = get_fft_stats(l, size, overlapDec)
+    shape = get_out_shape(wav, 1, iters)[:-2] + (iters,)
+    ret = np.zeros(shape, dtype=STATS_DTYPE)
+    ret["time"] = get_col_times(fs, l, size, overlapDec)
+
+    freqs = (np.arange(0, int(size / 2) + 1) * fs / size)[:, np.newaxis]
+
+    # Bins other than DC and Nyquist stand in for their negative frequency
+    # (an odd size has no Nyquist bin)
+    parseval = np.full(freqs.shape, 2.0)
+    parseval[0] = 1.0
+
+    if (size % 2) == 0:
+        parseval[-1] = 1.0
+
+    for c0 in range(0, iters, BLOCK_COLS):
+        c1 = min(c0 + BLOCK_COLS, iters)
+        ab = np.abs(stft_cols(wav, size, start, step, c0, c1, wnd)) / size
+
+        power = np.sum(parseval * np.square(ab), axis=-2)
+        total = np.sum(ab, axis=-2)
+        weighted = np.sum(freqs * ab, axis=-2)
+
+        ret["rms"][..., c0:c1] = np.sqrt(power)
+        ret["peak"][..., c0:c1] = np.argmax(ab, axis=-2)
+        ret["centroid"][..., c0:c1] = np.divide(weighted, total,
+                out=np.zeros_like(total), where=(total > 0.0))
+
+    return ret
+
+
+################################################################################
+def get_col_range(l, size, overlapDec, t0, t1):
+    """Returns the range of FFT columns (`c0' inclusive, `c1' exclusive) whose
+    samples intersect samples `t0' to `t1' (exclusive)."""
+
+    if (t0 < 0) or (t1 > l) or (t0 >= t1):
+        raise ValueError("Expected `0 <= t0 < t1 <= l'")
+
+    start, step, iters = get_fft_stats(l, size, overlapDec)
+
+    # Column c covers samples (start + c * step) to (start + c * step + size)
+    c0 = max(((t0 - size - start) // step) + 1, 0)
+    c1 = min(-((start - t1) // step), iters)
+
+    return c0, c1
+
+
+################################################################################
+def compute(fs, wav, size, overlapDec, t0, t1, window=np.hanning,
+        inSeconds=False):
+    """Like `wav2bmp()', but only computes the columns that intersect samples
+    `t0' to `t1' (exclusive), or seconds if `inSeconds'.
+
+    The columns are identical to the same columns of the full spectrogram,
+    including the zero-padded columns at either end of the wave.
+
+    Returns `ab', `an', `x' and `cols', the global index of each column.
+    """
+
+    l = wav.shape[0]
+    get_out_shape(wav, 0, 0)
+
+    if inSeconds:
+        # An end time at (or past) the end of the wave means all of it
+        t0 = int(np.floor(t0 * fs))
+        t1 = min(int(np.ceil(t1 * fs)), l)
+
+    wnd = get_window(window, size)
+    start, step, iters = get_fft_stats(l, size, overlapDec)
+    c0, c1 = get_col_range(l, size, overlapDec, t0, t1)
+
+    X = stft_cols(wav, size, start, step, c0, c1, wnd)
+
+    ab = (np.abs(X) / size).astype("float32")
+    an = get_angle(X).astype("float32")
+    cols = np.arange(c0, c1)
+
+    return ab, an, X, cols
+
+
+################################################################################
+def get_mask_cols(mask, c0, c1):
+    """Returns columns `c0' to `c1' of `mask': an array, or a lazily evaluated
+    mask expression (see `mask.Expr')."""
+
+    if hasattr(mask, "eval_cols"):
+        return mask.eval_cols(c0, c1)
+    else:
+        return mask[..., c0:c1]
+
+
+################################################################################
+def overlap_add(out, frames, pos, step):
+    """Add the columns of `frames' (`([channels,] size, n)') into `out'
+    (`(l, [channels])'), column `i' starting at sample `pos + i * step'.
+
+    Rather than adding one column at a time, each `step'-long segment of the
+    frames is added for all columns at once (the frames are zero-padded to a
+    whole number of segments).
+    """
+
+    size, n = frames.shape[-2:]
+    segs = -(-size // step)
+
+    if (segs * step) != size:
+        pad = [(0, 0)] * frames.ndim
+        pad[-2] = (0, (segs * step) - size)
+        frames = np.pad(frames, pad)
+
+    for j in range(0, segs):
+        segStart = pos + (j * step)
+        seg = frames[..., (j * step):((j + 1) * step), :]
+
+        # ([channels,] step, n) -> (n * step, [channels])
+        out[segStart:(segStart + (n * step))] += \
+                np.moveaxis(seg, (-1, -2), (0, 1)).reshape(
+                        (n * step,) + out.shape[1:])
+
+
+################################################################################
+def get_ola_env(size, step, wnd=None):
+    """Returns the sum of `wnd' (rectangular if `None') overlap-added every
+    `step' samples: a `step'-long envelope that repeats along the output, with
+    sample `i' of an overlap-add buffer whose frames start at multiples of
+    `step' getting `env[i % step]'.
+
+    Dividing by this undoes the gain of overlap-adding frames; it is just
+    `size / step' when `step' divides `size', but varies otherwise.
+    """
+
+    segs = -(-size // step)
+    ret = np.zeros(segs * step, dtype="float64")
+
+    if type(wnd) == type(None):
+        ret[0:size] = 1.0
+    else:
+        ret[0:size] = wnd
+
+    return np.sum(ret.reshape((segs, step)), axis=0)
+
+
+################################################################################
+def get_ola_norm(env, i0, i1, ndim):
+    """Returns the envelope `env' (see `get_ola_env()') for samples `i0' to
+    `i1' of an overlap-add buffer, shaped to divide an `ndim'-dim slice of
+    it."""
+
+    ret = env[np.arange(i0, i1) % env.shape[0]]
+
+    return ret.reshape(ret.shape + ((1,) * (ndim - 1)))
+
+
+################################################################################
+def get_synth(size, step, window=None, synthWindow=None):
+    """Returns `(synthWnd, env)' for the weighted overlap-add resynthesis of
+    FFT data analysed with `window': the window to multiply each resynthesised
+    frame by (`None' if rectangular), and the envelope of the analysis and
+    synthesis windows multiplied together (see `get_ola_env()') to divide the
+    overlap-added frames by.
+
+    `synthWindow' defaults to `window' (`np.ones' gives plain overlap-add).
+    """
+
+    wnd = get_window(window, size)
+
+    if type(synthWindow) == type(None):
+        synthWnd = wnd
+    else:
+        synthWnd = get_window(synthWindow, size)
+
+    if type(wnd) == type(None):
+        both = synthWnd
+    elif type(synthWnd) == type(None):
+        both = wnd
+    else:
+        both = wnd * synthWnd
+
+    env = get_ola_env(size, step, both)
+
+    if np.amin(env) <= (1e-6 * np.amax(env)):
+        raise ValueError("Windows do not overlap enough to resynthesise; use "
+                "more overlap or no window")
+
+    return synthWnd, env
+
+
+################################################################################
+def get_resynth_window(size, overlapDec, window):
+    """Returns `window', or `None' if it cannot be used for weighted
+    overlap-add resynthesis at this overlap (e.g. Hann with no overlap), so
+    that plain overlap-add is used instead."""
+
+    start, step, iters = get_fft_stats(size, size, overlapDec)
+    wnd = get_window(window, size)
+
+    if type(wnd) == type(None):
+        return window
+
+    env = get_ola_env(size, step, wnd * wnd)
+
+    if np.amin(env) <= (1e-6 * np.amax(env)):
+        return None
+
+    return window
+
+
+################################################################################
+def bmp2wav(fs, l, x, mask, size, overlapDec, window=None, synthWindow=None):
     """Apply a filter mask to a spectrogram image and transform it back to
     wave samples.
 
@@ -207,51 +601,143 @@ def bmp2wav(fs, l, x, mask, size, overlapDec):
     that image into wave samples. This removes the need to convert the
     amplitude and angle BMPs back into complex numbers for the filter mask
     scaling.
+
+    `mask' may be an array or a mask expression (see `mask.Expr'), which is
+    evaluated a block of columns at a time.
+
+    `window' must be the window `x' was computed with. Each resynthesised
+    frame is multiplied by `synthWindow' (see `get_synth()') and the
+    overlap-added frames are divided by their window-sum envelope, so that
+    the same windowed transform can be used for display and resynthesis.
+
+    For `(channels, size/2+1, iters)' FFT data (see `wav2bmp()'), `mask' is
+    either shared by every channel or has the same shape as `x', and the
+    result is `(l, channels)'.
     """
-    assert x.ndim == 2
-    assert x.ndim == mask.ndim
-    assert x.shape == mask.shape
+    assert (x.ndim == 2) or (x.ndim == 3)
+    assert x.shape[-2:] == mask.shape[-2:]
+    assert (len(mask.shape) == 2) or (x.shape == mask.shape)
     assert x.dtype == complex
-    assert mask.dtype == "float32"
+
+    if not hasattr(mask, "eval_cols"):
+        assert mask.dtype == "float32"
 
     start, step, iters = get_fft_stats(l, size, overlapDec)
-    fftI = 0
-    wavI = start
-    out = np.zeros(l, dtype="float32")
-    mult = size / step
+    synthWnd, env = get_synth(size, step, window, synthWindow)
 
-    while wavI < l:
-        buf = irfft(x[:, fftI] * mask[:, fftI])
+    # Overlap-add into a buffer that also covers the padding either side
+    ext = np.zeros((((iters - 1) * step) + size + step,) + x.shape[:-2],
+            dtype="float64")
 
-        if wavI < 0:
-            bufStart = size - (size + wavI)
-            bufEnd = size
-            wavEnd = wavI + size
+    for c0 in range(0, iters, BLOCK_COLS):
+        c1 = min(c0 + BLOCK_COLS, iters)
 
-            #print("[<] wavI =", wavI, "\tout: 0 to", wavEnd, \
-            #        "\tbuf:", bufStart, "to", bufEnd, "|", wavEnd)
+        with instr.span("resynth", c1 - c0):
+            frames = irfft(x[..., c0:c1] * get_mask_cols(mask, c0, c1),
+                    n=size, axis=-2)
 
-            out[0:wavEnd] += buf[bufStart:bufEnd] / mult
-        elif (wavI + size) >= l:
-            bufEnd = l - wavI
-            wavStart = wavI
+            if type(synthWnd) != type(None):
+                frames *= synthWnd[:, np.newaxis]
 
-            #print("[>] wavI =", wavI, "\tout:", wavStart, "to", l, \
-            #        "\tbuf: 0 to", bufEnd, "|", (l - wavStart))
+            overlap_add(ext, frames, c0 * step, step)
 
-            out[wavStart:l] += buf[0:bufEnd] / mult
-        else:
-            wavStart = wavI
-            wavEnd = wavStart + size
+    return (ext[-start:(l - start)] /
+            get_ola_norm(env, -start, l - start, ext.ndim)).astype("float32")
+
+
+################################################################################
+def get_modified_cols(mask):
+    """Returns the indices of the columns of `mask' that are not entirely 1.0.
+    """
+
+    ret = []
+    cols = mask.shape[-1]
+
+    for c0 in range(0, cols, BLOCK_COLS):
+        c1 = min(c0 + BLOCK_COLS, cols)
+        tile = get_mask_cols(mask, c0, c1).reshape(-1, c1 - c0)
+        ret.append(np.nonzero(np.any(tile != 1.0, axis=0))[0] + c0)
+
+    return np.concatenate(ret)
+
+
+################################################################################
+def bmp2wav_sparse(fs, wav, mask, size, overlapDec, cols=None, window=None,
+        synthWindow=None, x=None):
+    """Like `wav2bmp()' followed by `bmp2wav()' (with the same `window' and
+    `synthWindow'), but only computes what a mask that is mostly 1.0 actually
+    changes.
+
+    `cols' are the columns of `mask' that are not entirely 1.0; if `None',
+    they are found by scanning `mask'. Samples outside those columns' frames
+    are copied from `wav' untouched, since resynthesis would reproduce them
+    exactly. Each run of modified columns is resynthesised with every frame
+    that overlaps it, so the joins are exact too. The cost is proportional to
+    the size of the edits rather than the length of the wave.
+
+    If the spectrogram has already been computed (e.g. for display), passing
+    its complex FFT data as `x' saves transforming the runs again.
+
+    As with `bmp2wav()', a `(n, channels)' `wav' takes a shared or
+    per-channel mask.
+    """
+
+    l = wav.shape[0]
+
+    start, step, iters = get_fft_stats(l, size, overlapDec)
+    fftLen = int(size / 2) + 1
+    wnd = get_window(window, size)
+    synthWnd, env = get_synth(size, step, window, synthWindow)
+    shape = get_out_shape(wav, fftLen, iters)
+
+    if tuple(mask.shape) not in (shape, shape[-2:]):
+        raise ValueError("Expected mask of shape {}".format(shape))
+
+    if (type(x) != type(None)) and (x.shape != shape):
+        raise ValueError("Expected `x' of shape {}".format(shape))
+
+    if cols is None:
+        cols = get_modified_cols(mask)
+    else:
+        cols = np.unique(cols)
+
+    out = np.array(wav, dtype="float32")
+
+    if cols.shape[0] == 0:
+        return out
+
+    # Split the modified columns into runs whose frames don't overlap
+    breaks = np.nonzero((np.diff(cols) * step) >= size)[0] + 1
+
+    for run in np.split(cols, breaks):
+        s0 = max(start + (run[0] * step), 0)
+        s1 = min(start + (run[-1] * step) + size, l)
+        a, b = get_col_range(l, size, overlapDec, s0, s1)
+
+        # Overlap-add every frame touching the run; only the run's samples
+        # are kept
+        pos = start + (a * step)
+        ext = np.zeros((((b - a - 1) * step) + size + step,) + wav.shape[1:],
+                dtype="float64")
+
+        for c0 in range(a, b, BLOCK_COLS):
+            c1 = min(c0 + BLOCK_COLS, b)
+            if type(x) == type(None):
+                X = stft_cols(wav, size, start, step, c0, c1, wnd)
+            else:
+                X = x[..., c0:c1]
 
-            #print("[=] wavI =", wavI, "\tout:", wavStart, "to", wavEnd, \
-            #        "\t\tbuf: 0 to", buf.shape[0], "|", (wavEnd - wavStart))
+            with instr.span("resynth", c1 - c0):
+                frames = irfft(X * get_mask_cols(mask, c0, c1), n=size,
+                        axis=-2)
 
-            out[wavStart:wavEnd] += buf[:] / mult
+                if type(synthWnd) != type(None):
+                    frames *= synthWnd[:, np.newaxis]
 
-        fftI += 1
-        wavI += step
+                overlap_add(ext, frames, (c0 - a) * step, step)
 
-    assert fftI == iters
+        # `pos' is on the frame grid, so the envelope lines up with `ext'
+        out[s0:s1] = ext[(s0 - pos):(s1 - pos)] / get_ola_norm(env,
+                s0 - pos, s1 - pos, ext.ndim)
 
     return out
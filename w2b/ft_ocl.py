@@ -20,8 +20,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import logging
 import os.path
-import sys
 import types
 
 import numpy as np
@@ -32,6 +32,12 @@ from . import fft
 from . import wav
 
 
+log = logging.getLogger(__name__)
+
+# Built programs (see `get_program()')
+programs = {}
+
+
 ################################################################################
 def ft_freqs(bins, startFreq, endFreq):
     if endFreq <= startFreq:
@@ -43,18 +49,20 @@ def ft_freqs(bins, startFreq, endFreq):
     freqRange = endFreq - startFreq
     freqStep = freqRange / float(bins - 1)
 
-    print("freqRange =", freqRange)
-    print("freqStep  =", freqStep)
+    log.debug("freqRange = %s", freqRange)
+    log.debug("freqStep  = %s", freqStep)
 
     return [startFreq + (float(i) * freqStep) for i in range(0, bins)]
 
 
 ################################################################################
-def wav2bmp_ocl(fs, wav, size, bins, startFreq, endFreq, overlapDec=0.0):
-    freqs = ft_freqs(bins, startFreq, endFreq)
-    freqCount = len(freqs)
-    n = len(wav)
-    start, step, iters = fft.get_fft_stats(n, size, overlapDec)
+def get_program():
+    """Returns the OpenCL context and built kernel program, choosing the
+    platform and compiling the kernel only the first time (so a long-lived
+    process such as `worker' pays for it once)."""
+
+    if "slowft" in programs:
+        return programs["slowft"]
 
     platforms = cl.get_platforms()
 
@@ -73,7 +81,7 @@ def wav2bmp_ocl(fs, wav, size, bins, startFreq, endFreq, overlapDec=0.0):
                     break
 
         if p == -1:
-            print("Unable to intelligently choose a platform; " +
+            log.warning("Unable to intelligently choose a platform; " +
                 "defaulting to platform [0]")
             p = 0
     elif len(platforms) == 1:
@@ -81,21 +89,32 @@ def wav2bmp_ocl(fs, wav, size, bins, startFreq, endFreq, overlapDec=0.0):
     else:
         raise RuntimeError("No OpenCL platforms found")
 
-    print(("\nSelected OpenCL platform [{}]\n" +
-        "> name: \"{}\"\n" +
-        "> version: \"{}\"\n").format(
-            p, platforms[p].name, platforms[p].version))
+    log.info("Selected OpenCL platform [%s]: name \"%s\", version \"%s\"",
+            p, platforms[p].name, platforms[p].version)
 
     ctx = cl.Context(
             dev_type=cl.device_type.ALL,
             properties=[(cl.context_properties.PLATFORM, platforms[p])])
-    prog = cl.Program(
-            ctx, open(os.path.join(
-                os.path.dirname(sys.argv[0]), "w2b", "ft_kernel.cl")) \
-                        .read()).build()
 
-    print("bins:", bins)
-    print("iters:", iters)
+    with open(os.path.join(os.path.dirname(__file__), "ft_kernel.cl")) as f:
+        prog = cl.Program(ctx, f.read()).build()
+
+    programs["slowft"] = (ctx, prog)
+
+    return ctx, prog
+
+
+################################################################################
+def wav2bmp_ocl(fs, wav, size, bins, startFreq, endFreq, overlapDec=0.0):
+    freqs = ft_freqs(bins, startFreq, endFreq)
+    freqCount = len(freqs)
+    n = len(wav)
+    start, step, iters = fft.get_fft_stats(n, size, overlapDec)
+
+    ctx, prog = get_program()
+
+    log.debug("bins: %s", bins)
+    log.debug("iters: %s", iters)
 
     inSamp  = np.ascontiguousarray(np.ndarray((size, iters), dtype="float32"))
     inFreqs = np.ascontiguousarray(np.ndarray(freqCount, dtype="float32"))
@@ -135,13 +154,16 @@ def wav2bmp_ocl(fs, wav, size, bins, startFreq, endFreq, overlapDec=0.0):
         c += 1
 
     assert c == iters
-    assert not np.any(np.isnan(inSamp))
-    assert not np.any(np.isnan(inFreqs))
 
-    print("inSamp.nbytes  =", inSamp.nbytes)
-    print("inFreqs.nbytes =", inFreqs.nbytes)
-    print("outAbs.nbytes  =", outAbs.nbytes)
-    print("outAng.nbytes  =", outAng.nbytes)
+    # Full passes over the inputs, so only when debugging
+    if log.isEnabledFor(logging.DEBUG):
+        assert not np.any(np.isnan(inSamp))
+        assert not np.any(np.isnan(inFreqs))
+
+    log.debug("inSamp.nbytes  = %s", inSamp.nbytes)
+    log.debug("inFreqs.nbytes = %s", inFreqs.nbytes)
+    log.debug("outAbs.nbytes  = %s", outAbs.nbytes)
+    log.debug("outAng.nbytes  = %s", outAng.nbytes)
 
     inSampBuf  = cl.Buffer(ctx, mf.READ_ONLY, inSamp.nbytes)
     inFreqsBuf = cl.Buffer(ctx, mf.READ_ONLY, inFreqs.nbytes)
@@ -164,10 +186,12 @@ def wav2bmp_ocl(fs, wav, size, bins, startFreq, endFreq, overlapDec=0.0):
     cl.enqueue_copy(queue, outAng, outAngBuf)
     queue.finish()
 
-    assert not np.any(np.isnan(outAbs))
-    assert not np.any(np.isnan(outAng))
+    # Full passes over the outputs, so only when debugging
+    if log.isEnabledFor(logging.DEBUG):
+        assert not np.any(np.isnan(outAbs))
+        assert not np.any(np.isnan(outAng))
 
-    print("\nminmax outAbs: {} , {}".format(np.amin(outAbs), np.amax(outAbs)))
-    print("minmax outAng: {} , {}".format(np.amin(outAng), np.amax(outAng)))
+        log.debug("minmax outAbs: %s , %s", np.amin(outAbs), np.amax(outAbs))
+        log.debug("minmax outAng: %s , %s", np.amin(outAng), np.amax(outAng))
 
     return outAbs, outAng
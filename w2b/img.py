@@ -20,19 +20,32 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import imageio as iio
+import logging
+import struct
+from collections import deque
+
 import numpy as np
 
+from . import archive
 from . import colourmap as cm
+from . import instr
 from . import util
 
 
+log = logging.getLogger(__name__)
+
+# `imageio' is only imported by the `write_*()' functions that use it, so that
+# `write_all()' (which writes BMPs itself) starts quickly.
+
+
 ################################################################################
 def write_abs(
         name, fs, size, overlapDec, ab,
         bins=None, startFreq=None, endFreq=None):
     """Write FT amplitude image and data to disk."""
 
+    import imageio as iio
+
     imgName = util.gen_filename(
             name, fs, size, overlapDec, "ab", "bmp", False,
             bins, startFreq, endFreq)
@@ -42,11 +55,15 @@ def write_abs(
 
     ab2 = util.convert_to_img_type(ab)
 
-    print("Writing image file \"" + imgName + "\"")
-    iio.imwrite(imgName, np.flipud(ab2))
+    log.info("Writing image file \"%s\"", imgName)
+
+    with instr.span("img.write", ab2.size):
+        iio.imwrite(imgName, np.flipud(ab2))
 
-    print("Writing raw file \"" + rawName + "\"")
-    np.save(rawName, ab2)
+    log.info("Writing raw file \"%s\"", rawName)
+
+    with instr.span("npy.write", ab2.size):
+        np.save(rawName, ab2)
 
 
 ################################################################################
@@ -55,6 +72,8 @@ def write_abs_db(
         bins=None, startFreq=None, endFreq=None):
     """Write FT decibel amplitude image and data to disk."""
 
+    import imageio as iio
+
     imgName = util.gen_filename(
             name, fs, size, overlapDec, "ab-dB", "bmp", False,
             bins, startFreq, endFreq)
@@ -65,11 +84,15 @@ def write_abs_db(
     ab_db = util.mag2db_norm(ab)
     ab_db2 = util.convert_to_img_type(ab_db)
 
-    print("Writing image file \"" + imgName + "\"")
-    iio.imwrite(imgName, np.flipud(ab_db2))
+    log.info("Writing image file \"%s\"", imgName)
+
+    with instr.span("img.write", ab_db2.size):
+        iio.imwrite(imgName, np.flipud(ab_db2))
 
-    print("Writing raw file \"" + rawName + "\"")
-    np.save(rawName, ab_db2)
+    log.info("Writing raw file \"%s\"", rawName)
+
+    with instr.span("npy.write", ab_db2.size):
+        np.save(rawName, ab_db2)
 
 
 ################################################################################
@@ -77,6 +100,8 @@ def write_abs_db_log(name, fs, size, overlapDec, ab):
     """Write FT decibel amplitude image and data to disk with logarithmic
     frequency."""
 
+    import imageio as iio
+
     imgName = util.gen_filename(
             name, fs, size, overlapDec, "ab-dB-log", "bmp", False,
             bins, startFreq, endFreq)
@@ -88,11 +113,15 @@ def write_abs_db_log(name, fs, size, overlapDec, ab):
     ab_db_log = util.lin2log(util.mag2db_norm(ab), binFreqs, logFreqs)
     ab_db_log2 = util.convert_to_img_type(ab_db_log)
 
-    print("Writing image file \"" + imgName + "\"")
-    iio.imwrite(imgName, np.flipud(ab_db_log2))
+    log.info("Writing image file \"%s\"", imgName)
 
-    print("Writing raw file \"" + rawName + "\"")
-    np.save(rawName, ab_db_log2)
+    with instr.span("img.write", ab_db_log2.size):
+        iio.imwrite(imgName, np.flipud(ab_db_log2))
+
+    log.info("Writing raw file \"%s\"", rawName)
+
+    with instr.span("npy.write", ab_db_log2.size):
+        np.save(rawName, ab_db_log2)
 
 
 ################################################################################
@@ -101,6 +130,8 @@ def write_ang(name, fs, size, overlapDec, ab, an,
         colourMap=cm.colour_maps["thermal1"], normAbs=True):
     """Write the FT phase information with colourmap applied."""
 
+    import imageio as iio
+
     imgName = util.gen_filename(
             name, fs, size, overlapDec, "an", "bmp", False,
             bins, startFreq, endFreq)
@@ -115,8 +146,267 @@ def write_ang(name, fs, size, overlapDec, ab, an,
 
     img = util.convert_to_img_type(util.apply_colourmap(ab2, an, colourMap))
 
-    print("Writing image file \"" + imgName + "\"")
-    iio.imwrite(imgName, np.flipud(img))
+    log.info("Writing image file \"%s\"", imgName)
 
-    #print("Writing raw file \"" + rawName + "\"")
+    with instr.span("img.write", img.size):
+        iio.imwrite(imgName, np.flipud(img))
+
+    #log.info("Writing raw file \"%s\"", rawName)
     #np.save(rawName, img)
+
+
+################################################################################
+def get_bmp_layout(width, colour=False):
+    """Returns the bits per pixel, used and padded bytes per row, and palette
+    of an uncompressed BMP `width' pixels wide."""
+
+    if colour:
+        bpp = 24
+        rowBytes = width * 3
+        palette = b""
+    else:
+        bpp = 8
+        rowBytes = width
+        palette = b"".join(bytes((i, i, i, 0)) for i in range(0, 256))
+
+    return bpp, rowBytes, (rowBytes + 3) & ~3, palette
+
+
+################################################################################
+def get_bmp_bytes(height, width, colour=False):
+    """Returns the size of the BMP file `open_bmp()' would create."""
+
+    bpp, rowBytes, stride, palette = get_bmp_layout(width, colour)
+
+    return 14 + 40 + len(palette) + (stride * height)
+
+
+################################################################################
+def open_bmp(fileName, height, width, colour=False):
+    """Create an uncompressed BMP on disk and return its pixels as a writable
+    memory map of shape `(height, width)' (or `(height, width, 3)' in BGR order
+    if `colour').
+
+    BMPs are stored bottom-up, so row 0 of the map is the bottom row of the
+    image; spectrogram rows can therefore be written without `np.flipud()'.
+    """
+
+    bpp, rowBytes, stride, palette = get_bmp_layout(width, colour)
+    offset = 14 + 40 + len(palette)
+    imageBytes = stride * height
+
+    header = struct.pack("<2sIHHI", b"BM", offset + imageBytes, 0, 0, offset)
+    header += struct.pack("<IiiHHIIiiII", 40, width, height, 1, bpp, 0,
+            imageBytes, 3780, 3780, 0 if colour else 256, 0 if colour else 256)
+
+    with open(fileName, "wb") as f:
+        f.write(header)
+        f.write(palette)
+        f.truncate(offset + imageBytes)
+
+    rows = np.memmap(fileName, dtype="uint8", mode="r+", offset=offset,
+            shape=(height, stride))
+
+    if colour:
+        return np.lib.stride_tricks.as_strided(rows,
+                shape=(height, width, 3), strides=(stride, 3, 1), subok=True)
+    else:
+        return rows[:, 0:rowBytes]
+
+
+################################################################################
+def write_all(name, fs, size, overlapDec, ab, an=None,
+        products=("ab", "ab-dB", "an"),
+        bins=None, startFreq=None, endFreq=None,
+        colourMap=cm.colour_maps["thermal1"], normAbs=True, tileCols=1024,
+        rawFormat="npy", executor=None, wait=True):
+    """Write several FT products to disk in a single sweep over `ab'.
+
+    `products' may contain any of "ab", "ab-dB", "ab-dB-log" and "an"; the
+    output files are identical to those of `write_abs()', `write_abs_db()',
+    `write_abs_db_log()' and `write_ang()'. Rather than each product
+    re-reading (and re-normalising) the whole of `ab', the spectrogram is
+    walked once in tiles of `tileCols' columns and every product is converted
+    and written for each tile in turn. Only the global statistics the products
+    need (max and smallest non-zero magnitude) are gathered up front.
+
+    `rawFormat' selects the side file written next to each greyscale image:
+    "npy" (a plain NumPy dump) or "w2bz" (a compressed, time-chunked archive
+    carrying the spectrogram parameters; see `archive').
+
+    With an `executor' (e.g. a `concurrent.futures.ThreadPoolExecutor'), the
+    tiles are still converted in the one sweep, but their image and raw writes
+    are handed to the executor as they are encoded. Unless `wait', the call
+    returns once the sweep is done, with one future per product, so that the
+    caller can get on with the next spectrogram.
+
+    Returns the list of files written (and the futures, unless `wait').
+    """
+
+    for p in products:
+        if p not in ("ab", "ab-dB", "ab-dB-log", "an"):
+            raise ValueError("Unknown product \"{}\"".format(p))
+
+    if ("an" in products) and (type(an) == type(None)):
+        raise ValueError("Product \"an\" requires `an'")
+
+    if rawFormat not in ("npy", "w2bz"):
+        raise ValueError("Unknown raw format \"{}\"".format(rawFormat))
+
+    if ab.ndim != 2:
+        raise ValueError("Expected 2-dim array")
+
+    rows, cols = ab.shape
+
+    # Statistics pass (cheap reductions only)
+    abMax = 0.0
+    abMinPos = np.inf
+
+    for c0 in range(0, cols, tileCols):
+        tile = np.asarray(ab[:, c0:(c0 + tileCols)])
+        abMax = max(abMax, np.amax(tile))
+        pos = tile[tile > 0.0]
+
+        if pos.size > 0:
+            abMinPos = min(abMinPos, np.amin(pos))
+
+    if abMinPos == np.inf:
+        dbMin = util.mag2db_min(np.ma.masked)
+    else:
+        dbMin = util.mag2db_min(
+                20.0 * np.log10(np.float32(abMinPos), dtype="float32"))
+
+    if "ab-dB-log" in products:
+        binFreqs, logFreqs = util.log_freq(fs, size)
+
+    # Open every output stream
+    fileNames = []
+    imgs = {}
+    raws = {}
+
+    for p in products:
+        imgName = util.gen_filename(
+                name, fs, size, overlapDec, p, "bmp", False,
+                bins, startFreq, endFreq)
+
+        log.info("Writing image file \"%s\"", imgName)
+        imgs[p] = open_bmp(imgName, rows, cols, colour=(p == "an"))
+        fileNames.append(imgName)
+
+        if p != "an":
+            rawName = util.gen_filename(
+                    name, fs, size, overlapDec, p, rawFormat, False,
+                    bins, startFreq, endFreq)
+
+            log.info("Writing raw file \"%s\"", rawName)
+
+            if rawFormat == "npy":
+                raws[p] = np.lib.format.open_memmap(
+                        rawName, mode="w+", dtype="uint8", shape=(rows, cols))
+            else:
+                raws[p] = archive.Writer(rawName, archive.gen_meta(
+                    name, fs, size, overlapDec, p, rows, "uint8",
+                    bins, startFreq, endFreq), tileCols)
+
+            fileNames.append(rawName)
+
+    # Conversion pass
+    def write_tile(p, c0, c1, out, prev=None):
+        # Archive tiles must be appended in order
+        if prev != None:
+            prev.result()
+
+        with instr.span("img.write", out.size):
+            imgs[p][:, c0:c1] = out
+
+        if p in raws:
+            with instr.span("npy.write", out.size):
+                if rawFormat == "npy":
+                    raws[p][:, c0:c1] = out
+                else:
+                    raws[p].append(out)
+
+    def finish(p, futures=()):
+        for f in futures:
+            f.result()
+
+        with instr.span("img.write"):
+            imgs[p].flush()
+
+        if p in raws:
+            with instr.span("npy.write"):
+                if rawFormat == "npy":
+                    raws[p].flush()
+                else:
+                    raws[p].close()
+
+    pending = dict((p, []) for p in products)
+    inFlight = deque()
+
+    for c0 in range(0, cols, tileCols):
+        c1 = min(c0 + tileCols, cols)
+        tile = np.asarray(ab[:, c0:c1])
+
+        if ("ab-dB" in products) or ("ab-dB-log" in products):
+            tileDb = util.mag2db_norm(tile, dbMin)
+
+        tileFutures = []
+
+        for p in products:
+            if p == "ab":
+                out = util.convert_to_img_type(tile)
+            elif p == "ab-dB":
+                out = util.convert_to_img_type(tileDb)
+            elif p == "ab-dB-log":
+                out = util.convert_to_img_type(
+                        util.lin2log(tileDb, binFreqs, logFreqs))
+            else:
+                if normAbs:
+                    tileNorm = tile / abMax
+                else:
+                    tileNorm = tile
+
+                out = util.convert_to_img_type(util.apply_colourmap(
+                    tileNorm, np.asarray(an[:, c0:c1]), colourMap))
+
+                # BMP pixels are BGR
+                out = out[:, :, ::-1]
+
+            if executor == None:
+                write_tile(p, c0, c1, out)
+                continue
+
+            prev = None
+
+            if (p in raws) and (rawFormat == "w2bz") and \
+                    (len(pending[p]) > 0):
+                prev = pending[p][-1]
+
+            f = executor.submit(write_tile, p, c0, c1, out, prev)
+            pending[p].append(f)
+            tileFutures.append(f)
+
+        # Don't let the encoded tiles pile up ahead of the writes
+        if executor != None:
+            inFlight.append(tileFutures)
+
+            if len(inFlight) > 2:
+                for f in inFlight.popleft():
+                    f.result()
+
+    if executor == None:
+        for p in products:
+            finish(p)
+
+        return fileNames
+
+    # One task per product, done once all of its tiles are written
+    futures = [executor.submit(finish, p, pending[p]) for p in products]
+
+    if wait:
+        for f in futures:
+            f.result()
+
+        return fileNames
+    else:
+        return fileNames, futures
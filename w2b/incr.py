@@ -0,0 +1,252 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import os
+
+import numpy as np
+import scipy.io.wavfile as wavfile
+
+from . import archive
+from . import fft
+from . import util
+
+
+log = logging.getLogger(__name__)
+
+# Incremental spectrograms, for WAVs that keep being appended to (e.g. logging
+# captures). The magnitude and angle of every channel are kept as float32
+# archives, next to a small state file recording how long the WAV was and the
+# raw samples of its overlap tail: those under the last, partly zero-padded
+# columns from `fft.get_fft_stats()'. When the WAV has grown, only those
+# columns and the new ones after them are computed, and the archives are
+# extended from the first of them (see `archive.Writer').
+#
+# The WAV is memory-mapped, so only the tail and the new samples are read. As
+# `wav.read()' scales a float WAV by its peak, a new peak changes every
+# column; that (or a WAV that no longer ends with the stored tail) means a
+# full recompute.
+
+STATE_VERSION = 1
+
+
+################################################################################
+def get_dirty_col(l, size, overlapDec):
+    """Returns the first FFT column of `l' samples that reaches past the end
+    of them (into the zero padding), and so would change if more samples were
+    appended."""
+
+    start, step, iters = fft.get_fft_stats(l, size, overlapDec)
+
+    return min(max(((l - size - start) // step) + 1, 0), iters)
+
+
+################################################################################
+def get_names(name, fs, size, overlapDec, channels):
+    """Returns the magnitude and angle archive names of every channel, and
+    the state file name."""
+
+    abNames = []
+    anNames = []
+
+    for c in range(0, channels):
+        chName = util.gen_channel_name(name, c, channels)
+        abNames.append(util.gen_filename(chName, fs, size, overlapDec,
+                "stftab", "w2bz"))
+        anNames.append(util.gen_filename(chName, fs, size, overlapDec,
+                "stftan", "w2bz"))
+
+    stateName = util.gen_filename(name, fs, size, overlapDec, "incr", "npz")
+
+    return abNames, anNames, stateName
+
+
+################################################################################
+def read_raw(fileName):
+    """Returns the sample rate and memory-mapped `(n, channels)' samples of a
+    WAV file, as stored."""
+
+    fs, raw = wavfile.read(fileName, mmap=True)
+
+    if raw.ndim == 1:
+        raw = raw[:, np.newaxis]
+
+    return fs, raw
+
+
+################################################################################
+def get_peak(raw):
+    """The scale `util.norm()' divides a float WAV by (unused for integer
+    WAVs, which have a fixed scale)."""
+
+    if np.issubdtype(raw.dtype, np.integer) or (raw.shape[0] == 0):
+        return np.float32(0.0)
+    elif raw.dtype != "float32":
+        raise ValueError("Unsupported WAV sample type \"{}\"".format(
+            raw.dtype))
+    else:
+        return max(np.abs(np.amin(raw)), np.abs(np.amax(raw)))
+
+
+################################################################################
+def norm(raw, peak):
+    """`util.norm()' of part of a WAV, given the peak of all of it."""
+
+    if np.issubdtype(raw.dtype, np.integer):
+        return util.norm(np.asarray(raw))
+    else:
+        return np.asarray(raw) / peak
+
+
+################################################################################
+def load_state(stateName):
+    if not os.path.exists(stateName):
+        return None
+
+    with np.load(stateName) as f:
+        return {k: f[k] for k in f.files}
+
+
+################################################################################
+def save_state(stateName, state):
+    # Written aside and renamed, so that the old state stays valid until the
+    # archives are complete
+    tmpName = stateName + ".tmp"
+
+    with open(tmpName, "wb") as f:
+        np.savez(f, **state)
+
+    os.replace(tmpName, stateName)
+
+
+################################################################################
+def get_resume_col(state, raw, windowKey, fileNames):
+    """Returns the column to resume from, or `None' if the archives must be
+    written from scratch."""
+
+    if state == None:
+        return None
+
+    lastL = state["length"].item()
+    dirtyCol = state["dirtyCol"].item()
+    tail = state["tail"]
+
+    if (state["version"].item() != STATE_VERSION) \
+            or (str(state["window"]) != windowKey) \
+            or (str(state["dtype"]) != raw.dtype.str) \
+            or (tail.ndim != 2) or (tail.shape[1] != raw.shape[1]) \
+            or (raw.shape[0] < lastL):
+        return None
+
+    for fileName in fileNames:
+        if not os.path.exists(fileName):
+            return None
+
+    if not np.array_equal(raw[(lastL - tail.shape[0]):lastL], tail):
+        log.info("WAV no longer ends with the stored tail")
+        return None
+
+    if get_peak(raw[lastL:]) > state["peak"]:
+        log.info("WAV has a new peak")
+        return None
+
+    return dirtyCol
+
+
+################################################################################
+def update(name, size, overlapDec, window=np.hanning, chunkCols=1024):
+    """Bring the magnitude and angle archives of WAV file `name' up to date,
+    computing only the columns that are new or were zero-padded last time.
+
+    Returns the list of files written.
+    """
+
+    fs, raw = read_raw(name)
+    l, channels = raw.shape
+    fftLen = int(size / 2) + 1
+    start, step, iters = fft.get_fft_stats(l, size, overlapDec)
+    windowKey = fft.get_window_key(window)
+
+    abNames, anNames, stateName = get_names(name, fs, size, overlapDec,
+            channels)
+    fileNames = abNames + anNames + [stateName]
+
+    state = load_state(stateName)
+    c0 = get_resume_col(state, raw, windowKey, abNames + anNames)
+
+    if c0 == None:
+        log.info("Computing all %s columns of \"%s\"", iters, name)
+        c0 = 0
+        peak = get_peak(raw)
+    elif l == state["length"].item():
+        log.info("\"%s\" is unchanged", name)
+        return fileNames
+    else:
+        log.info("Computing columns %s to %s of \"%s\"", c0, iters, name)
+        peak = state["peak"]
+
+    # Only the samples under columns `c0' onwards
+    off = max(start + (c0 * step), 0)
+    s = norm(raw[off:], peak)
+    wnd = fft.get_window(window, size)
+
+    writers = []
+
+    for fileType, names in (("stftab", abNames), ("stftan", anNames)):
+        for c in range(0, channels):
+            if c0 == 0:
+                meta = archive.gen_meta(
+                        util.gen_channel_name(name, c, channels), fs, size,
+                        overlapDec, fileType, fftLen, "float32")
+                writers.append(archive.Writer(names[c], meta, chunkCols))
+            else:
+                writers.append(archive.Writer(names[c], chunkCols=chunkCols,
+                    append=True, start=c0))
+
+    try:
+        for b0 in range(c0, iters, fft.BLOCK_COLS):
+            b1 = min(b0 + fft.BLOCK_COLS, iters)
+            X = fft.stft_cols(s, size, start - off, step, b0, b1, wnd)
+            ab = (np.abs(X) / size).astype("float32")
+            an = fft.get_angle(X)
+
+            for c in range(0, channels):
+                writers[c].append(ab[c])
+                writers[channels + c].append(an[c])
+    finally:
+        for w in writers:
+            w.close()
+
+    dirtyCol = get_dirty_col(l, size, overlapDec)
+    tailStart = max(start + (dirtyCol * step), 0)
+
+    save_state(stateName, {
+        "version": STATE_VERSION,
+        "length": l,
+        "dirtyCol": dirtyCol,
+        "tail": np.array(raw[tailStart:l]),
+        "peak": peak,
+        "dtype": raw.dtype.str,
+        "window": windowKey
+    })
+
+    return fileNames
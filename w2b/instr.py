@@ -0,0 +1,195 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import atexit
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+
+# Spans record the wall time, CPU time, net bytes allocated (and the peak
+# above the starting point) and items processed by each stage of the
+# pipeline, summed over every time the stage runs. They are disabled unless
+# `enable()' is called, or the W2B_INSTR environment variable names the file
+# to write the JSON report to at exit; when disabled, `span()' returns a
+# shared do-nothing context manager.
+#
+# Stages: "wav.read", "stft", "angle", "dB", "colourmap", "img.write",
+# "npy.write" and "resynth".
+#
+# Spans may be used from several threads (e.g. `pipeline', or
+# `img.write_all()' with an executor): each thread nests its own spans and the
+# totals are updated under a lock. But tracemalloc's peak is process-wide, so
+# concurrent spans see each other's allocations and reset each other's peaks;
+# "peakBytes" is only meaningful for single-threaded runs.
+
+ENV_VAR = "W2B_INSTR"
+
+enabled = False
+stages = OrderedDict()
+lock = threading.Lock()
+local = threading.local()
+
+
+################################################################################
+def get_stack():
+    if not hasattr(local, "stack"):
+        local.stack = []
+
+    return local.stack
+
+
+################################################################################
+class NullSpan:
+    items = 0
+
+    # Shared by every caller, so setting `items' on it does nothing
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+################################################################################
+class Span:
+    def __init__(self, name, items=0):
+        self.name = name
+        self.items = items
+
+
+    def __enter__(self):
+        stack = get_stack()
+        current, peak = tracemalloc.get_traced_memory()
+
+        # Keep the enclosing span's peak before resetting it for this one
+        if len(stack) > 0:
+            stack[-1].peak = max(stack[-1].peak, peak)
+
+        tracemalloc.reset_peak()
+        stack.append(self)
+
+        self.current = current
+        self.peak = current
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+        return self
+
+
+    def __exit__(self, excType, excValue, tb):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(self.peak, peak)
+
+        stack = get_stack()
+        stack.pop()
+
+        if len(stack) > 0:
+            stack[-1].peak = max(stack[-1].peak, peak)
+
+        with lock:
+            s = stages.setdefault(self.name, {"calls": 0, "wall": 0.0,
+                    "cpu": 0.0, "allocBytes": 0, "peakBytes": 0, "items": 0})
+            s["calls"] += 1
+            s["wall"] += wall
+            s["cpu"] += cpu
+            s["allocBytes"] += current - self.current
+            s["peakBytes"] = max(s["peakBytes"], peak - self.current)
+            s["items"] += self.items
+
+        return False
+
+
+################################################################################
+def span(name, items=0):
+    """Returns a context manager timing stage `name'; `items' (which may also
+    be set on the returned object) counts the work done."""
+
+    if not enabled:
+        return NULL_SPAN
+
+    return Span(name, items)
+
+
+################################################################################
+def enable():
+    global enabled
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    enabled = True
+
+
+################################################################################
+def disable():
+    global enabled
+
+    enabled = False
+
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+################################################################################
+def reset():
+    stages.clear()
+
+
+################################################################################
+def report():
+    """Returns the per-stage totals so far, with items per second."""
+
+    ret = OrderedDict()
+
+    with lock:
+        items = [(name, dict(s)) for name, s in stages.items()]
+
+    for name, s in items:
+        ret[name] = s
+        ret[name]["itemsPerSec"] = s["items"] / s["wall"] if s["wall"] > 0.0 \
+                else 0.0
+
+    return ret
+
+
+################################################################################
+def write_report(fileName):
+    with open(fileName, "w") as f:
+        json.dump({"pid": os.getpid(), "stages": report()}, f, indent=2)
+
+
+################################################################################
+if os.environ.get(ENV_VAR):
+    enable()
+    atexit.register(write_report, os.environ[ENV_VAR])
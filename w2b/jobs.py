@@ -0,0 +1,256 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# The jobs behind `python -m w2b' and `worker': each takes samples that have
+# already been read (so a caller may cache them) and writes its outputs next to
+# `name', returning the names of the files written. Plotting and image
+# libraries are only imported by the options that need them.
+
+import contextlib
+import os
+import tempfile
+
+import numpy as np
+
+from . import fft
+from . import util
+from . import wav
+
+
+################################################################################
+def read_channels(fileName):
+    """`wav.read()', with mono WAVs as one channel."""
+
+    fs, s, l = wav.read(fileName)
+
+    if s.ndim == 1:
+        s = s[:, np.newaxis]
+
+    return fs, s, l
+
+
+################################################################################
+def read_mask(fileName, fs, l, size, overlapDec):
+    """Returns a vector mask for a `.json' file, or an image mask."""
+
+    from . import mask
+
+    if fileName.endswith(".json"):
+        return mask.load_vector(fileName, fs, l, size, overlapDec)
+
+    import imageio as iio
+
+    ret = np.flipud(util.norm(iio.imread(fileName)))
+
+    if ret.ndim != 2:
+        raise ValueError("Expected a greyscale mask image")
+
+    return ret
+
+
+################################################################################
+def transform(fs, s, size, overlapDec, window=np.hanning, withAn=True,
+        mode="memory", dirName=None, index=None):
+    """`fft.wav2bmp()' of `(n, channels)' samples, without keeping `x' (or
+    `an', unless `withAn'), and updating `index' (a list of one
+    `peaks.PeakIndex' per channel) as it goes.
+
+    `mode' is one of `plan.MODES': with "memmap" the results are `.npy' memory
+    maps in `dirName' (left for the caller to remove), and with "stream" they
+    are lists of one `plan.StreamView' per channel (and `index' is not
+    supported, as nothing is computed up front).
+    """
+
+    if mode == "stream":
+        from . import plan
+
+        if index != None:
+            raise ValueError("Can't index in \"stream\" mode")
+
+        stream = plan.Stream(s, size, overlapDec, window)
+        channels = range(0, s.shape[1])
+        ab = [stream.view("ab", c) for c in channels]
+        an = [stream.view("an", c) for c in channels] if withAn else None
+
+        return ab, an
+
+    start, step, iters = fft.get_fft_stats(s.shape[0], size, overlapDec)
+    shape = fft.get_out_shape(s, int(size / 2) + 1, iters)
+
+    if mode == "memory":
+        ab = np.zeros(shape, dtype="float32")
+        an = np.zeros(shape, dtype="float32") if withAn else None
+    elif mode == "memmap":
+        ab = np.lib.format.open_memmap(os.path.join(dirName, "ab.npy"),
+                mode="w+", dtype="float32", shape=shape)
+        an = np.lib.format.open_memmap(os.path.join(dirName, "an.npy"),
+                mode="w+", dtype="float32", shape=shape) if withAn else None
+    else:
+        raise ValueError("Unknown mode \"{}\"".format(mode))
+
+    fft.wav2bmp(fs, s, size, overlapDec, window, index=index,
+            out=(ab, an, None))
+
+    return ab, an
+
+
+################################################################################
+def compute(name, fs, s, size, overlapDec, window=np.hanning, stats=False):
+    """Save the raw spectrogram (or per-column statistics) of each channel."""
+
+    channels = s.shape[1]
+    fileNames = []
+
+    if stats:
+        st = fft.wav2stats(fs, s, size, overlapDec, window)
+    else:
+        ab, an = transform(fs, s, size, overlapDec, window)
+
+    for c in range(0, channels):
+        chName = util.gen_channel_name(name, c, channels)
+
+        if stats:
+            fileName = util.gen_filename(chName, fs, size, overlapDec,
+                    "stats", "npy")
+            np.save(fileName, st[c])
+        else:
+            fileName = util.gen_filename(chName, fs, size, overlapDec,
+                    "stft", "npz")
+            np.savez(fileName, ab=ab[c], an=an[c])
+
+        fileNames.append(fileName)
+
+    return fileNames
+
+
+################################################################################
+def export(name, fs, s, size, overlapDec, window=np.hanning,
+        products=("ab", "ab-dB", "an"), rawFormat="npy", plot=False,
+        mode="memory"):
+    """Write the spectrogram images and raw files of each channel, and
+    optionally a graph of each.
+
+    `mode' is as for `transform()'; "memmap" keeps its memory maps in a
+    temporary directory next to `name'. Graphs need the whole spectrogram, so
+    can't be drawn in "stream" mode.
+    """
+
+    from . import img
+
+    if plot and (mode == "stream"):
+        raise ValueError("Can't plot in \"stream\" mode")
+
+    if mode == "memmap":
+        tmp = tempfile.TemporaryDirectory(
+                dir=os.path.dirname(os.path.abspath(name)))
+    else:
+        tmp = contextlib.nullcontext()
+
+    if plot:
+        from . import plot as w2bplot
+        w2bplot.use_headless()
+
+    channels = s.shape[1]
+    fileNames = []
+
+    with tmp as dirName:
+        ab, an = transform(fs, s, size, overlapDec, window,
+                withAn=("an" in products), mode=mode, dirName=dirName)
+
+        for c in range(0, channels):
+            chName = util.gen_channel_name(name, c, channels)
+            fileNames += img.write_all(chName, fs, size, overlapDec, ab[c],
+                    None if an is None else an[c], products=products,
+                    rawFormat=rawFormat)
+
+            if plot:
+                fileName = util.gen_filename(chName, fs, size, overlapDec,
+                        "plot", "png")
+                w2bplot.draw_abs_db(chName, fs, size, overlapDec, ab[c],
+                        fileName=fileName)
+                fileNames.append(fileName)
+
+        # Let go of any memory maps before their directory goes
+        del ab, an
+
+    return fileNames
+
+
+################################################################################
+def export_incremental(name, size, overlapDec, window=np.hanning,
+        products=("ab", "ab-dB", "an"), rawFormat="npy", plot=False):
+    """`export()', transforming only what has been appended to the WAV since
+    the last time (see `incr'). The images are redrawn from the stored
+    spectrogram, as their scale depends on all of it."""
+
+    from . import archive
+    from . import img
+    from . import incr
+
+    fileNames = incr.update(name, size, overlapDec, window)
+    fs, raw = incr.read_raw(name)
+    channels = raw.shape[1]
+    abNames, anNames, stateName = incr.get_names(name, fs, size, overlapDec,
+            channels)
+
+    if plot:
+        from . import plot as w2bplot
+        w2bplot.use_headless()
+
+    for c in range(0, channels):
+        chName = util.gen_channel_name(name, c, channels)
+
+        with archive.Reader(abNames[c]) as ab, \
+                archive.Reader(anNames[c]) as an:
+            fileNames += img.write_all(chName, fs, size, overlapDec, ab,
+                    an if "an" in products else None, products=products,
+                    rawFormat=rawFormat)
+
+            if plot:
+                fileName = util.gen_filename(chName, fs, size, overlapDec,
+                        "plot", "png")
+                w2bplot.draw_abs_db(chName, fs, size, overlapDec,
+                        ab.read_cols(0, ab.shape[1]), fileName=fileName)
+                fileNames.append(fileName)
+
+    return fileNames
+
+
+################################################################################
+def resynth(fileName, fs, s, mask, size, overlapDec, window=np.hanning):
+    """Apply `mask' to the samples (analysed and resynthesised with `window',
+    or with none if it doesn't suit the overlap) and write them to
+    `fileName'."""
+
+    window = fft.get_resynth_window(size, overlapDec, window)
+    out = fft.bmp2wav_sparse(fs, s, mask, size, overlapDec, window=window)
+
+    if (np.amin(out) < -1.0) or (np.amax(out) > 1.0):
+        out = util.norm(out)
+
+    # Mono stays mono
+    if out.shape[1] == 1:
+        out = out[:, 0]
+
+    wav.write(fileName, fs, out)
+
+    return [fileName]
@@ -0,0 +1,381 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+
+import numpy as np
+from numpy.fft import rfftfreq
+from scipy.ndimage import maximum_filter
+
+from . import fft
+
+
+################################################################################
+def get_extents(mask):
+    """Returns `(low, high)' for every column of `mask': the index of the first
+    non-zero bin and of the first zero bin after it, or -1 where there is no
+    such bin.
+
+    "Zero" is as `np.isclose(0.0, mask)' has it.
+    """
+
+    absMask = np.abs(mask)
+    nonZero = absMask > (1e-8 + (1e-5 * absMask))
+    del absMask
+
+    hasLow = np.any(nonZero, axis=0)
+    low = np.where(hasLow, np.argmax(nonZero, axis=0), -1)
+
+    # The first falling edge in a column is necessarily the end of its first
+    # non-zero run
+    falling = nonZero[:-1, :] & ~nonZero[1:, :]
+    hasHigh = np.any(falling, axis=0)
+    high = np.where(hasHigh, np.argmax(falling, axis=0) + 1, -1)
+
+    return low, high
+
+
+################################################################################
+def replicate_harmonics(mask, quiet=True):
+    """Copy the first band of non-zero bins in each column of `mask' to every
+    harmonic of its centre bin, as `gen_harmonics.py' draws harmonics.
+
+    Columns are grouped by their band, so each harmonic is copied for all
+    columns sharing that band in one slice assignment. Unless `quiet', the
+    band found in each column is printed.
+    """
+
+    assert mask.ndim == 2
+
+    src = np.asarray(mask, dtype="float32")
+    out = np.array(mask, dtype="float32")
+    fn = src.shape[0]
+
+    low, high = get_extents(src)
+    found = np.nonzero((low != -1) & (high != -1))[0]
+
+    if not quiet:
+        for t in found:
+            print("Column {}: range (idx): {} to {} ({})".format(
+                t, low[t], high[t], high[t] - low[t]))
+
+    bands, inverse = np.unique(
+            np.stack((low[found], high[found])), axis=1, return_inverse=True)
+
+    for i in range(0, bands.shape[1]):
+        bandLow, bandHigh = bands[:, i]
+        cols = found[inverse.reshape(-1) == i]
+
+        frangeDiv2 = int((bandHigh - bandLow) / 2.0)
+        fundFreqIdx = bandLow + frangeDiv2
+
+        # A fundamental of bin 0 has no harmonics (the script never ends)
+        if fundFreqIdx == 0:
+            continue
+
+        srcStart = fundFreqIdx - frangeDiv2
+        srcEnd = fundFreqIdx + frangeDiv2
+        band = src[srcStart:srcEnd, cols]
+        nextFreqIdx = fundFreqIdx * 2
+
+        while (nextFreqIdx + frangeDiv2) < fn:
+            out[(nextFreqIdx - frangeDiv2):(nextFreqIdx + frangeDiv2), cols] = \
+                    band
+            nextFreqIdx += fundFreqIdx
+
+    return out
+
+
+################################################################################
+class Expr:
+    """A mask that is evaluated lazily, a block of columns at a time.
+
+    `shape' is `(bins, columns)' like a mask image and `eval_cols(c0, c1)'
+    returns columns `c0' to `c1' as float32, so an expression can be handed
+    to `fft.bmp2wav()' in place of a mask array without the whole mask ever
+    existing at once. Expressions combine with `|' (union, the maximum), `&'
+    (intersection, the minimum) and `*' (product).
+    """
+
+    def eval_cols(self, c0, c1):
+        raise NotImplementedError()
+
+
+    def eval(self):
+        return self.eval_cols(0, self.shape[1])
+
+
+    def iter_tiles(self, tileCols=256):
+        """Yields `(c0, c1, tile)' over the whole mask."""
+
+        for c0 in range(0, self.shape[1], tileCols):
+            c1 = min(c0 + tileCols, self.shape[1])
+            yield c0, c1, self.eval_cols(c0, c1)
+
+
+    def __or__(self, other):
+        return Union(self, other)
+
+
+    def __and__(self, other):
+        return Intersect(self, other)
+
+
+    def __mul__(self, other):
+        return Multiply(self, other)
+
+
+    def __rmul__(self, other):
+        return Multiply(self, other)
+
+
+################################################################################
+def as_expr(a, shape=None):
+    """Wrap an array (or, given `shape', a scalar) as an expression."""
+
+    if isinstance(a, Expr):
+        return a
+    elif np.isscalar(a):
+        if shape == None:
+            raise ValueError("Expected `shape' for a scalar")
+
+        return Const(shape, a)
+    else:
+        return Image(a)
+
+
+################################################################################
+class Image(Expr):
+    """A mask from an existing 2-dim array (or anything sliceable like one,
+    e.g. a memory map or `archive.Reader')."""
+
+    def __init__(self, ar):
+        if len(ar.shape) != 2:
+            raise ValueError("Expected 2-dim array")
+
+        self.ar = ar
+        self.shape = tuple(ar.shape)
+
+
+    def eval_cols(self, c0, c1):
+        return np.asarray(self.ar[:, c0:c1], dtype="float32")
+
+
+################################################################################
+class Const(Expr):
+    def __init__(self, shape, value=1.0):
+        self.shape = tuple(shape)
+        self.value = value
+
+
+    def eval_cols(self, c0, c1):
+        return np.full((self.shape[0], c1 - c0), self.value, dtype="float32")
+
+
+################################################################################
+class Band(Expr):
+    """`inside' for bins `low' to `high' (exclusive) and `outside' elsewhere,
+    over all columns; e.g. a band-stop is `Band(shape, low, high, 0.0, 1.0)'.
+    """
+
+    def __init__(self, shape, low, high, inside=1.0, outside=0.0):
+        self.shape = tuple(shape)
+        self.column = np.full(self.shape[0], outside, dtype="float32")
+        self.column[low:high] = inside
+
+
+    def eval_cols(self, c0, c1):
+        return np.repeat(self.column[:, np.newaxis], c1 - c0, axis=1)
+
+
+################################################################################
+class BinaryOp(Expr):
+    def __init__(self, a, b):
+        if isinstance(a, Expr):
+            self.a = a
+            self.b = as_expr(b, a.shape)
+        else:
+            self.b = as_expr(b)
+            self.a = as_expr(a, self.b.shape)
+
+        if self.a.shape != self.b.shape:
+            raise ValueError("Mask shapes differ: {} and {}".format(
+                self.a.shape, self.b.shape))
+
+        self.shape = self.a.shape
+
+
+    def eval_cols(self, c0, c1):
+        return self.op(self.a.eval_cols(c0, c1), self.b.eval_cols(c0, c1))
+
+
+################################################################################
+class Union(BinaryOp):
+    op = staticmethod(np.maximum)
+
+
+################################################################################
+class Intersect(BinaryOp):
+    op = staticmethod(np.minimum)
+
+
+################################################################################
+class Multiply(BinaryOp):
+    op = staticmethod(np.multiply)
+
+
+################################################################################
+class Dilate(Expr):
+    """Grow the non-zero areas of a mask by up to `timeCols' columns and
+    `freqBins' bins either side (a maximum filter).
+
+    Each block is evaluated with `timeCols' extra columns either side, so
+    blocks join up exactly.
+    """
+
+    def __init__(self, expr, timeCols=0, freqBins=0):
+        if (timeCols < 0) or (freqBins < 0):
+            raise ValueError("Expected `timeCols' and `freqBins' GE 0")
+
+        self.expr = expr
+        self.shape = expr.shape
+        self.timeCols = timeCols
+        self.freqBins = freqBins
+
+
+    def eval_cols(self, c0, c1):
+        h0 = max(c0 - self.timeCols, 0)
+        h1 = min(c1 + self.timeCols, self.shape[1])
+        tile = self.expr.eval_cols(h0, h1)
+
+        # Repeating edges cannot change a maximum
+        tile = maximum_filter(tile,
+                size=((2 * self.freqBins) + 1, (2 * self.timeCols) + 1),
+                mode="nearest")
+
+        return tile[:, (c0 - h0):(c1 - h0)]
+
+
+################################################################################
+class Harmonics(Expr):
+    """Replicate each column's band to its harmonics; see
+    `replicate_harmonics()'."""
+
+    def __init__(self, expr):
+        self.expr = expr
+        self.shape = expr.shape
+
+
+    def eval_cols(self, c0, c1):
+        return replicate_harmonics(self.expr.eval_cols(c0, c1))
+
+
+################################################################################
+class Vector(Expr):
+    """A mask described in seconds and Hz rather than columns and bins, and
+    rasterised a block at a time against the FFT grid of any size and
+    overlap.
+
+    `spec' is a dict (see `load_vector()' for the JSON form):
+
+        {
+            "gain": 1.0,
+            "shapes": [
+                {"type": "band", "f0": 400.0, "f1": 600.0,
+                    "t0": 1.0, "t1": 2.5, "gain": 0.0},
+                {"type": "polygon", "gain": 0.5,
+                    "points": [[0.5, 100.0], [1.0, 900.0], [1.5, 100.0]]}
+            ]
+        }
+
+    Every bin starts at "gain" (default 1.0) and is multiplied by the "gain"
+    of each shape containing it. A band covers `f0 <= f < f1' (Hz) and
+    `t0 <= t < t1' (seconds; both optional); a polygon's points are
+    `[t, f]'. A column's time is that of its centre.
+    """
+
+    def __init__(self, spec, fs, l, size, overlapDec):
+        self.spec = spec
+        self.gain = float(spec.get("gain", 1.0))
+        self.shapes = spec.get("shapes", [])
+
+        for shape in self.shapes:
+            if shape.get("type") not in ("band", "polygon"):
+                raise ValueError("Unknown shape type \"{}\"".format(
+                    shape.get("type")))
+
+        self.freqs = rfftfreq(size, d=(1.0 / fs))
+        self.times = fft.get_col_times(fs, l, size, overlapDec)
+        self.shape = (self.freqs.shape[0], self.times.shape[0])
+
+
+    def eval_cols(self, c0, c1):
+        ret = np.full((self.shape[0], c1 - c0), self.gain, dtype="float32")
+        f = self.freqs[:, np.newaxis]
+        t = self.times[np.newaxis, c0:c1]
+
+        for shape in self.shapes:
+            gain = shape.get("gain", 0.0)
+
+            if shape["type"] == "band":
+                inside = (f >= shape["f0"]) & (f < shape["f1"]) & \
+                        (t >= shape.get("t0", -np.inf)) & \
+                        (t < shape.get("t1", np.inf))
+            else:
+                inside = in_polygon(shape["points"], t, f)
+
+            ret[inside] *= gain
+
+        return ret
+
+
+################################################################################
+def in_polygon(points, t, f):
+    """Even-odd test of the `(t, f)' grid (broadcast together) against a
+    polygon of `[t, f]' points, one edge at a time over the whole grid."""
+
+    inside = np.zeros(np.broadcast_shapes(t.shape, f.shape), dtype=bool)
+    n = len(points)
+
+    for i in range(0, n):
+        ti, fi = points[i]
+        tj, fj = points[i - 1]
+
+        if fi == fj:
+            continue
+
+        crosses = (fi > f) != (fj > f)
+        tCross = ti + ((tj - ti) * (f - fi) / (fj - fi))
+        inside ^= crosses & (t < tCross)
+
+    return inside
+
+
+################################################################################
+def load_vector(fileName, fs, l, size, overlapDec):
+    """Read a JSON vector mask (see `Vector') for the FFT grid of a wave of
+    `l' samples."""
+
+    with open(fileName, "r") as f:
+        spec = json.load(f)
+
+    return Vector(spec, fs, l, size, overlapDec)
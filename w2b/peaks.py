@@ -0,0 +1,174 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import numpy as np
+from scipy.ndimage import maximum_filter1d, uniform_filter1d
+
+from . import fft
+
+
+################################################################################
+class PeakIndex:
+    """An index of where the energy is in a spectrogram: the `k' largest bins
+    of every column, and the spectral flux between consecutive columns (from
+    which `onsets()' are picked).
+
+    Built incrementally: `update()' takes each new block of `ab' columns as
+    the STFT produces them (see `fft.wav2bmp()'), carrying only the previous
+    column between calls.
+    """
+
+    def __init__(self, fs, size, overlapDec, k=8):
+        self.fs = fs
+        self.size = size
+        self.overlapDec = overlapDec
+        self.k = min(k, int(size / 2) + 1)
+        self.cols = 0
+        self.prev = None
+        self.chunks = []
+
+
+    def __len__(self):
+        return self.cols
+
+
+    def update(self, ab):
+        """Add the `(size/2+1, cols)' magnitudes `ab' to the end of the
+        index."""
+
+        if (ab.ndim != 2) or (ab.shape[0] != (int(self.size / 2) + 1)):
+            raise ValueError("Expected `(size/2+1, cols)' array")
+
+        if ab.shape[1] == 0:
+            return
+
+        # The `k' largest bins, loudest first
+        bins = np.argpartition(-ab, self.k - 1, axis=0)[:self.k]
+        mags = np.take_along_axis(ab, bins, axis=0)
+        order = np.argsort(-mags, axis=0, kind="stable")
+        bins = np.take_along_axis(bins, order, axis=0).astype("int32")
+        mags = np.take_along_axis(mags, order, axis=0).astype("float32")
+
+        # Half-wave rectified spectral flux; the first column is against
+        # silence
+        if type(self.prev) == type(None):
+            prev = np.zeros((ab.shape[0], 1), dtype=ab.dtype)
+        else:
+            prev = self.prev
+
+        diff = np.diff(np.concatenate((prev, ab), axis=1), axis=1)
+        flux = np.sum(np.maximum(diff, 0.0), axis=0).astype("float32")
+
+        self.chunks.append((bins, mags, flux))
+        self.prev = ab[:, -1:].copy()
+        self.cols += ab.shape[1]
+
+
+    def consolidate(self):
+        """Join the blocks added so far, so that queries are just slices."""
+
+        if len(self.chunks) != 1:
+            if len(self.chunks) == 0:
+                self.chunks = [(np.zeros((self.k, 0), dtype="int32"),
+                        np.zeros((self.k, 0), dtype="float32"),
+                        np.zeros(0, dtype="float32"))]
+            else:
+                self.chunks = [tuple(np.concatenate(a, axis=-1)
+                        for a in zip(*self.chunks))]
+
+        return self.chunks[0]
+
+
+    def peaks(self, c0=0, c1=None):
+        """Returns the `(k, cols)' bins and magnitudes of columns `c0' to
+        `c1'."""
+
+        bins, mags, flux = self.consolidate()
+
+        return bins[:, c0:c1], mags[:, c0:c1]
+
+
+    def flux(self, c0=0, c1=None):
+        bins, mags, flux = self.consolidate()
+
+        return flux[c0:c1]
+
+
+    def onsets(self, delta=0.1, wait=4):
+        """Returns the columns at which the spectral flux peaks: a column is an
+        onset if its flux is the largest within `wait' columns either side and
+        beats the local mean by `delta' times the largest flux overall."""
+
+        flux = self.flux()
+
+        if (flux.shape[0] == 0) or (np.amax(flux) <= 0.0):
+            return np.zeros(0, dtype="int64")
+
+        width = (2 * wait) + 1
+        localMax = maximum_filter1d(flux, width, mode="constant")
+        localMean = uniform_filter1d(flux, width, mode="constant")
+        threshold = localMean + (delta * np.amax(flux))
+
+        return np.flatnonzero((flux == localMax) & (flux > threshold))
+
+
+    def col_times(self, cols):
+        """Returns the time (in seconds) of the centres of columns `cols'."""
+
+        start, step, iters = fft.get_fft_stats(self.size, self.size,
+                self.overlapDec)
+
+        return (start + (np.asarray(cols) * step) + (self.size / 2.0)) / self.fs
+
+
+    def onset_times(self, delta=0.1, wait=4):
+        return self.col_times(self.onsets(delta, wait))
+
+
+    def save(self, fileName):
+        bins, mags, flux = self.consolidate()
+
+        # The last column too, so that a loaded index can carry on updating
+        if type(self.prev) == type(None):
+            prev = np.zeros((int(self.size / 2) + 1, 0), dtype="float32")
+        else:
+            prev = self.prev
+
+        with open(fileName, "wb") as f:
+            np.savez(f, fs=self.fs, size=self.size, overlapDec=self.overlapDec,
+                    k=self.k, bins=bins, mags=mags, flux=flux, prev=prev)
+
+
+################################################################################
+def load(fileName):
+    """Returns the `PeakIndex' saved to `fileName'."""
+
+    with np.load(fileName) as f:
+        ret = PeakIndex(f["fs"].item(), f["size"].item(),
+                f["overlapDec"].item(), f["k"].item())
+        ret.chunks = [(f["bins"], f["mags"], f["flux"])]
+        ret.cols = f["flux"].shape[0]
+
+        if f["prev"].shape[1] > 0:
+            ret.prev = f["prev"]
+
+    return ret
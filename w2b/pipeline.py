@@ -0,0 +1,152 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Overlap reading, transforming and writing the WAVs of a batch run. Each stage
+# runs in an executor (reading and writing are I/O; NumPy releases the GIL for
+# most of the transform) and stages are joined by bounded queues, so a slow
+# stage holds the ones before it back rather than letting finished work pile
+# up: at most `len(stages) + (len(stages) - 1) * queueSize' items are in
+# flight at once.
+#
+# With W2B_INSTR set, the stage timings of concurrent stages are still summed
+# correctly (see `instr'), but their "peakBytes" are not meaningful.
+
+import asyncio
+import concurrent.futures
+
+import numpy as np
+
+from . import img
+from . import jobs
+from . import util
+
+
+# Marks the end of a queue
+DONE = object()
+
+
+################################################################################
+async def run_stage(fn, inQueue, outQueue, executor):
+    loop = asyncio.get_running_loop()
+
+    while True:
+        item = await inQueue.get()
+
+        if item is DONE:
+            break
+
+        await outQueue.put(await loop.run_in_executor(executor, fn, item))
+
+    await outQueue.put(DONE)
+
+
+################################################################################
+async def feed(items, outQueue):
+    for item in items:
+        await outQueue.put(item)
+
+    await outQueue.put(DONE)
+
+
+################################################################################
+async def drain(inQueue):
+    ret = []
+
+    while True:
+        item = await inQueue.get()
+
+        if item is DONE:
+            return ret
+
+        ret.append(item)
+
+
+################################################################################
+async def run_stages_async(items, stages, queueSize=2, executor=None):
+    """Passes each of `items' through every function in `stages' in turn,
+    with the stages working concurrently, and returns the results in order.
+
+    If a stage raises, the exception is raised here.
+    """
+
+    queues = [asyncio.Queue(maxsize=queueSize)
+            for i in range(0, len(stages) + 1)]
+    tasks = [asyncio.ensure_future(feed(items, queues[0]))]
+
+    for i in range(0, len(stages)):
+        tasks.append(asyncio.ensure_future(run_stage(stages[i], queues[i],
+                queues[i + 1], executor)))
+
+    out = asyncio.ensure_future(drain(queues[-1]))
+
+    try:
+        await asyncio.gather(out, *tasks)
+    finally:
+        for t in tasks + [out]:
+            t.cancel()
+
+    return out.result()
+
+
+################################################################################
+def run_stages(items, stages, queueSize=2, maxWorkers=None):
+    """`run_stages_async()' from synchronous code, with its own thread pool."""
+
+    with concurrent.futures.ThreadPoolExecutor(maxWorkers) as executor:
+        return asyncio.run(run_stages_async(items, stages, queueSize,
+                executor))
+
+
+################################################################################
+def export_all(fileNames, size, overlapDec, window=np.hanning,
+        products=("ab", "ab-dB", "an"), rawFormat="npy", queueSize=2,
+        maxWorkers=None):
+    """`jobs.export()' for every WAV in `fileNames', pipelined: the next WAV
+    is read, and the one before written, while one is transformed.
+
+    Returns the names of the files written for each WAV.
+    """
+
+    def decode(fileName):
+        fs, s, l = jobs.read_channels(fileName)
+        return fileName, fs, s
+
+    def transform(item):
+        fileName, fs, s = item
+        ab, an = jobs.transform(fs, s, size, overlapDec, window,
+                withAn=("an" in products))
+        return fileName, fs, ab, an
+
+    def encode(item):
+        fileName, fs, ab, an = item
+        channels = ab.shape[0]
+        ret = []
+
+        for c in range(0, channels):
+            ret += img.write_all(util.gen_channel_name(fileName, c, channels),
+                    fs, size, overlapDec, ab[c], None if an is None else an[c],
+                    products=products, rawFormat=rawFormat)
+
+        return ret
+
+    return run_stages(fileNames, [decode, transform, encode], queueSize,
+            maxWorkers)
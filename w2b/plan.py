@@ -0,0 +1,356 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import os
+import struct
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from . import fft
+from . import img
+
+
+# Modes, from fastest to leanest:
+#
+#   "memory": `fft.wav2bmp()' keeps `ab', `an' and `x' in memory;
+#   "memmap": the same, but with `ab'/`an' as `np.lib.format.open_memmap()'
+#             files passed as `fft.wav2bmp(out=...)', and `x' not kept;
+#   "stream": not even the wave is loaded; blocks of columns are computed
+#             from a memory-mapped wave (`wav.Samples') as they are indexed
+#             (`Stream').
+#
+# `img.write_all()' only ever works on one tile of columns, so it fits all
+# three. `python -m w2b export' runs in the mode `get_mode()' picks (unless
+# told otherwise); `wav2bmp.py' draws the whole spectrogram, so it goes no
+# further than "memmap".
+MODES = ("memory", "memmap", "stream")
+
+
+################################################################################
+def read_header(fileName):
+    """Returns the sample rate, channels, bits per sample and length (in
+    samples) of a WAV file, from its RIFF header alone."""
+
+    fmt = None
+    dataBytes = None
+
+    with open(fileName, "rb") as f:
+        riff, riffLen, wave = struct.unpack("<4sI4s", f.read(12))
+
+        if (riff != b"RIFF") or (wave != b"WAVE"):
+            raise ValueError("Not a RIFF WAVE file: \"{}\"".format(fileName))
+
+        while True:
+            chunk = f.read(8)
+
+            if len(chunk) < 8:
+                break
+
+            chunkId, chunkLen = struct.unpack("<4sI", chunk)
+
+            if chunkId == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", f.read(16))
+                f.seek(chunkLen - 16, 1)
+            elif chunkId == b"data":
+                dataBytes = chunkLen
+                break
+            else:
+                f.seek(chunkLen, 1)
+
+            # Chunks are word-aligned
+            if chunkLen % 2:
+                f.seek(1, 1)
+
+    if (fmt == None) or (dataBytes == None):
+        raise ValueError("Missing `fmt' or `data' chunk: \"{}\"".format(
+                fileName))
+
+    fmtTag, channels, fs, byteRate, blockAlign, bits = fmt
+
+    return {
+        "fs": fs,
+        "channels": channels,
+        "bits": bits,
+        "length": dataBytes // blockAlign
+    }
+
+
+################################################################################
+def get_npy_bytes(shape, dtype):
+    """Returns the size of the `.npy' file holding a `shape' array."""
+
+    f = io.BytesIO()
+    np.lib.format.write_array_header_1_0(f, {
+        "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+        "fortran_order": False,
+        "shape": shape
+    })
+
+    return f.tell() + (int(np.prod(shape)) * np.dtype(dtype).itemsize)
+
+
+################################################################################
+def get_sizes(l, channels, size, overlapDec,
+        products=("ab", "ab-dB", "an"), tileCols=1024):
+    """Returns the bytes of every array allocated, and every file written, by
+    `wav2bmp.py' for an `l' sample wave.
+
+    "buf" is the working set of one `fft.BLOCK_COLS' block of the STFT and
+    "tile" that of one `img.write_all()' tile (the latter allowing for the
+    float temporaries of the "an" colour map).
+    """
+
+    fftLen = int(size / 2) + 1
+    start, step, iters = fft.get_fft_stats(l, size, overlapDec)
+    blockCols = min(fft.BLOCK_COLS, iters)
+    spanLen = ((blockCols - 1) * step) + size
+    tileCols = min(tileCols, iters)
+
+    ret = OrderedDict()
+    ret["wav"] = l * channels * 4
+    ret["ab"] = channels * fftLen * iters * 4
+    ret["an"] = channels * fftLen * iters * 4
+    ret["x"] = channels * fftLen * iters * 16
+    ret["buf"] = channels * ((spanLen * 4) + (size * blockCols * 4) +
+            (fftLen * blockCols * 16))
+    ret["tile"] = fftLen * tileCols * (4 + 4 + 1 + (3 * 4) + 3)
+
+    for p in products:
+        ret[p + ".bmp"] = channels * img.get_bmp_bytes(fftLen, iters,
+                colour=(p == "an"))
+
+        if p != "an":
+            ret[p + ".npy"] = channels * get_npy_bytes((fftLen, iters),
+                    "uint8")
+
+    return ret
+
+
+################################################################################
+def get_mode_bytes(sizes):
+    """Returns the memory each of `MODES' needs, given `get_sizes()'."""
+
+    work = sizes["buf"] + sizes["tile"]
+
+    return OrderedDict([
+        ("memory", sizes["wav"] + sizes["ab"] + sizes["an"] + sizes["x"] +
+                work),
+        ("memmap", sizes["wav"] + work),
+        ("stream", work)
+    ])
+
+
+################################################################################
+def choose_mode(sizes, budget):
+    """Returns the fastest of `MODES' that fits in `budget' bytes."""
+
+    for mode, needed in get_mode_bytes(sizes).items():
+        if needed <= budget:
+            return mode
+
+    raise ValueError("Nothing fits in {}".format(format_bytes(budget)))
+
+
+################################################################################
+def get_mode(fileName, size, overlapDec, products=("ab", "ab-dB", "an"),
+        budget=None):
+    """Returns the mode to transform `fileName' in: that of `choose_mode()'
+    for `budget' bytes (default: physical memory), "memory" if the budget is
+    unknown, or "stream" if nothing fits."""
+
+    header = read_header(fileName)
+    sizes = get_sizes(header["length"], header["channels"], size, overlapDec,
+            products)
+
+    if budget == None:
+        budget = get_phys_mem()
+
+    if budget == None:
+        return "memory"
+
+    try:
+        return choose_mode(sizes, budget)
+    except ValueError:
+        return "stream"
+
+
+################################################################################
+def calibrate(size, overlapDec, channels=1, cols=1024, repeat=3):
+    """Times `fft.wav2bmp()' on `cols' columns of noise and returns the
+    (best) seconds per column."""
+
+    start, step, iters = fft.get_fft_stats(size, size, overlapDec)
+    rng = np.random.default_rng(0)
+    wav = rng.uniform(-1.0, 1.0, (cols * step, channels)).astype("float32")
+
+    if channels == 1:
+        wav = wav[:, 0]
+
+    best = np.inf
+
+    for i in range(0, repeat):
+        t0 = time.perf_counter()
+        ab, an, x = fft.wav2bmp(1, wav, size, overlapDec)
+        best = min(best, time.perf_counter() - t0)
+
+    return best / ab.shape[-1]
+
+
+################################################################################
+def get_phys_mem():
+    """Returns the physical memory in bytes, or `None' if unknown."""
+
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+################################################################################
+def plan(fileName, size, overlapDec, budget=None,
+        products=("ab", "ab-dB", "an"), secsPerCol=None):
+    """Plans the transform of `fileName' without reading its samples.
+
+    Returns a dictionary of the WAV header fields, `iters', the `sizes' and
+    `modeBytes' from `get_sizes()' and `get_mode_bytes()', the `mode' chosen
+    for `budget' bytes (default: physical memory; `None' if nothing fits, or
+    the budget is unknown) and the estimated STFT
+    `seconds' (from `calibrate()' unless `secsPerCol' is given).
+    """
+
+    ret = read_header(fileName)
+    l = ret["length"]
+    channels = ret["channels"]
+
+    start, step, iters = fft.get_fft_stats(l, size, overlapDec)
+    sizes = get_sizes(l, channels, size, overlapDec, products)
+
+    if budget == None:
+        budget = get_phys_mem()
+
+    if secsPerCol == None:
+        secsPerCol = calibrate(size, overlapDec, channels)
+
+    ret["iters"] = iters
+    ret["sizes"] = sizes
+    ret["modeBytes"] = get_mode_bytes(sizes)
+    ret["budget"] = budget
+    ret["mode"] = None
+
+    if budget != None:
+        try:
+            ret["mode"] = choose_mode(sizes, budget)
+        except ValueError:
+            pass
+
+    ret["seconds"] = secsPerCol * iters
+
+    return ret
+
+
+################################################################################
+class Stream:
+    """The spectrogram of `(n, channels)' samples (e.g. `wav.Samples'),
+    computed one block of columns at a time as `view()'s are indexed, and
+    never held in full. The last block is kept, so that the "ab" and "an"
+    views of the same columns share one transform."""
+
+    def __init__(self, wav, size, overlapDec, window=np.hanning):
+        if wav.ndim != 2:
+            raise ValueError("Expected 2-dim array")
+
+        self.wav = wav
+        self.size = size
+        self.wnd = fft.get_window(window, size)
+        self.start, self.step, self.iters = fft.get_fft_stats(
+                wav.shape[0], size, overlapDec)
+        self.shape = fft.get_out_shape(wav, int(size / 2) + 1, self.iters)
+        self.cols = None
+        self.block = None
+
+
+    def get_block(self, c0, c1):
+        """Returns `{"ab": ..., "an": ...}' for columns `c0' to `c1' of every
+        channel."""
+
+        if self.cols != (c0, c1):
+            X = fft.stft_cols(self.wav, self.size, self.start, self.step, c0,
+                    c1, self.wnd)
+            self.block = {
+                "ab": (np.abs(X) / self.size).astype("float32"),
+                "an": fft.get_angle(X).astype("float32")
+            }
+            self.cols = (c0, c1)
+
+        return self.block
+
+
+    def view(self, product, channel):
+        return StreamView(self, product, channel)
+
+
+################################################################################
+class StreamView:
+    """One channel's "ab" or "an" of a `Stream', as a `(size/2+1, iters)'
+    array that can only be indexed as `[:, c0:c1]' (as `img.write_all()'
+    does)."""
+
+    def __init__(self, stream, product, channel):
+        if product not in ("ab", "an"):
+            raise ValueError("Unknown product \"{}\"".format(product))
+
+        self.stream = stream
+        self.product = product
+        self.channel = channel
+        self.shape = stream.shape[1:]
+        self.ndim = 2
+        self.dtype = np.dtype("float32")
+
+
+    def __getitem__(self, key):
+        if (type(key) != tuple) or (len(key) != 2) or \
+                (key[0] != slice(None)) or (type(key[1]) != slice):
+            raise ValueError("Expected `[:, c0:c1]'")
+
+        c0, c1, stride = key[1].indices(self.shape[1])
+
+        if stride != 1:
+            raise ValueError("Expected `[:, c0:c1]'")
+
+        if c0 >= c1:
+            return np.zeros((self.shape[0], 0), dtype="float32")
+
+        return self.stream.get_block(c0, c1)[self.product][self.channel]
+
+
+################################################################################
+def format_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024:
+            return "{:.1f} {}".format(n, unit)
+
+        n /= 1024.0
+
+    return "{:.1f} TiB".format(n)
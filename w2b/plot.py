@@ -28,60 +28,155 @@ from . import util
 
 
 ################################################################################
-def draw_abs(name, fs, size, overlapDec, ab, inv=False, block=False):
+def use_headless():
+    """Switch to the non-interactive Agg backend, for rendering graphs to
+    files (see the `fileName' arguments) without a display."""
+
+    plt.switch_backend("Agg")
+
+
+################################################################################
+def get_pool_factors(fig, rows, cols):
+    """Returns the `(rowFactor, colFactor)' that reduce a `rows' x `cols'
+    image to no more than the pixel size of `fig'."""
+
+    width, height = fig.get_size_inches() * fig.dpi
+    rowFactor = max(1, int(np.ceil(rows / height)))
+    colFactor = max(1, int(np.ceil(cols / width)))
+
+    return rowFactor, colFactor
+
+
+################################################################################
+def get_db_min(ab):
+    """Returns the dB floor `util.mag2db_norm()' would use for all of `ab',
+    without converting all of `ab' to dB."""
+
+    abMinPos = np.amin(ab, where=(ab > 0.0), initial=np.inf)
+
+    if abMinPos == np.inf:
+        return util.mag2db_min(np.ma.masked)
+    else:
+        return util.mag2db_min(
+                20.0 * np.log10(np.float32(abMinPos), dtype="float32"))
+
+
+################################################################################
+def show_image(fig, img, rows, cols, fileName, block, **kwargs):
+    """Show `img' (possibly reduced) with the axes of a `rows' x `cols'
+    image, or save it to `fileName'."""
+
+    plt.imshow(img, origin="lower",
+            extent=(-0.5, cols - 0.5, -0.5, rows - 0.5), **kwargs)
+
+    if fileName == None:
+        plt.show(block=block)
+    else:
+        fig.savefig(fileName)
+        plt.close(fig)
+
+
+################################################################################
+def draw_abs(name, fs, size, overlapDec, ab, inv=False, block=False,
+        reduce=True, fileName=None):
+    """Draw FT amplitude.
+
+    With `reduce', `ab' is first max-pooled down to the pixel size of the
+    figure (keeping transients visible) rather than handing matplotlib the
+    full-resolution array. With `fileName', the graph is saved there (e.g.
+    as a PNG) instead of shown.
+    """
+
     fig = plt.figure()
     fig.suptitle("abs [" + name + "]\nfs = " + str(fs) + \
             ", size = " + str(size) + ", ovl = " + str(overlapDec))
 
+    rows, cols = ab.shape
+
+    if reduce:
+        ab = util.max_pool(ab, *get_pool_factors(fig, rows, cols))
+
     if inv:
         ab2 = util.flip_norm(ab)
     else:
         ab2 = ab
 
-    plt.imshow(ab2, cmap="gray", origin="lower")
-    plt.show(block=block)
+    show_image(fig, ab2, rows, cols, fileName, block, cmap="gray")
 
 
 ################################################################################
-def draw_abs_db(name, fs, size, overlapDec, ab, inv=False, block=False):
-    ab_db = util.mag2db_norm(ab)
+def draw_abs_db(name, fs, size, overlapDec, ab, inv=False, block=False,
+        reduce=True, fileName=None):
+    """Draw FT decibel amplitude; see `draw_abs()'."""
 
     fig = plt.figure()
     fig.suptitle("dB(abs) [" + name + "]\nfs = " + str(fs) + \
             ", size = " + str(size) + ", ovl = " + str(overlapDec))
 
+    rows, cols = ab.shape
+
+    # Decibels are monotonic, so pool first and convert far fewer values
+    if reduce:
+        dbMin = get_db_min(ab)
+        ab = util.max_pool(ab, *get_pool_factors(fig, rows, cols))
+    else:
+        dbMin = None
+
+    ab_db = util.mag2db_norm(ab, dbMin)
+
     if inv:
         ab_db2 = util.flip_norm(ab_db)
     else:
         ab_db2 = ab_db
 
-    plt.imshow(ab_db2, cmap="gray", origin="lower")
-    plt.show(block=block)
+    show_image(fig, ab_db2, rows, cols, fileName, block, cmap="gray")
 
 
 ################################################################################
-def draw_abs_db_log(name, fs, size, overlapDec, ab, inv=False, block=False):
+def draw_abs_db_log(name, fs, size, overlapDec, ab, inv=False, block=False,
+        reduce=True, fileName=None):
+    """Draw FT decibel amplitude with logarithmic frequency; see
+    `draw_abs()'."""
+
     binFreqs, logFreqs = util.log_freq(fs, size)
-    ab_db_log = util.lin2log(util.mag2db_norm(ab), binFreqs, logFreqs)
 
     fig = plt.figure()
     fig.suptitle("logY(dB(abs)) [" + name + "]\nfs = " + str(fs) + \
             ", size = " + str(size) + ", ovl = " + str(overlapDec))
 
+    rows, cols = ab.shape
+
+    # Only columns can be pooled before the frequency axis is remapped
+    if reduce:
+        dbMin = get_db_min(ab)
+        rowFactor, colFactor = get_pool_factors(fig, rows, cols)
+        ab = util.max_pool(ab, 1, colFactor)
+    else:
+        dbMin = None
+
+    ab_db_log = util.lin2log(util.mag2db_norm(ab, dbMin), binFreqs, logFreqs)
+
+    if reduce:
+        ab_db_log = util.max_pool(ab_db_log, rowFactor, 1)
+
     if inv:
         ab_db_log2 = util.flip_norm(ab_db_log)
     else:
         ab_db_log2 = ab_db_log
 
-    plt.imshow(ab_db_log2, cmap="gray", origin="lower")
-    plt.show(block=block)
+    show_image(fig, ab_db_log2, rows, cols, fileName, block, cmap="gray")
 
 
 ################################################################################
 def draw_ang(name, fs, size, overlapDec, ab, an,
         bins=None, startFreq=None, endFreq=None,
-        colourMap=cm.colour_maps["thermal1"], normAbs=True, block=False):
-    """Draw the FFT phase information scaled by amplitude"""
+        colourMap=cm.colour_maps["thermal1"], normAbs=True, block=False,
+        reduce=True, fileName=None):
+    """Draw the FFT phase information scaled by amplitude
+
+    With `reduce', each pixel takes the phase of the largest amplitude it
+    covers; see `draw_abs()'.
+    """
 
     if normAbs:
         abNorm = util.norm(ab)
@@ -100,8 +195,6 @@ def draw_ang(name, fs, size, overlapDec, ab, an,
         if endFreq == None:
             endFreq = binFreqs[-1]
 
-    img = util.apply_colourmap(abNorm, an, colourMap)
-
     graphName = "ang [" + name + "]\nfs = " + str(fs) + \
             ", size = " + str(size) + ", bins = " + str(bins) + \
             ", startFreq = " + str(startFreq) + \
@@ -112,5 +205,58 @@ def draw_ang(name, fs, size, overlapDec, ab, an,
 
     fig = plt.figure()
     fig.suptitle(graphName)
-    plt.imshow(img, origin="lower")
+
+    rows, cols = ab.shape
+
+    if reduce:
+        abNorm, an = util.max_pool(abNorm, *get_pool_factors(fig, rows, cols),
+                other=an)
+
+    img = util.apply_colourmap(abNorm, an, colourMap)
+
+    show_image(fig, img, rows, cols, fileName, block)
+
+
+################################################################################
+def draw_tiles(name, source, product="ab-dB", maxCols=2048, block=False):
+    """Draw a spectrogram from a `tiles.TileSource', fetching (cached) tiles
+    for whichever columns are visible as the plot is panned and zoomed,
+    rather than drawing the full array."""
+
+    fig = plt.figure()
+    fig.suptitle(product + " [" + name + "]\nfs = " + str(source.fs) + \
+            ", size = " + str(source.size) + \
+            ", ovl = " + str(source.overlapDec))
+    ax = fig.add_subplot(1, 1, 1)
+
+    img, level, v0, v1 = source.view(product, 0, source.iters, maxCols)
+    rows = img.shape[0]
+    im = ax.imshow(img, cmap="gray", origin="lower", aspect="auto",
+            extent=(v0, v1, 0, rows), vmin=0.0, vmax=1.0)
+    state = {"view": (level, v0, v1)}
+
+    def on_xlim_changed(ax):
+        lo, hi = ax.get_xlim()
+        c0 = max(int(np.floor(lo)), 0)
+        c1 = min(int(np.ceil(hi)), source.iters)
+
+        if c0 >= c1:
+            return
+
+        level = source.get_level(c0, c1, maxCols)
+        old = state["view"]
+
+        if (level == old[0]) and (c0 >= old[1]) and (c1 <= old[2]):
+            return
+
+        img, level, v0, v1 = source.view(product, c0, c1, maxCols)
+        state["view"] = (level, v0, v1)
+        im.set_data(img)
+        im.set_extent((v0, v1, 0, rows))
+        ax.set_xlim(lo, hi, emit=False)
+        fig.canvas.draw_idle()
+
+    ax.callbacks.connect("xlim_changed", on_xlim_changed)
     plt.show(block=block)
+
+    return fig
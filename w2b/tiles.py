@@ -0,0 +1,197 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from collections import OrderedDict
+
+import numpy as np
+
+from . import fft
+from . import util
+
+
+################################################################################
+class TileCache:
+    """A least-recently-used cache of spectrogram tiles, limited to `maxBytes'
+    of array data.
+
+    Tiles are generated lazily: `get()' only calls `generate()' on a miss.
+    """
+
+    def __init__(self, maxBytes=(256 * 1024 * 1024)):
+        self.maxBytes = maxBytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.tiles = OrderedDict()
+
+
+    def __len__(self):
+        return len(self.tiles)
+
+
+    def __contains__(self, key):
+        return key in self.tiles
+
+
+    def get(self, key, generate):
+        if key in self.tiles:
+            self.hits += 1
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+
+        self.misses += 1
+        tile = generate()
+        self.tiles[key] = tile
+        self.nbytes += tile.nbytes
+
+        # Never evict the tile just added, even if it alone is over the limit
+        while (self.nbytes > self.maxBytes) and (len(self.tiles) > 1):
+            oldKey, oldTile = self.tiles.popitem(last=False)
+            self.nbytes -= oldTile.nbytes
+
+        return tile
+
+
+    def clear(self):
+        self.tiles.clear()
+        self.nbytes = 0
+
+
+################################################################################
+class TileSource:
+    """Generates the tiles of one wave's spectrogram for display.
+
+    A tile is `tileCols' columns wide. At zoom level 0 each tile column is one
+    FFT column; at level `L' each is the maximum of `2^L' FFT columns (so that
+    transients stay visible), made by pooling two tiles of level `L-1'. All
+    tiles go through `cache', keyed by `(key, size, overlapDec, product,
+    level, index)' where `key' identifies the wave (by default, the hash of
+    its samples; pass `util.file_hash()' of the WAV to skip hashing).
+
+    Products are "ab" and "ab-dB" (with the default dB floor, so that tiles
+    are consistent with each other).
+    """
+
+    def __init__(self, fs, wav, size, overlapDec, cache, key=None,
+            tileCols=512, window=np.hanning):
+        if wav.ndim != 1:
+            raise ValueError("Expected 1-dim array")
+
+        self.fs = fs
+        self.wav = wav
+        self.size = size
+        self.overlapDec = overlapDec
+        self.cache = cache
+        self.tileCols = tileCols
+        self.wnd = fft.get_window(window, size)
+        self.start, self.step, self.iters = fft.get_fft_stats(
+                wav.shape[0], size, overlapDec)
+
+        if key == None:
+            self.key = util.array_hash(wav)
+        else:
+            self.key = key
+
+
+    def get_level_cols(self, level):
+        """Returns the number of columns in the whole spectrogram at `level'."""
+
+        return -(-self.iters // (1 << level))
+
+
+    def get_tile_count(self, level):
+        return -(-self.get_level_cols(level) // self.tileCols)
+
+
+    def tile(self, product, level, index):
+        if product not in ("ab", "ab-dB"):
+            raise ValueError("Unknown product \"{}\"".format(product))
+
+        if (index < 0) or (index >= self.get_tile_count(level)):
+            raise ValueError("Tile index out of range")
+
+        key = (self.key, self.size, self.overlapDec, product, level, index)
+
+        if product == "ab-dB":
+            generate = lambda: util.mag2db_norm(
+                    self.tile("ab", level, index),
+                    util.mag2db_min(np.ma.masked))
+        elif level == 0:
+            generate = lambda: self.gen_tile(index)
+        else:
+            generate = lambda: self.gen_pooled_tile(level, index)
+
+        return self.cache.get(key, generate)
+
+
+    def gen_tile(self, index):
+        c0 = index * self.tileCols
+        c1 = min(c0 + self.tileCols, self.iters)
+        X = fft.stft_cols(self.wav, self.size, self.start, self.step, c0, c1,
+                self.wnd)
+
+        return (np.abs(X) / self.size).astype("float32")
+
+
+    def gen_pooled_tile(self, level, index):
+        children = [self.tile("ab", level - 1, 2 * index)]
+
+        if (2 * index + 1) < self.get_tile_count(level - 1):
+            children.append(self.tile("ab", level - 1, 2 * index + 1))
+
+        return util.max_pool_cols(np.concatenate(children, axis=1), 2)
+
+
+    def get_level(self, c0, c1, maxCols):
+        """Returns the finest level at which columns `c0' to `c1' fit in
+        `maxCols' tile columns."""
+
+        level = 0
+
+        while -(-(c1 - c0) // (1 << level)) > maxCols:
+            level += 1
+
+        return level
+
+
+    def view(self, product, c0, c1, maxCols=2048):
+        """Returns `(img, level, v0, v1)': the tiles covering FFT columns `c0'
+        to `c1' joined into one image of at most about `maxCols' columns, and
+        the range of FFT columns (`v0' to `v1') that the image spans."""
+
+        c0 = max(c0, 0)
+        c1 = min(c1, self.iters)
+
+        if c0 >= c1:
+            raise ValueError("Expected `c0 < c1'")
+
+        level = self.get_level(c0, c1, maxCols)
+        factor = 1 << level
+        t0 = (c0 // factor) // self.tileCols
+        t1 = -(-(-(-c1 // factor)) // self.tileCols)
+
+        img = np.concatenate(
+                [self.tile(product, level, t) for t in range(t0, t1)], axis=1)
+        v0 = t0 * self.tileCols * factor
+        v1 = min(v0 + (img.shape[1] * factor), self.iters)
+
+        return img, level, v0, v1
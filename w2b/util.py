@@ -20,12 +20,17 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import hashlib
+import logging
+import os
 import os.path
 import re
 
 import numpy as np
 from numpy.fft import rfftfreq
 
+from . import instr
+
 
 ################################################################################
 def norm(ar):
@@ -57,18 +62,36 @@ def mag2db(ar):
 
 
 ################################################################################
-def mag2db_norm(ar):
-    db = 20.0 * np.ma.log10(ar, dtype="float32")
+def mag2db_norm(ar, dbMin=None):
+    """Convert magnitudes to normalised decibels.
+
+    `dbMin' is normally derived from `ar' itself; pass it in when `ar' is
+    only one tile of a larger spectrogram (see `mag2db_min()').
+    """
+
+    with instr.span("dB", ar.size):
+        db = 20.0 * np.ma.log10(ar, dtype="float32")
+
+        if dbMin == None:
+            dbMin = mag2db_min(np.amin(db))
+
+        ret = (db / -dbMin) + 1.0
+
+        return ret.filled(0.0)
+
+
+################################################################################
+def mag2db_min(dbActualMin):
+    """Returns the dB floor used by `mag2db_norm()' given the smallest dB
+    value actually present."""
+
     dbMin = 20.0 * np.log10(1.0 / np.power(2.0, 32.0))
-    dbActualMin = np.amin(db)
 
-    if dbActualMin < dbMin:
+    if dbActualMin is not np.ma.masked and dbActualMin < dbMin:
         #print("Warning: dbActualMin < dbMin")
         dbMin = dbActualMin
 
-    ret = (db / -dbMin) + 1.0
-
-    return ret.filled(0.0)
+    return dbMin
 
 
 ################################################################################
@@ -121,6 +144,74 @@ def lin2log(ab, binFreqs, logFreqs):
     return ret
 
 
+################################################################################
+def max_pool(ar, rowFactor, colFactor, other=None, stripCols=256):
+    """Reduce a 2-dim array by `rowFactor' x `colFactor' blocks, keeping the
+    maximum of each block (ragged blocks at the edges are reduced as-is).
+
+    If `other' (an array of the same shape) is given, also returns the
+    elements of `other' at the position of each block's maximum.
+
+    The reduction is a reshape over blocks, done in strips of `stripCols'
+    output columns to bound the temporary memory used.
+    """
+
+    rows, cols = ar.shape
+    outRows = -(-rows // rowFactor)
+    outCols = -(-cols // colFactor)
+    padRows = (outRows * rowFactor) - rows
+
+    ret = np.ndarray((outRows, outCols), dtype=ar.dtype)
+
+    if type(other) != type(None):
+        assert other.shape == ar.shape
+        retOther = np.ndarray((outRows, outCols), dtype=other.dtype)
+
+    for o0 in range(0, outCols, stripCols):
+        o1 = min(o0 + stripCols, outCols)
+        n = o1 - o0
+        strip = ar[:, (o0 * colFactor):(o1 * colFactor)]
+        padCols = (n * colFactor) - strip.shape[1]
+
+        # Repeating the edge cannot change a block's maximum (or its first
+        # position)
+        if (padRows > 0) or (padCols > 0):
+            strip = np.pad(strip, ((0, padRows), (0, padCols)), mode="edge")
+
+        blocks = strip.reshape(outRows, rowFactor, n, colFactor)
+
+        if type(other) == type(None):
+            ret[:, o0:o1] = np.amax(blocks, axis=(1, 3))
+            continue
+
+        otherStrip = other[:, (o0 * colFactor):(o1 * colFactor)]
+
+        if (padRows > 0) or (padCols > 0):
+            otherStrip = np.pad(otherStrip, ((0, padRows), (0, padCols)),
+                    mode="edge")
+
+        blocks = blocks.transpose(0, 2, 1, 3).reshape(outRows, n, -1)
+        otherBlocks = otherStrip.reshape(outRows, rowFactor, n, colFactor) \
+                .transpose(0, 2, 1, 3).reshape(outRows, n, -1)
+        idx = np.argmax(blocks, axis=2)[:, :, np.newaxis]
+
+        ret[:, o0:o1] = np.take_along_axis(blocks, idx, axis=2)[:, :, 0]
+        retOther[:, o0:o1] = \
+                np.take_along_axis(otherBlocks, idx, axis=2)[:, :, 0]
+
+    if type(other) == type(None):
+        return ret
+    else:
+        return ret, retOther
+
+
+################################################################################
+def max_pool_cols(ar, factor):
+    """Reduce the columns of a 2-dim array by `factor'; see `max_pool()'."""
+
+    return max_pool(ar, 1, factor)
+
+
 ################################################################################
 def angle(x):
     """A function that takes a complex scalar or `ndarray` and returns the
@@ -140,17 +231,10 @@ def angle(x):
         assert x.dtype == complex
         assert ang.shape == x.shape
 
-        if ang.ndim == 1:
-            for i in range(0, ang.shape[0]):
-                if ang[i] < 0.0:
-                    ang[i] = ang[i] + pi2
-        elif ang.ndim == 2:
-            for i in range(0, ang.shape[0]):
-                for j in range(0, ang.shape[1]):
-                    if ang[i, j] < 0.0:
-                        ang[i, j] = ang[i, j] + pi2
-        else:
+        if (ang.ndim < 1) or (ang.ndim > 2):
             raise ValueError("Expected 1 <= ndim <= 2")
+
+        ang[ang < 0.0] += pi2
     else:
         if ang < 0.0:
             ang = ang + pi2
@@ -163,29 +247,30 @@ def angle(x):
 
 ################################################################################
 def apply_colourmap(ab, an, cm, scale=True):
-    assert ab.ndim == 2
-    assert an.ndim == 2
-    assert np.amin(ab) >= 0.0
-    assert np.amax(ab) <= 1.0
-
-    ret = np.ndarray((ab.shape[0], ab.shape[1], 3), dtype="float32")
-
-    if scale:
-        ret[:, :, 0] = ab[:, :] * \
-                np.interp(an[:, :], cm["r"]["x"], cm["r"]["y"])
-        ret[:, :, 1] = ab[:, :] * \
-                np.interp(an[:, :], cm["g"]["x"], cm["g"]["y"])
-        ret[:, :, 2] = ab[:, :] * \
-                np.interp(an[:, :], cm["b"]["x"], cm["b"]["y"])
-    else:
-        ret[:, :, 0] = np.interp(an[:, :], cm["r"]["x"], cm["r"]["y"])
-        ret[:, :, 1] = np.interp(an[:, :], cm["g"]["x"], cm["g"]["y"])
-        ret[:, :, 2] = np.interp(an[:, :], cm["b"]["x"], cm["b"]["y"])
+    with instr.span("colourmap", ab.size):
+        assert ab.ndim == 2
+        assert an.ndim == 2
+        assert np.amin(ab) >= 0.0
+        assert np.amax(ab) <= 1.0
+
+        ret = np.ndarray((ab.shape[0], ab.shape[1], 3), dtype="float32")
+
+        if scale:
+            ret[:, :, 0] = ab[:, :] * \
+                    np.interp(an[:, :], cm["r"]["x"], cm["r"]["y"])
+            ret[:, :, 1] = ab[:, :] * \
+                    np.interp(an[:, :], cm["g"]["x"], cm["g"]["y"])
+            ret[:, :, 2] = ab[:, :] * \
+                    np.interp(an[:, :], cm["b"]["x"], cm["b"]["y"])
+        else:
+            ret[:, :, 0] = np.interp(an[:, :], cm["r"]["x"], cm["r"]["y"])
+            ret[:, :, 1] = np.interp(an[:, :], cm["g"]["x"], cm["g"]["y"])
+            ret[:, :, 2] = np.interp(an[:, :], cm["b"]["x"], cm["b"]["y"])
 
-    assert np.amin(ret) >= 0.0
-    assert np.amax(ret) <= 1.0
+        assert np.amin(ret) >= 0.0
+        assert np.amax(ret) <= 1.0
 
-    return ret
+        return ret
 
 
 ################################################################################
@@ -219,6 +304,54 @@ def gen_filename(fileName, sampleRate, size, overlapDec, fileType,
     return ret
 
 
+################################################################################
+def init_logging(level=None):
+    """Send the `w2b' modules' log messages to stderr, as the scripts do.
+
+    `level' defaults to the W2B_LOG environment variable (e.g. "DEBUG"), or
+    "INFO" if that is unset.
+    """
+
+    if level == None:
+        level = os.environ.get("W2B_LOG", "INFO")
+
+    logging.basicConfig(level=level, format="%(message)s")
+
+
+################################################################################
+def file_hash(fileName, blockSize=(1 << 20)):
+    """Returns the SHA-1 hex digest of a file's contents."""
+
+    h = hashlib.sha1()
+
+    with open(fileName, "rb") as f:
+        for block in iter(lambda: f.read(blockSize), b""):
+            h.update(block)
+
+    return h.hexdigest()
+
+
+################################################################################
+def array_hash(ar):
+    """Returns the SHA-1 hex digest of an array's contents, shape and type."""
+
+    h = hashlib.sha1(str((ar.shape, ar.dtype.str)).encode())
+    h.update(np.ascontiguousarray(ar).data)
+
+    return h.hexdigest()
+
+
+################################################################################
+def gen_channel_name(fileName, channel, channels):
+    """Returns the name to give outputs for one channel of a WAV; mono WAVs
+    keep their own name."""
+
+    if channels == 1:
+        return fileName
+    else:
+        return "{}_ch{}".format(fileName, channel)
+
+
 ################################################################################
 def gen_filename_w_dict(field_dict):
     return gen_filename(**field_dict)
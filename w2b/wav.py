@@ -20,26 +20,79 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import logging
+
+import numpy as np
 import scipy.io.wavfile as wavfile
 
+from . import instr
 from . import util
 
 
+log = logging.getLogger(__name__)
+
+
 ################################################################################
 def read(fileName):
-    fs, wav = wavfile.read(fileName)
-    length = wav.shape[0]
-    wavNorm = util.norm(wav)
+    with instr.span("wav.read") as s:
+        fs, wav = wavfile.read(fileName)
+        length = wav.shape[0]
+        wavNorm = util.norm(wav)
+        s.items = length
 
-    print("Read WAV: \"" + fileName + "\" (fs = " + str(fs) + \
-            ", len = " + str(length) + ")")
+    log.info("Read WAV: \"%s\" (fs = %s, len = %s)", fileName, fs, length)
 
     return fs, wavNorm, length
 
 
+################################################################################
+class Samples:
+    """The samples of a WAV file as `(n, channels)', memory-mapped rather than
+    read: rows are normalised as `read()' would as they are indexed (so that
+    `plan.Stream' never holds the whole wave)."""
+
+    def __init__(self, fileName, blockLen=(1 << 20)):
+        with instr.span("wav.read") as s:
+            self.fs, raw = wavfile.read(fileName, mmap=True)
+            s.items = raw.shape[0]
+
+        if raw.ndim == 1:
+            raw = raw[:, np.newaxis]
+
+        self.raw = raw
+        self.shape = raw.shape
+        self.ndim = 2
+        self.dtype = np.dtype("float32")
+
+        # As `util.norm()': floats are scaled by their largest magnitude
+        if raw.dtype == "float32":
+            arMin = np.float32(0.0)
+            arMax = np.float32(0.0)
+
+            for i in range(0, raw.shape[0], blockLen):
+                arMin = min(arMin, np.amin(raw[i:(i + blockLen)]))
+                arMax = max(arMax, np.amax(raw[i:(i + blockLen)]))
+
+            self.scale = max(np.abs(arMin), np.abs(arMax))
+        else:
+            self.scale = None
+
+        log.info("Mapped WAV: \"%s\" (fs = %s, len = %s)", fileName, self.fs,
+                raw.shape[0])
+
+
+    def __getitem__(self, key):
+        ar = self.raw[key]
+
+        if self.scale == None:
+            return util.norm(ar)
+        else:
+            return ar / self.scale
+
+
 ################################################################################
 def write(fileName, fs, wav):
-    print("Writing WAV: \"" + fileName + "\" (fs = " + str(fs) + \
-            ", len = " + str(wav.shape[0]) + ")")
+    log.info("Writing WAV: \"%s\" (fs = %s, len = %s)", fileName, fs,
+            wav.shape[0])
 
     wavfile.write(fileName, fs, wav)
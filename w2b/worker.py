@@ -0,0 +1,248 @@
+# MIT License
+#
+# Copyright (c) 2020 Adam Dodd
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# A long-lived worker for repeated jobs, so that interpreter start-up, imports,
+# windows, FFT plans (kept by NumPy's own cache), OpenCL programs and recently
+# read WAVs are paid for once. Requests and responses are JSON, one per line,
+# over stdin/stdout or a local socket:
+#
+#   {"id": 1, "op": "compute", "wav": "a.wav", "size": 1024, "overlap": 0.5}
+#   {"id": 1, "ok": true, "files": ["a.wav___..._stft.npz"], "seconds": 0.02}
+#
+# Ops are "compute" (with optional "stats"), "export" (with optional
+# "products", "rawFormat" and "plot"), "resynth" ("mask" and optional
+# "output"; analysed and resynthesised with "window"), "ocl" ("bins",
+# "startFreq" and "endFreq"; writes `ab'/`an' as .npz), "ping" and
+# "shutdown". Failed requests get `"ok": false' and the "error". Results are
+# always returned as the names of the files written.
+#
+# Run using:
+#
+#   python -m w2b.worker [--socket <path> | --port <port>]
+
+import argparse
+import io
+import json
+import os
+import socketserver
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from . import fft
+from . import jobs
+from . import tiles
+from . import util
+
+
+# A `TileCache' entry: the sample rate travels (and is evicted) with the
+# samples
+CachedWav = namedtuple("CachedWav", ("fs", "s", "nbytes"))
+
+
+################################################################################
+class Worker:
+    """Handles requests, keeping WAVs (up to `maxWavBytes' of samples, least
+    recently used first out) and windows between them."""
+
+    def __init__(self, maxWavBytes=(256 * 1024 * 1024)):
+        self.wavs = tiles.TileCache(maxWavBytes)
+        self.windows = {}
+        self.running = True
+
+
+    def get_wav(self, fileName):
+        """`jobs.read_channels()', cached until the file changes."""
+
+        st = os.stat(fileName)
+        key = (os.path.abspath(fileName), st.st_mtime_ns, st.st_size)
+
+        def read():
+            fs, s, l = jobs.read_channels(fileName)
+            return CachedWav(fs, s, s.nbytes)
+
+        ret = self.wavs.get(key, read)
+
+        return ret.fs, ret.s
+
+
+    def get_window(self, name, size):
+        if name == "none":
+            return None
+        elif name != "hanning":
+            raise ValueError("Unknown window \"{}\"".format(name))
+
+        if size not in self.windows:
+            self.windows[size] = fft.get_window(np.hanning, size)
+
+        return self.windows[size]
+
+
+    def run(self, req):
+        """Runs one request and returns the names of the files written."""
+
+        op = req["op"]
+
+        if op == "ping":
+            return []
+        elif op == "shutdown":
+            self.running = False
+            return []
+
+        fileName = req["wav"]
+        size = int(req["size"])
+        overlapDec = float(req["overlap"])
+        fs, s = self.get_wav(fileName)
+        window = self.get_window(req.get("window", "hanning"), size)
+
+        if op == "compute":
+            return jobs.compute(fileName, fs, s, size, overlapDec, window,
+                    req.get("stats", False))
+        elif op == "export":
+            return jobs.export(fileName, fs, s, size, overlapDec, window,
+                    tuple(req.get("products", ("ab", "ab-dB", "an"))),
+                    req.get("rawFormat", "npy"), req.get("plot", False))
+        elif op == "resynth":
+            mask = jobs.read_mask(req["mask"], fs, s.shape[0], size,
+                    overlapDec)
+            outName = req.get("output", req["mask"] + "_out.wav")
+            return jobs.resynth(outName, fs, s, mask, size, overlapDec,
+                    window)
+        elif op == "ocl":
+            return self.run_ocl(fileName, fs, s, size, overlapDec, req)
+        else:
+            raise ValueError("Unknown op \"{}\"".format(op))
+
+
+    def run_ocl(self, fileName, fs, s, size, overlapDec, req):
+        from . import ft_ocl
+
+        bins = int(req["bins"])
+        startFreq = float(req["startFreq"])
+        endFreq = float(req["endFreq"])
+        channels = s.shape[1]
+        fileNames = []
+
+        for c in range(0, channels):
+            ab, an = ft_ocl.wav2bmp_ocl(fs, np.ascontiguousarray(s[:, c]),
+                    size, bins, startFreq, endFreq, overlapDec)
+            outName = util.gen_filename(
+                    util.gen_channel_name(fileName, c, channels), fs, size,
+                    overlapDec, "ocl", "npz", False, bins, startFreq, endFreq)
+            np.savez(outName, ab=ab, an=an)
+            fileNames.append(outName)
+
+        return fileNames
+
+
+    def handle(self, line):
+        """Returns the response (a JSON line) to a request line."""
+
+        t0 = time.perf_counter()
+        resp = {"id": None}
+
+        try:
+            req = json.loads(line)
+            resp["id"] = req.get("id")
+            resp["files"] = self.run(req)
+            resp["ok"] = True
+        except Exception as e:
+            resp["ok"] = False
+            resp["error"] = "{}: {}".format(type(e).__name__, e)
+
+        resp["seconds"] = time.perf_counter() - t0
+
+        return json.dumps(resp) + "\n"
+
+
+    def serve(self, inFile, outFile):
+        """Answers each line of `inFile' on `outFile' until shut down or the
+        input ends."""
+
+        for line in inFile:
+            if line.strip() == "":
+                continue
+
+            outFile.write(self.handle(line))
+            outFile.flush()
+
+            if not self.running:
+                break
+
+
+################################################################################
+def serve_socket(worker, address):
+    """Serves connections (one at a time, so the caches need no locking) on a
+    Unix socket path, or a localhost TCP port, until shut down."""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            inFile = io.TextIOWrapper(self.rfile, encoding="utf-8")
+            outFile = io.TextIOWrapper(self.wfile, encoding="utf-8")
+
+            try:
+                worker.serve(inFile, outFile)
+            finally:
+                # Leave the socket's own files for the handler to close
+                inFile.detach()
+                outFile.detach()
+
+    if type(address) == int:
+        server = socketserver.TCPServer(("127.0.0.1", address), Handler)
+    else:
+        server = socketserver.UnixStreamServer(address, Handler)
+
+    with server:
+        while worker.running:
+            server.handle_request()
+
+
+################################################################################
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m w2b.worker",
+            description="Serve w2b jobs as JSON lines.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--socket", help="Unix socket path")
+    group.add_argument("--port", type=int, help="localhost TCP port")
+    parser.add_argument("--max-wav-mib", type=float, default=256.0,
+            help="WAV cache size (default: 256 MiB)")
+    args = parser.parse_args(argv)
+
+    # Log messages go to stderr, leaving stdout for responses
+    util.init_logging()
+    worker = Worker(int(args.max_wav_mib * 1024 * 1024))
+
+    if args.socket:
+        serve_socket(worker, args.socket)
+    elif args.port:
+        serve_socket(worker, args.port)
+    else:
+        worker.serve(sys.stdin, sys.stdout)
+
+    return 0
+
+
+################################################################################
+if __name__ == "__main__":
+    sys.exit(main())
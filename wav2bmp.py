@@ -22,14 +22,22 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import os
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 import matplotlib.pyplot as plt
 import numpy as np
 
+import w2b.cache as cache
 import w2b.fft as fft
 import w2b.img as img
+import w2b.jobs as jobs
+import w2b.peaks as peaks
+import w2b.plan as plan
 import w2b.plot as plot
+import w2b.util as util
 import w2b.wav as wav
 
 
@@ -37,30 +45,77 @@ import w2b.wav as wav
 def main(name, size, overlapDec):
     fs, s, l = wav.read(name)
 
-    # If stereo, take left channel
-    if s.ndim == 2:
-        s0 = s[:, 0]
-    else:
-        s0 = s
+    # Every channel is transformed at once
+    if s.ndim == 1:
+        s = s[:, np.newaxis]
+
+    channels = s.shape[1]
+
+    # The graphs need the whole spectrogram, so it is never streamed
+    mode = plan.get_mode(name, size, overlapDec)
+    dirName = None
+
+    if mode != "memory":
+        mode = "memmap"
+        tmp = tempfile.TemporaryDirectory(
+                dir=os.path.dirname(os.path.abspath(name)))
+        dirName = tmp.name
+
+    index = [peaks.PeakIndex(fs, size, overlapDec) for c in range(0, channels)]
+
+    # The index is fed as the columns are computed
+    def transform():
+        ab, an = jobs.transform(fs, s, size, overlapDec, mode=mode,
+                dirName=dirName, index=index)
+        return {"ab": ab, "an": an}
 
     print("Computing FFT data...")
-    ab, an, x = fft.wav2bmp(fs, s0, size, overlapDec)
+    res = cache.cached(transform, [name], size, overlapDec)
+    ab = res["ab"]
+    an = res["an"]
+
+    # A cache hit computes nothing, so index what was loaded a block at a time
+    if index[0].cols < ab.shape[-1]:
+        iters = ab.shape[-1]
+
+        for c in range(0, channels):
+            for c0 in range(0, iters, fft.BLOCK_COLS):
+                c1 = min(c0 + fft.BLOCK_COLS, iters)
+                index[c].update(ab[c][:, c0:c1])
 
     print("Drawing graphs...")
     fig = plt.figure()
-    plt.plot(np.arange(0, s0.size), s0)
+    plt.plot(np.arange(0, l), s)
     plt.show(block=False)
 
-    plot.draw_abs(name, fs, size, overlapDec, ab)
-    plot.draw_abs_db(name, fs, size, overlapDec, ab)
-    #plot.draw_abs_db_log(name, fs, size, overlapDec, ab)
-    plot.draw_ang(name, fs, size, overlapDec, ab, an)
+    for c in range(0, channels):
+        chName = util.gen_channel_name(name, c, channels)
+
+        plot.draw_abs(chName, fs, size, overlapDec, ab[c])
+        plot.draw_abs_db(chName, fs, size, overlapDec, ab[c])
+        #plot.draw_abs_db_log(chName, fs, size, overlapDec, ab[c])
+        plot.draw_ang(chName, fs, size, overlapDec, ab[c], an[c])
 
     print("Writing images...")
-    img.write_abs(name, fs, size, overlapDec, ab)
-    img.write_abs_db(name, fs, size, overlapDec, ab)
-    #img.write_abs_db_log(name, fs, size, overlapDec, ab)
-    img.write_ang(name, fs, size, overlapDec, ab, an)
+    futures = []
+
+    with ThreadPoolExecutor() as executor:
+        for c in range(0, channels):
+            chName = util.gen_channel_name(name, c, channels)
+
+            _, chFutures = img.write_all(chName, fs, size, overlapDec,
+                    ab[c], an[c], products=("ab", "ab-dB", "an"),
+                    executor=executor, wait=False)
+            futures += chFutures
+            #img.write_all(chName, fs, size, overlapDec, ab[c],
+            #        products=("ab-dB-log",))
+
+            index[c].save(util.gen_filename(chName, fs, size, overlapDec,
+                    "peaks", "npz"))
+
+        # Surface any write errors
+        for f in futures:
+            f.result()
 
     print("Done")
     plt.show()
@@ -68,6 +123,8 @@ def main(name, size, overlapDec):
 
 ################################################################################
 if __name__ == "__main__":
+    util.init_logging()
+
     if len(sys.argv) == 4:
         main(sys.argv[1], int(sys.argv[2]), float(sys.argv[3]))
     else:
@@ -27,9 +27,11 @@ import sys
 import matplotlib.pyplot as plt
 import numpy as np
 
+import w2b.cache as cache
 import w2b.ft_ocl as ft_ocl
 import w2b.img as img
 import w2b.plot as plot
+import w2b.util as util
 import w2b.wav as wav
 
 
@@ -37,31 +39,45 @@ import w2b.wav as wav
 def main(name, size, bins, startFreq, endFreq, overlapDec):
     fs, s, l = wav.read(name)
 
-    # If stereo, take left channel
-    if s.ndim == 2:
-        s0 = s[:, 0]
-    else:
-        s0 = s
+    if s.ndim == 1:
+        s = s[:, np.newaxis]
 
-    print("Computing FFT data...")
-    ab, an = ft_ocl.wav2bmp_ocl(
-            fs, s0, size, bins, startFreq, endFreq, overlapDec)
+    channels = s.shape[1]
 
-    print("Drawing graphs...")
+    print("Drawing WAV graph...")
     fig = plt.figure()
-    plt.plot(np.arange(0, s0.size), s0)
+    plt.plot(np.arange(0, l), s)
     plt.show(block=False)
 
-    plot.draw_abs(name, fs, size, overlapDec, ab, block=False)
-    plot.draw_abs_db(name, fs, size, overlapDec, ab, block=False)
-    plot.draw_ang(name, fs, size, overlapDec, ab, an,
-            bins, startFreq, endFreq, block=False)
+    # The kernel works on one channel at a time
+    for c in range(0, channels):
+        chName = util.gen_channel_name(name, c, channels)
+
+        def transform():
+            ab, an = ft_ocl.wav2bmp_ocl(
+                    fs, np.ascontiguousarray(s[:, c]), size, bins, startFreq,
+                    endFreq, overlapDec)
+            return {"ab": ab, "an": an}
+
+        print("Computing FFT data...")
+        res = cache.cached(transform, [name], size, overlapDec, np.hanning,
+                bins, startFreq, endFreq, "stft-ocl-{}".format(c))
+        ab = res["ab"]
+        an = res["an"]
 
-    print("Writing images...")
-    #img.write_abs(name, fs, size, overlapDec, ab, bins, startFreq, endFreq)
-    #img.write_abs_db(name, fs, size, overlapDec, ab,
-    #        bins, startFreq, endFreq)
-    img.write_ang(name, fs, size, overlapDec, ab, an, bins, startFreq, endFreq)
+        print("Drawing graphs...")
+        plot.draw_abs(chName, fs, size, overlapDec, ab, block=False)
+        plot.draw_abs_db(chName, fs, size, overlapDec, ab, block=False)
+        plot.draw_ang(chName, fs, size, overlapDec, ab, an,
+                bins, startFreq, endFreq, block=False)
+
+        print("Writing images...")
+        #img.write_abs(chName, fs, size, overlapDec, ab,
+        #        bins, startFreq, endFreq)
+        #img.write_abs_db(chName, fs, size, overlapDec, ab,
+        #        bins, startFreq, endFreq)
+        img.write_ang(chName, fs, size, overlapDec, ab, an,
+                bins, startFreq, endFreq)
 
     print("Done")
     plt.show()
@@ -69,6 +85,8 @@ def main(name, size, bins, startFreq, endFreq, overlapDec):
 
 ################################################################################
 if __name__ == "__main__":
+    util.init_logging()
+
     if len(sys.argv) == 7:
         main(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]),
                 float(sys.argv[4]), float(sys.argv[5]), float(sys.argv[6]))